@@ -0,0 +1,136 @@
+"""
+批量汇编：把多个 .asm 文件（或目录下的全部 .asm 文件）分发到进程池中并行汇编。
+
+结果按输入顺序返回，每个文件附带其汇编耗时。
+"""
+
+import argparse
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Iterable, List, NamedTuple
+
+from assembler import assemble
+from build_cache import DEFAULT_CACHE_DIR, BuildCache
+from hack_binary import HACK_SUFFIX, HACKB_SUFFIX, dumps, loads
+
+ASM_SUFFIX = ".asm"
+
+
+class BatchResult(NamedTuple):
+    source_file_path: pathlib.Path
+    dest_file_path: pathlib.Path
+    word_count: int
+    seconds: float
+    cached: bool
+
+
+def collect_sources(paths: Iterable[str | pathlib.Path]) -> List[pathlib.Path]:
+    """展开输入路径：目录递归查找其中的 .asm 文件并按路径排序，重复的文件只保留一次。"""
+    sources = []
+    for path in map(pathlib.Path, paths):
+        if path.is_dir():
+            sources.extend(sorted(path.rglob(f"*{ASM_SUFFIX}")))
+        elif path.suffix == ASM_SUFFIX:
+            sources.append(path)
+        else:
+            raise ValueError(f"Invalid source file: {path}")
+    return list(dict.fromkeys(sources))
+
+
+def assemble_file(
+    source_file_path: pathlib.Path,
+    binary: bool = False,
+    cache_dir: pathlib.Path | None = None,
+) -> BatchResult:
+    """汇编单个文件，输出到同目录下的 .hack（或 .hackb）文件。
+
+    给定 cache_dir 时先查构建缓存，源文件内容没有变化就直接复用上一次的输出。
+    """
+    start = time.perf_counter()
+    suffix = HACKB_SUFFIX if binary else HACK_SUFFIX
+    dest_file_path = source_file_path.with_suffix(suffix)
+    source = source_file_path.read_bytes()
+    cache = BuildCache(cache_dir) if cache_dir is not None else None
+    if cache is not None:
+        cache_key = cache.key(source, suffix)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            dest_file_path.write_bytes(cached)
+            word_count = len(loads(cached)) if binary else cached.count(b"\n")
+            return BatchResult(
+                source_file_path,
+                dest_file_path,
+                word_count,
+                time.perf_counter() - start,
+                True,
+            )
+
+    words = assemble(source.decode().splitlines())
+    if binary:
+        data = dumps(words)
+    else:
+        data = "".join(f"{word:016b}\n" for word in words).encode()
+    dest_file_path.write_bytes(data)
+    if cache is not None:
+        cache.put(cache_key, data)
+    return BatchResult(
+        source_file_path,
+        dest_file_path,
+        len(words),
+        time.perf_counter() - start,
+        False,
+    )
+
+
+def batch_assemble(
+    paths: Iterable[str | pathlib.Path],
+    binary: bool = False,
+    max_workers: int | None = None,
+    cache_dir: pathlib.Path | None = None,
+) -> List[BatchResult]:
+    """并行汇编所有输入文件，结果顺序与 collect_sources() 的顺序一致。
+
+    max_workers 为 None 时使用全部 CPU 核心，为 1 时在当前进程中顺序执行；
+    cache_dir 为 None 时不使用构建缓存。
+    """
+    sources = collect_sources(paths)
+    if max_workers == 1:
+        return [assemble_file(source, binary, cache_dir) for source in sources]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(assemble_file, sources, repeat(binary), repeat(cache_dir))
+        )
+
+
+def format_report(results: List[BatchResult], wall_seconds: float) -> str:
+    lines = [
+        f"{result.seconds * 1000:9.2f} ms  {result.word_count:6d} words  "
+        f"{'cached' if result.cached else '      '}  {result.source_file_path}"
+        for result in results
+    ]
+    total = sum(result.seconds for result in results)
+    lines.append(
+        f"{len(results)} files, {total * 1000:.2f} ms total, "
+        f"{wall_seconds * 1000:.2f} ms wall"
+    )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="并行汇编多个 .asm 文件")
+    arg_parser.add_argument("paths", nargs="+", help=".asm 文件或包含 .asm 文件的目录")
+    arg_parser.add_argument("--binary", action="store_true", help="输出 .hackb 格式")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数")
+    arg_parser.add_argument("--no-cache", action="store_true", help="不使用构建缓存")
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    results = batch_assemble(
+        args.paths,
+        binary=args.binary,
+        max_workers=args.jobs,
+        cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR,
+    )
+    print(format_report(results, time.perf_counter() - start))
@@ -0,0 +1,171 @@
+"""
+批量模拟器：用 NumPy 数组保存 N 台 Hack 计算机的寄存器、ROM 和 RAM，
+所有机器同步（lockstep）执行，每一步用向量运算同时完成 N 台机器的取指、解码和执行。
+
+C-指令按 Hack ALU 的控制位（zx nx zy ny f no）向量化计算，对 COMP_SYMBOL_DICT 中的
+全部 comp 助记符与 HackMachine 的结果相同；不在表中的 comp 与 HackMachine 一样报错。
+停机规则与 HackMachine 相同，停机的机器不再参与之后的计算。
+解释器开销由整批机器分摊，适合评测大量小程序或用不同输入运行同一个程序。
+
+依赖 NumPy（可选依赖，只有本模块需要）。
+"""
+
+import pathlib
+from array import array
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from code_writer import COMP_SYMBOL_DICT
+from emulator import (
+    ADDRESS_MASK,
+    DEST_A,
+    DEST_D,
+    DEST_M,
+    RAM_SIZE,
+    ROM_SIZE,
+    HackMachine,
+)
+
+VALID_COMPS = np.array(sorted(int(code, 2) for code in COMP_SYMBOL_DICT.values()))
+
+
+class BatchMachine:
+    """N 台 Hack 计算机；pc/a/d/cycles/halted 都是长度为 N 的数组，ram 的形状为 (N, 32768)。"""
+
+    def __init__(self, programs: Sequence[Iterable[int]]) -> None:
+        # 无符号或有符号的 16 位机器码均可，统一截断为 int16
+        programs = [np.array(list(program), dtype=np.int64) for program in programs]
+        count = len(programs)
+        self.program_size = np.array([len(program) for program in programs])
+        if count and self.program_size.max() > ROM_SIZE:
+            raise ValueError(f"program is larger than ROM ({ROM_SIZE} words)")
+        # 各程序的 ROM 按最长的程序对齐；停机检查保证不会取到程序之外的指令
+        self.rom = np.zeros((count, max(self.program_size.max(initial=0), 1)), np.int16)
+        for index, program in enumerate(programs):
+            self.rom[index, : len(program)] = program.astype(np.int16)
+        self.ram = np.zeros((count, RAM_SIZE), dtype=np.int16)
+        self.pc = np.zeros(count, dtype=np.int64)
+        self.a = np.zeros(count, dtype=np.int16)
+        self.d = np.zeros(count, dtype=np.int16)
+        self.cycles = np.zeros(count, dtype=np.int64)
+        self.halted = np.zeros(count, dtype=bool)
+        self.reset()
+
+    @classmethod
+    def from_files(
+        cls, source_file_paths: Iterable[str | pathlib.Path]
+    ) -> "BatchMachine":
+        """从 .hack 或 .hackb 文件加载程序，每个文件一台机器。"""
+        programs = []
+        for path in source_file_paths:
+            machine = HackMachine.from_file(path)
+            programs.append(machine.rom[: machine.program_size])
+        return cls(programs)
+
+    def __len__(self) -> int:
+        return len(self.pc)
+
+    def reset(self) -> None:
+        """复位所有机器的寄存器；与硬件的 reset 一样不清空 RAM。"""
+        self.pc[:] = 0
+        self.a[:] = 0
+        self.d[:] = 0
+        self.cycles[:] = 0
+        self.halted[:] = self.program_size == 0
+
+    def step(self) -> None:
+        """所有未停机的机器同时执行一条指令。"""
+        index = np.flatnonzero(~self.halted)
+        if not len(index):
+            return
+        pc = self.pc[index]
+        word = self.rom[index, pc].astype(np.int32) & 0xFFFF
+        self.cycles[index] += 1
+
+        # A-指令
+        is_a = word < 0x8000
+        a_index = index[is_a]
+        self.a[a_index] = word[is_a]
+        self.pc[a_index] = pc[is_a] + 1
+
+        # C-指令
+        is_c = ~is_a
+        if is_c.any():
+            self._execute_c(index[is_c], pc[is_c], word[is_c])
+        # 执行到程序末尾的机器停机
+        self.halted |= self.pc >= self.program_size
+
+    def _execute_c(self, index: np.ndarray, pc: np.ndarray, word: np.ndarray) -> None:
+        comp = word >> 6 & 0b1111111
+        if not np.isin(comp, VALID_COMPS).all():
+            bad = np.flatnonzero(~np.isin(comp, VALID_COMPS))[0]
+            raise ValueError(
+                f"invalid instruction {word[bad]:016b} "
+                f"at ROM[{pc[bad]}] of machine {index[bad]}"
+            )
+        a = self.a[index].astype(np.int32)
+        address = a & ADDRESS_MASK
+        m = self.ram[index, address].astype(np.int32)
+        y = np.where(comp & 0b1000000, m, a)  # a 位为 1 时 ALU 的第二个输入是 M
+        out = self.alu(self.d[index].astype(np.int32), y, comp)
+
+        dest = word >> 3 & 0b111
+        # 先用旧的 A 作为地址写 M，再更新 A 和 D
+        write_m = (dest & DEST_M) != 0
+        self.ram[index[write_m], address[write_m]] = out[write_m]
+        write_a = (dest & DEST_A) != 0
+        self.a[index[write_a]] = out[write_a]
+        write_d = (dest & DEST_D) != 0
+        self.d[index[write_d]] = out[write_d]
+
+        jump = word & 0b111
+        taken = (
+            ((jump & 0b100) != 0) & (out < 0)
+            | ((jump & 0b010) != 0) & (out == 0)
+            | ((jump & 0b001) != 0) & (out > 0)
+        )
+        self.pc[index] = np.where(taken, address, pc + 1)
+        # 不改变状态的死循环：无 dest 的跳转跳到自身，或跳回前一条加载自身地址的 A-指令
+        previous = self.rom[index, np.maximum(pc - 1, 0)]
+        loop = (address == pc) | (address == pc - 1) & (previous == address)
+        self.halted[index[taken & (dest == 0) & loop]] = True
+
+    @staticmethod
+    def alu(x: np.ndarray, y: np.ndarray, comp: np.ndarray) -> np.ndarray:
+        """按 comp 的六个控制位计算 Hack ALU 的输出，结果截断为 16 位有符号整数。"""
+        x = np.where(comp & 0b100000, 0, x)
+        x = np.where(comp & 0b010000, ~x, x)
+        y = np.where(comp & 0b001000, 0, y)
+        y = np.where(comp & 0b000100, ~y, y)
+        out = np.where(comp & 0b000010, x + y, x & y)
+        out = np.where(comp & 0b000001, ~out, out)
+        return out.astype(np.int16)
+
+    def run(self, max_cycles: int | None = None) -> int:
+        """同步执行到所有机器停机或执行完 max_cycles 步，返回执行的步数。"""
+        steps = 0
+        while not self.halted.all() and (max_cycles is None or steps < max_cycles):
+            self.step()
+            steps += 1
+        return steps
+
+    def machine(self, index: int) -> HackMachine:
+        """返回第 index 台机器当前状态的 HackMachine 副本。"""
+        machine = HackMachine(self.rom[index, : self.program_size[index]].tolist())
+        machine.ram = array("h", self.ram[index].tobytes())
+        machine.pc = int(self.pc[index])
+        machine.a = int(self.a[index])
+        machine.d = int(self.d[index])
+        machine.cycles = int(self.cycles[index])
+        machine.halted = bool(self.halted[index])
+        return machine
+
+
+def run_programs(
+    programs: Sequence[Iterable[int]], max_cycles: int | None = None
+) -> List[HackMachine]:
+    """批量运行多个程序，返回各自结束时的状态。"""
+    batch = BatchMachine(programs)
+    batch.run(max_cycles)
+    return [batch.machine(index) for index in range(len(batch))]
@@ -0,0 +1,67 @@
+"""
+模拟器基准测试：在 data/pong/Pong.hack 上比较各执行引擎每秒执行的周期数。
+
+1. HackMachine：每个周期重新解码机器码；
+2. PredecodedMachine：加载时预解码，每个周期一次下标分派；
+3. BlockMachine：按基本块翻译为 Python 函数，每个块一次调用。
+
+运行方式：python bench_emulator.py
+"""
+
+import timeit
+
+from block_translator import BlockMachine
+from emulator import HackMachine
+from hack_binary import read_hack
+from predecode import PredecodedMachine
+
+SOURCE_FILE_PATH = "data/pong/Pong.hack"
+CYCLES = 500_000
+REPEAT = 5
+ENGINES = [
+    ("decode every cycle", HackMachine),
+    ("predecoded", PredecodedMachine),
+    ("basic blocks", BlockMachine),
+]
+
+
+def bench(machine_class, words) -> tuple:
+    """返回 (加载耗时（毫秒）, 每秒执行的周期数)，均取多次运行中最快的一次。"""
+    load = min(
+        timeit.repeat(lambda: machine_class(words), repeat=REPEAT, number=1)
+    )
+    machine = machine_class(words)
+
+    def run():
+        machine.reset()
+        machine.run(CYCLES)
+
+    seconds = min(timeit.repeat(run, repeat=REPEAT, number=1))
+    return load * 1000, CYCLES / seconds
+
+
+def main():
+    words = read_hack(SOURCE_FILE_PATH)
+    results = [machine_class(words) for _, machine_class in ENGINES]
+    for machine in results:
+        machine.run(CYCLES)
+    # 所有引擎执行相同的周期数后状态必须一致
+    assert all(
+        machine.registers() == results[0].registers()
+        and list(machine.ram) == list(results[0].ram)
+        for machine in results
+    )
+
+    print(f"{SOURCE_FILE_PATH}: {len(words)} words, {CYCLES} cycles")
+    baseline = None
+    for name, machine_class in ENGINES:
+        load, speed = bench(machine_class, words)
+        baseline = baseline or speed
+        print(
+            f"{name:<20} load {load:7.2f} ms  {speed / 1e6:6.2f} M cycles/s  "
+            f"{speed / baseline:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
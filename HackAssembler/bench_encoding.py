@@ -0,0 +1,78 @@
+"""
+C-指令编码基准测试：在 data/pong/Pong.asm 的全部 C-指令上比较三种编码方式的耗时。
+
+1. Parser.dest/comp/jump 分别解析，再由 CodeWriter 查三张表拼接二进制字符串；
+2. 逐个域查整数表并做位运算；
+3. 整条指令在 C_INSTRUCTION_TABLE 中一次查表。
+
+运行方式：python bench_encoding.py
+"""
+
+import timeit
+from parser import Parser
+
+from assembler import _encode_c_fields, encode_c_instruction, iter_commands
+from code_writer import CodeWriter
+
+SOURCE_FILE_PATH = "data/pong/Pong.asm"
+REPEAT = 5
+NUMBER = 10
+
+
+def load_c_commands(source_file_path: str) -> list:
+    with open(source_file_path, "r") as f:
+        return [
+            command
+            for _, command in iter_commands(f)
+            if command[0] not in ("@", "(")
+        ]
+
+
+def encode_by_parser(parser: Parser) -> list:
+    parser.current = 0
+    words = []
+    while parser.has_more_commands():
+        words.append(
+            "111"
+            + CodeWriter.comp(parser.comp())
+            + CodeWriter.dest(parser.dest())
+            + CodeWriter.jump(parser.jump())
+        )
+        parser.advance()
+    return words
+
+
+def encode_by_fields(commands: list) -> list:
+    return [_encode_c_fields(command) for command in commands]
+
+
+def encode_by_table(commands: list) -> list:
+    return [encode_c_instruction(command) for command in commands]
+
+
+def bench(func, arg) -> float:
+    """返回单次运行的最短耗时（毫秒）。"""
+    times = timeit.repeat(lambda: func(arg), repeat=REPEAT, number=NUMBER)
+    return min(times) / NUMBER * 1000
+
+
+def main():
+    commands = load_c_commands(SOURCE_FILE_PATH)
+    parser = Parser(command_lines=commands)
+    assert [int(word, 2) for word in encode_by_parser(parser)] == encode_by_table(
+        commands
+    )
+
+    baseline = bench(encode_by_parser, parser)
+    print(f"{SOURCE_FILE_PATH}: {len(commands)} C-instructions")
+    for name, func, arg in [
+        ("parser + CodeWriter", encode_by_parser, parser),
+        ("field codes", encode_by_fields, commands),
+        ("full table", encode_by_table, commands),
+    ]:
+        elapsed = baseline if func is encode_by_parser else bench(func, arg)
+        print(f"{name:<20} {elapsed:8.2f} ms  {baseline / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+基本块翻译执行引擎：把 Hack 机器码按基本块翻译为 Python 源码，用 compile() 编译后执行。
+
+第一次执行到某个地址时，从该地址开始一直翻译到第一条跳转指令（或程序末尾、
+或达到 MAX_BLOCK_LENGTH 条指令），生成一个函数 block(A, D) -> (下一个 pc, A, D)。
+块内寄存器 A、D 都是局部变量，一个块只做一次函数调用；A 的值是块内 A-指令加载的
+常数时，内存地址、comp 表达式和跳转目标都直接代入常数。
+编译好的块按起始地址缓存，重新加载 ROM 时清空。
+
+停机规则与 HackMachine 相同：到达死循环或执行到程序末尾时停止。
+剩余周期数不足一个块时，逐条执行剩下的指令，因此 run(max_cycles) 的周期数是精确的。
+"""
+
+from typing import Callable, List, Tuple
+
+from emulator import ADDRESS_MASK, DEST_A, DEST_D, DEST_M, ROM_SIZE, HackMachine
+from predecode import COMP_EXPRESSIONS, JUMP_EXPRESSIONS
+
+MAX_BLOCK_LENGTH = 256
+
+Block = Tuple[Callable[[int, int], Tuple[int, int, int]], int]  # (函数, 指令条数)
+
+
+class BlockMachine(HackMachine):
+    """与 HackMachine 接口相同，按基本块翻译执行。"""
+
+    def load_rom(self, words) -> None:
+        super().load_rom(words)
+        self.ram = self.ram.tolist()
+        self.blocks: List[Block | None] = [None] * ROM_SIZE
+
+    def block_source(self, start: int) -> Tuple[str, int]:
+        """返回从 start 开始的基本块的 Python 源码及其指令条数。"""
+        rom = self.rom
+        body = []
+        constant_a = None  # 块内最近一条 A-指令加载的常数，A 被改写后为 None
+        pc = start
+        end = min(self.program_size, start + MAX_BLOCK_LENGTH)
+        while pc < end:
+            word = rom[pc]
+            pc += 1
+            if word >= 0:
+                body.append(f"A = {word}")
+                constant_a = word
+                continue
+            word &= 0xFFFF
+            comp = word >> 6 & 0b1111111
+            if comp not in COMP_EXPRESSIONS:
+                # 非法指令：逐条执行时会报错，块在它之前结束
+                pc -= 1
+                if pc == start:
+                    raise ValueError(f"invalid instruction {word:016b} at ROM[{pc}]")
+                break
+            expression = COMP_EXPRESSIONS[comp]
+            dest = word >> 3 & 0b111
+            jump = word & 0b111
+            if constant_a is not None:
+                # A 是已知常数时，地址和表达式中的 A 都直接代入常数
+                address = str(constant_a)
+                expression = expression.replace("A", address)
+            elif "M" in expression or dest & DEST_M:
+                address = "address"
+                body.append(f"address = A & {ADDRESS_MASK}")
+            if "M" in expression:
+                expression = expression.replace("M", f"ram[{address}]")
+            if any(op in expression for op in "+-"):
+                expression = f"({expression} + 32768 & 65535) - 32768"
+            if jump:
+                # 跳转地址是本周期开始时 A 的值
+                if constant_a is not None:
+                    target = str(constant_a)
+                else:
+                    target = "target"
+                    body.append(f"target = A & {ADDRESS_MASK}")
+            # 先用旧的 A 作为地址写 M，再更新 A 和 D
+            registers = []
+            if dest & DEST_M:
+                registers.append(f"ram[{address}]")
+            if dest & DEST_A:
+                registers.append("A")
+                constant_a = None
+            if dest & DEST_D:
+                registers.append("D")
+            if len(registers) == 1 and not jump:
+                body.append(f"{registers[0]} = {expression}")
+            elif registers or jump != 0b111:
+                body.append(f"out = {expression}")
+                body.extend(f"{register} = out" for register in registers)
+            if jump:
+                jump_pc = pc - 1
+                # 死循环：停机时返回 ~target
+                halt_targets = [jump_pc]
+                if jump_pc and rom[jump_pc - 1] == jump_pc - 1:
+                    halt_targets.append(jump_pc - 1)
+                if dest:
+                    result = target
+                elif target == "target":
+                    halt = " or ".join(f"target == {t}" for t in halt_targets)
+                    result = f"~target if {halt} else target"
+                else:
+                    result = f"~{target}" if int(target) in halt_targets else target
+                if jump == 0b111:
+                    body.append(f"return {result}, A, D")
+                    return self._block_function(start, body), pc - start
+                body.append(f"if {JUMP_EXPRESSIONS[jump]}:")
+                body.append(f"    return {result}, A, D")
+                break
+        body.append(f"return {pc}, A, D")
+        return self._block_function(start, body), pc - start
+
+    @staticmethod
+    def _block_function(start: int, body: List[str]) -> str:
+        lines = [f"def block_{start}(A, D, ram=ram):"]
+        lines.extend("    " + line for line in body)
+        return "\n".join(lines)
+
+    def compile_block(self, start: int) -> Block:
+        """翻译并编译从 start 开始的基本块，结果缓存在 self.blocks 中。"""
+        source, length = self.block_source(start)
+        namespace = {"ram": self.ram}
+        exec(compile(source, f"<block {start}>", "exec"), namespace)
+        block = (namespace[f"block_{start}"], length)
+        self.blocks[start] = block
+        return block
+
+    def run(self, max_cycles: int | None = None) -> int:
+        if self.halted:
+            return 0
+        blocks = self.blocks
+        program_size = self.program_size
+        remaining = max_cycles if max_cycles is not None else -1
+        pc, a, d = self.pc, self.a, self.d
+        executed = 0
+        try:
+            while pc < program_size:
+                block = blocks[pc] or self.compile_block(pc)
+                function, length = block
+                if 0 <= remaining < length:
+                    break
+                pc, a, d = function(a, d)
+                executed += length
+                remaining -= length
+                if pc < 0:
+                    pc = ~pc
+                    self.halted = True
+                    break
+            else:
+                self.halted = True
+        finally:
+            self.pc, self.a, self.d = pc, a, d
+            self.cycles += executed
+        if not self.halted and remaining > 0:
+            # 剩余的周期不足一个块，逐条执行
+            start = self.cycles
+            super().run(remaining)
+            executed += self.cycles - start
+        return executed
@@ -0,0 +1,76 @@
+"""
+汇编结果的磁盘缓存：以“源文件内容 + 汇编器版本 + 输出格式”的哈希为键，
+保存上一次生成的 .hack/.hackb 文件内容。
+
+缓存总大小超过上限时按最近使用时间（LRU）淘汰最旧的条目。
+"""
+
+import hashlib
+import os
+import pathlib
+import tempfile
+
+from assembler import ASSEMBLER_VERSION
+
+DEFAULT_CACHE_DIR = pathlib.Path(".hack_cache")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class BuildCache:
+    def __init__(
+        self,
+        cache_dir: str | pathlib.Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(source: bytes, suffix: str, options: str = "") -> str:
+        """返回缓存键：汇编器版本、输出格式、汇编选项与源文件内容共同的 SHA-256。"""
+        digest = hashlib.sha256(
+            f"{ASSEMBLER_VERSION}\0{suffix}\0{options}\0".encode()
+        )
+        digest.update(source)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        """返回缓存的输出内容，未命中时返回 None；命中的条目被标记为最近使用。"""
+        entry_path = self.cache_dir / key
+        try:
+            data = entry_path.read_bytes()
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """保存输出内容，然后淘汰超出大小上限的旧条目。"""
+        # 先写临时文件再改名，多个进程同时写同一个键也不会读到半个文件
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, self.cache_dir / key)
+        self.evict()
+
+    def evict(self) -> None:
+        """按最近使用时间从旧到新删除条目，直到总大小不超过 max_bytes。"""
+        entries = []
+        for entry_path in self.cache_dir.iterdir():
+            if entry_path.suffix == ".tmp":
+                continue
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry_path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
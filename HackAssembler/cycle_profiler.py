@@ -0,0 +1,329 @@
+"""
+按标签统计周期数的性能分析器：在进程内执行汇编好的程序，借助汇编器登记的标签表
+（见 source_map.py）把每个周期归到所在的标签和函数上。
+
+- 平坦分析：每条指令的周期数归到它之前最近的标签上，包括 Math.multiply 这样的函数标签、
+  Math.multiply$IF_TRUE0 这样的跳转标签和 VMTranslator 生成的 End$... 返回标签；
+- 调用图：跳转到函数标签视为调用，返回地址为跳转指令的下一条指令，跳转到调用栈中的
+  返回地址视为返回。输出 flamegraph.pl 等工具使用的折叠栈格式，或 pstats 可读取的
+  统计文件（各项“时间”的单位是周期）。
+  VMTranslator 的共享调用模式中，函数由 $CALL 子程序跳转进入，返回地址不是跳转的下一条指令，
+  而是调用处压入栈帧的 End$... 标签，从新栈帧的 LCL - 5 读取；$RETURN 跳回这个标签时视为返回。
+
+函数标签默认是 VM 函数名，即含 "." 且不含 "$" 的标签。
+执行基于 BlockMachine：基本块内没有跳转，每个块只做一次统计，周期数与 HackMachine 相同。
+
+运行方式：python cycle_profiler.py data/pong/Pong.asm --cycles 1000000 --folded pong.folded
+"""
+
+import argparse
+import marshal
+import pathlib
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from assembler import assemble
+from block_translator import BlockMachine
+from dead_code import DeadCodeEliminator
+from emulator import HackMachine
+from source_map import SourceMap
+
+ROOT = "<start>"  # 第一个函数被调用之前（如引导代码）所在的栈帧
+SHARED_CALL_LABEL = "$CALL"  # VMTranslator 共享调用模式的调用子程序
+LCL = 1
+
+
+def is_function_label(name: str) -> bool:
+    """VM 函数名形如 Class.function，VM 翻译器生成的其他标签都含 "$" 或不含 "."。"""
+    return "." in name and "$" not in name
+
+
+class CycleProfiler(BlockMachine):
+    """与 BlockMachine 接口相同，执行时按标签和调用栈统计周期数。"""
+
+    def __init__(
+        self,
+        rom=(),
+        source_map: SourceMap | None = None,
+        is_function: Callable[[str], bool] = is_function_label,
+        file_name: str = "",
+    ) -> None:
+        self.source_map = source_map if source_map is not None else SourceMap()
+        self.is_function = is_function
+        self.file_name = file_name
+        super().__init__(rom)
+
+    @classmethod
+    def from_source(
+        cls, source_file_path: str | pathlib.Path, dead_code: bool = False
+    ) -> "CycleProfiler":
+        """在进程内汇编 .asm 文件，并使用汇编时登记的标签表。
+
+        dead_code 为 True 时先删除不可达代码（含完整 OS 的程序通常超出 ROM 大小）。
+        """
+        source_map = SourceMap()
+        eliminator = DeadCodeEliminator() if dead_code else None
+        with open(source_file_path, "r") as f:
+            words = assemble(f, source_map=source_map, eliminator=eliminator)
+        return cls(words, source_map, file_name=str(source_file_path))
+
+    @classmethod
+    def from_file(
+        cls,
+        source_file_path: str | pathlib.Path,
+        source_map_file_path: str | pathlib.Path | None = None,
+    ) -> "CycleProfiler":
+        """加载 .hack 或 .hackb 文件，标签表从汇编时输出的源码映射文件读取。"""
+        machine = HackMachine.from_file(source_file_path)
+        source_map = (
+            SourceMap.load(source_map_file_path) if source_map_file_path else None
+        )
+        return cls(
+            machine.rom[: machine.program_size],
+            source_map,
+            file_name=str(source_file_path),
+        )
+
+    def load_rom(self, words) -> None:
+        super().load_rom(words)
+        # 函数入口地址 -> 函数名
+        self.function_entries: Dict[int, str] = {
+            address: name
+            for address, name in self.source_map.labels()
+            if self.is_function(name)
+        }
+
+    def reset(self) -> None:
+        super().reset()
+        self.clear()
+
+    def clear(self) -> None:
+        """清空统计结果，调用栈回到 ROOT。"""
+        self.block_counts: Dict[Tuple[int, int], int] = {}  # (起始地址, 长度) -> 次数
+        self.stack_cycles: Dict[Tuple[str, ...], int] = {}  # 调用栈 -> 周期数
+        self.calls: Dict[Tuple[str, str], int] = {}  # (调用者, 被调用者) -> 次数
+        self.primitive_calls: Dict[Tuple[str, str], int] = {}  # 不含递归调用
+        self.stack: Tuple[str, ...] = (ROOT,)
+        self.return_addresses: List[int] = []  # 与 stack[1:] 一一对应
+
+    def _record(self, start: int, length: int, next_pc: int) -> None:
+        """统计从 start 开始连续执行的 length 条指令，并根据下一个 pc 更新调用栈。"""
+        stack = self.stack
+        self.stack_cycles[stack] = self.stack_cycles.get(stack, 0) + length
+        key = (start, length)
+        self.block_counts[key] = self.block_counts.get(key, 0) + 1
+        if next_pc == start + length:
+            return
+        callee = self.function_entries.get(next_pc)
+        if callee is not None:
+            edge = (stack[-1], callee)
+            self.calls[edge] = self.calls.get(edge, 0) + 1
+            if callee not in stack:
+                self.primitive_calls[edge] = self.primitive_calls.get(edge, 0) + 1
+            if self.source_map.label_of(start) == SHARED_CALL_LABEL:
+                return_address = self.ram[self.ram[LCL] - 5]
+            else:
+                return_address = start + length
+            self.return_addresses.append(return_address)
+            self.stack = stack + (callee,)
+        elif next_pc in self.return_addresses:
+            # 返回到最近一次以 next_pc 为返回地址的调用处
+            depth = len(self.return_addresses) - self.return_addresses[::-1].index(
+                next_pc
+            )
+            del self.return_addresses[depth - 1 :]
+            self.stack = stack[:depth]
+
+    def run(self, max_cycles: int | None = None) -> int:
+        if self.halted:
+            return 0
+        blocks = self.blocks
+        program_size = self.program_size
+        record = self._record
+        remaining = max_cycles if max_cycles is not None else -1
+        pc, a, d = self.pc, self.a, self.d
+        executed = 0
+        try:
+            while pc < program_size:
+                function, length = blocks[pc] or self.compile_block(pc)
+                if 0 <= remaining < length:
+                    break
+                next_pc, a, d = function(a, d)
+                executed += length
+                remaining -= length
+                if next_pc < 0:
+                    record(pc, length, ~next_pc)
+                    pc = ~next_pc
+                    self.halted = True
+                    break
+                record(pc, length, next_pc)
+                pc = next_pc
+            else:
+                self.halted = True
+        finally:
+            self.pc, self.a, self.d = pc, a, d
+            self.cycles += executed
+        # 剩余的周期不足一个块，逐条执行
+        while not self.halted and remaining > 0:
+            if self.pc >= program_size:
+                self.halted = True
+                break
+            pc = self.pc
+            HackMachine.step(self)
+            record(pc, 1, self.pc)
+            executed += 1
+            remaining -= 1
+        return executed
+
+    def address_cycles(self) -> array:
+        """返回每个 ROM 地址执行的周期数。"""
+        counts = array("Q", bytes(8 * self.program_size))
+        for (start, length), count in self.block_counts.items():
+            for address in range(start, start + length):
+                counts[address] += count
+        return counts
+
+    def flat_profile(self) -> List[Tuple[str, int]]:
+        """返回按周期数降序排列的 (标签, 周期数)，周期数归到指令之前最近的标签。"""
+        labels = self.source_map.labels()
+        addresses = [address for address, _ in labels]
+        cycles: Dict[str, int] = {}
+        for address, count in enumerate(self.address_cycles()):
+            if count:
+                index = bisect_right(addresses, address)
+                name = labels[index - 1][1] if index else ROOT
+                cycles[name] = cycles.get(name, 0) + count
+        return sorted(cycles.items(), key=lambda item: item[1], reverse=True)
+
+    def function_profile(self) -> List[Tuple[str, int, int, int]]:
+        """返回按自身周期数降序排列的 (函数, 调用次数, 自身周期数, 累计周期数)。"""
+        calls: Dict[str, int] = {ROOT: 0}
+        for (_, callee), count in self.calls.items():
+            calls[callee] = calls.get(callee, 0) + count
+        self_cycles = dict.fromkeys(calls, 0)
+        total_cycles = dict.fromkeys(calls, 0)
+        for stack, cycles in self.stack_cycles.items():
+            self_cycles[stack[-1]] += cycles
+            # 递归调用时同一个函数在栈中出现多次，累计周期数只算一次
+            for name in set(stack):
+                total_cycles[name] += cycles
+        rows = [
+            (name, calls[name], self_cycles[name], total_cycles[name])
+            for name in calls
+        ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def folded_stacks(self) -> Iterator[str]:
+        """按折叠栈格式（"ROOT;f;g 周期数"）逐行输出，可直接交给 flamegraph.pl。"""
+        for stack, cycles in sorted(self.stack_cycles.items()):
+            yield f"{';'.join(stack)} {cycles}"
+
+    def _stats_key(self, name: str) -> Tuple[str, int, str]:
+        line_num = 0
+        for address, entry in self.function_entries.items():
+            if entry == name and address < len(self.source_map):
+                line_num = self.source_map.line_of(address)
+                break
+        return self.file_name, line_num, name
+
+    def stats(self) -> dict:
+        """返回 pstats 格式的统计字典，时间的单位是周期。
+
+        {(文件, 行号, 函数): (原始调用次数, 调用次数, 自身周期数, 累计周期数, 调用者)}，
+        调用者为 {(文件, 行号, 函数): (原始调用次数, 调用次数, 自身周期数, 累计周期数)}。
+        """
+        edge_cycles: Dict[Tuple[str, str], List[int]] = {}
+        for stack, cycles in self.stack_cycles.items():
+            seen = set()
+            for depth, name in enumerate(stack[1:], start=1):
+                if name in seen:
+                    continue
+                seen.add(name)
+                edge = edge_cycles.setdefault((stack[depth - 1], name), [0, 0])
+                if depth == len(stack) - 1:
+                    edge[0] += cycles
+                edge[1] += cycles
+        keys = {name: self._stats_key(name) for name, *_ in self.function_profile()}
+        stats = {}
+        for name, calls, self_cycles, total_cycles in self.function_profile():
+            primitive_calls = sum(
+                count
+                for (_, callee), count in self.primitive_calls.items()
+                if callee == name
+            )
+            callers = {}
+            for (caller, callee), count in self.calls.items():
+                if callee == name:
+                    tt, ct = edge_cycles.get((caller, callee), (0, 0))
+                    primitive = self.primitive_calls.get((caller, callee), 0)
+                    callers[keys[caller]] = (primitive, count, tt, ct)
+            stats[keys[name]] = (
+                primitive_calls,
+                calls,
+                self_cycles,
+                total_cycles,
+                callers,
+            )
+        return stats
+
+    def dump_stats(self, dest_file_path: str | pathlib.Path) -> None:
+        """写出 pstats 统计文件，可用 pstats.Stats(dest_file_path) 读取。"""
+        with open(dest_file_path, "wb") as f:
+            marshal.dump(self.stats(), f)
+
+
+def _print_table(header: str, rows: List[str]) -> None:
+    print(header)
+    for row in rows:
+        print(row)
+    print()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hack 程序按标签统计周期数")
+    arg_parser.add_argument(
+        "source", type=pathlib.Path, help=".asm 文件，或配合 --source-map 的 .hack/.hackb"
+    )
+    arg_parser.add_argument(
+        "--source-map", type=pathlib.Path, help=".hack/.hackb 对应的源码映射文件"
+    )
+    arg_parser.add_argument(
+        "--cycles", type=int, default=None, help="最多执行的周期数"
+    )
+    arg_parser.add_argument(
+        "--dead-code", action="store_true", help="汇编 .asm 前删除不可达代码"
+    )
+    arg_parser.add_argument("--top", type=int, default=20, help="输出的行数")
+    arg_parser.add_argument("--folded", type=pathlib.Path, help="写出折叠栈文件")
+    arg_parser.add_argument("--pstats", type=pathlib.Path, help="写出 pstats 统计文件")
+    args = arg_parser.parse_args()
+
+    if args.source.suffix == ".asm":
+        profiler = CycleProfiler.from_source(args.source, args.dead_code)
+    else:
+        profiler = CycleProfiler.from_file(args.source, args.source_map)
+    profiler.run(args.cycles)
+    total = profiler.cycles or 1
+    _print_table(
+        f"{profiler.cycles} cycles{' (halted)' if profiler.halted else ''}\n\n"
+        f"{'cycles':>12} {'%':>6}  label",
+        [
+            f"{cycles:>12} {100 * cycles / total:6.2f}  {name}"
+            for name, cycles in profiler.flat_profile()[: args.top]
+        ],
+    )
+    _print_table(
+        f"{'calls':>10} {'self':>12} {'cumulative':>12}  function",
+        [
+            f"{calls:>10} {self_cycles:>12} {total_cycles:>12}  {name}"
+            for name, calls, self_cycles, total_cycles in profiler.function_profile()[
+                : args.top
+            ]
+        ],
+    )
+    if args.folded:
+        with open(args.folded, "w") as f:
+            f.writelines(line + "\n" for line in profiler.folded_stacks())
+    if args.pstats:
+        profiler.dump_stats(args.pstats)
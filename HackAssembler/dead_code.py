@@ -0,0 +1,143 @@
+"""
+不可达代码消除：按标签和跳转把命令流划分为基本块，从地址 0 出发标记可达的基本块，
+在编码之前删除不可达的基本块；第一遍扫描时标签地址会随之重新计算。
+
+Hack 的跳转目标总是 A 寄存器的值：
+- 跳转前最近一次加载到 A 的是标签时，是到该标签的直接跳转；
+- A 来自内存或计算结果（如 VM 的 return 通过 A=M 跳转）时是间接跳转，其目标只可能是
+  被当作数据取过地址（comp 中读取了 A）的标签，这些标签本身就被视为可达的入口；
+- A 是数字、变量或预定义符号时无法确定目标，此时放弃优化，原样返回。
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+ENTRY_ADDRESS = 0
+
+
+class BasicBlock:
+    def __init__(self, start: int, end: int) -> None:
+        self.start = start  # 块在命令序列中的下标范围 [start, end)
+        self.end = end
+        self.falls_through = True  # 是否会顺序执行进入下一块
+        self.jump_labels: List[str] = []  # 直接跳转的目标标签
+        self.taken_labels: List[str] = []  # 被当作数据取地址的标签
+
+
+class UnresolvedJumpError(ValueError):
+    """跳转目标是数字或变量，无法确定会跳转到哪个基本块。"""
+
+
+def build_blocks(
+    commands: List[Tuple[int, str]]
+) -> Tuple[List[BasicBlock], Dict[str, int]]:
+    """划分基本块，返回基本块列表以及标签到其所在基本块下标的映射。
+
+    标签所在的命令和跳转指令的下一条命令都是新基本块的开始。
+    """
+    labels = {command[1:-1] for _, command in commands if command[0] == "("}
+    leaders = {0}
+    for index, (_, command) in enumerate(commands):
+        if command[0] == "(":
+            leaders.add(index)
+        elif command[0] != "@" and ";" in command:
+            leaders.add(index + 1)
+    starts = sorted(leader for leader in leaders if leader < len(commands))
+    ends = starts[1:] + [len(commands)]
+    blocks = [BasicBlock(start, end) for start, end in zip(starts, ends)]
+
+    label_blocks: Dict[str, int] = {}
+    known_a = None  # 最近一次加载到 A 的符号，A 被改写或无法确定时为 None
+    for block_index, block in enumerate(blocks):
+        for _, command in commands[block.start : block.end]:
+            if command[0] == "(":
+                label_blocks.setdefault(command[1:-1], block_index)
+                continue
+            if command[0] == "@":
+                known_a = command[1:]
+                continue
+            dest, _, rest = command.rpartition("=")
+            comp, _, jump = rest.partition(";")
+            if "A" in comp and known_a in labels:
+                block.taken_labels.append(known_a)
+            if jump:
+                if known_a in labels:
+                    block.jump_labels.append(known_a)
+                elif known_a is not None:
+                    raise UnresolvedJumpError(f"cannot resolve jump target {known_a}")
+                if jump == "JMP":
+                    # 之后的块只能通过跳转进入，进入时 A 的值未知
+                    block.falls_through = False
+                    known_a = None
+            if "A" in dest:
+                known_a = None
+    return blocks, label_blocks
+
+
+def reachable_blocks(
+    blocks: List[BasicBlock], label_blocks: Dict[str, int]
+) -> Set[int]:
+    """从入口所在的基本块出发，返回所有可达基本块的下标。"""
+    reachable: Set[int] = set()
+    work = [ENTRY_ADDRESS] if blocks else []
+    while work:
+        index = work.pop()
+        if index in reachable:
+            continue
+        reachable.add(index)
+        block = blocks[index]
+        if block.falls_through and index + 1 < len(blocks):
+            work.append(index + 1)
+        work.extend(label_blocks[label] for label in block.jump_labels)
+        work.extend(label_blocks[label] for label in block.taken_labels)
+    return reachable
+
+
+class DeadCodeEliminator:
+    """对 (源文件行号, 命令) 序列做不可达代码消除，并统计节省的 ROM 字数。"""
+
+    def __init__(self) -> None:
+        self.words_before = 0
+        self.words_after = 0
+        self.blocks = 0
+        self.dropped_blocks = 0
+        self.dropped_labels: List[str] = []
+
+    @property
+    def words_saved(self) -> int:
+        return self.words_before - self.words_after
+
+    def optimize(self, commands: Iterable[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        commands = list(commands)
+        words = sum(1 for _, command in commands if command[0] != "(")
+        self.words_before += words
+        try:
+            blocks, label_blocks = build_blocks(commands)
+        except UnresolvedJumpError:
+            # 存在无法确定目标的跳转，保守地不做任何删除
+            self.words_after += words
+            return commands
+        reachable = reachable_blocks(blocks, label_blocks)
+
+        output = []
+        for index, block in enumerate(blocks):
+            block_commands = commands[block.start : block.end]
+            if index in reachable:
+                output.extend(block_commands)
+            else:
+                self.dropped_blocks += 1
+                self.dropped_labels.extend(
+                    command[1:-1] for _, command in block_commands if command[0] == "("
+                )
+        self.blocks += len(blocks)
+        self.words_after += sum(1 for _, command in output if command[0] != "(")
+        return output
+
+    def stats(self) -> dict:
+        return {
+            "words_before": self.words_before,
+            "words_after": self.words_after,
+            "words_saved": self.words_saved,
+            "blocks": self.blocks,
+            "dropped_blocks": self.dropped_blocks,
+            "dropped_labels": self.dropped_labels,
+        }
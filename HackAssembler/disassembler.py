@@ -0,0 +1,138 @@
+"""
+反汇编：把 .hack/.hackb 机器码还原为 Hack 汇编。
+
+由 code_writer 中三张编码表的反向映射预先计算出全部 65536 个字对应的汇编文本，
+反汇编每条指令只需一次查表；输入逐字读取，输出逐行写出，不需要把整个程序读入内存。
+
+给定源码映射（见 source_map.py）时恢复标签：在标签地址处输出 (LABEL)，
+并把紧跟着跳转指令的 A-指令（即跳转目标）写成 @LABEL。
+其他 A-指令无法区分是地址还是常数，仍然输出数字。
+
+运行方式：python disassembler.py data/pong/Pong.hack [Pong.asm] [--source-map Pong.hackmap]
+"""
+
+import argparse
+import pathlib
+import sys
+from typing import Iterable, Iterator, List, Tuple
+
+from code_writer import COMP_SYMBOL_DICT, DEST_SYMBOL_DICT, JUMP_SYMBOL_DICT
+from hack_binary import HACKB_SUFFIX, load_hackb
+from source_map import SourceMap
+
+COMP_NAMES = {int(code, 2): symbol for symbol, code in COMP_SYMBOL_DICT.items()}
+DEST_NAMES = {int(code, 2): symbol for symbol, code in DEST_SYMBOL_DICT.items()}
+JUMP_NAMES = {int(code, 2): symbol for symbol, code in JUMP_SYMBOL_DICT.items()}
+C_PREFIX = 0b111 << 13
+
+
+def decode(word: int) -> str:
+    """逐个域解码一个 16 位字；不是合法指令的字输出为注释。"""
+    if word < 0x8000:
+        return f"@{word}"
+    comp = COMP_NAMES.get(word >> 6 & 0b1111111)
+    if word & C_PREFIX != C_PREFIX or comp is None:
+        return f"// invalid {word:016b}"
+    dest = DEST_NAMES.get(word >> 3 & 0b111)
+    jump = JUMP_NAMES.get(word & 0b111)
+    command = comp
+    if dest:
+        command = f"{dest}={command}"
+    if jump:
+        command = f"{command};{jump}"
+    return command
+
+
+DECODE_TABLE: Tuple[str, ...] = tuple(decode(word) for word in range(1 << 16))
+# 带跳转的 C-指令，它前面的 A-指令是跳转目标
+JUMP_WORDS = frozenset(
+    word
+    for word in range(C_PREFIX, 1 << 16)
+    if word & 0b111 and not DECODE_TABLE[word].startswith("//")
+)
+
+
+def disassemble(
+    words: Iterable[int], source_map: SourceMap | None = None
+) -> Iterator[str]:
+    """逐条产生汇编命令（不含换行符）。"""
+    table = DECODE_TABLE
+    if source_map is None:
+        yield from map(table.__getitem__, words)
+        return
+
+    labels: List[Tuple[int, str]] = source_map.labels()
+    label_names = {}
+    for address, name in labels:
+        label_names.setdefault(address, name)
+    label_index = 0
+    previous = None  # 上一条指令要等看到下一条指令后才能确定是否写成 @LABEL
+    for address, word in enumerate(words):
+        if previous is not None:
+            if word in JUMP_WORDS and previous in label_names:
+                yield f"@{label_names[previous]}"
+            else:
+                yield table[previous]
+        while label_index < len(labels) and labels[label_index][0] == address:
+            yield f"({labels[label_index][1]})"
+            label_index += 1
+        if word < 0x8000:
+            previous = word
+        else:
+            previous = None
+            yield table[word]
+    if previous is not None:
+        yield table[previous]
+    # 程序末尾的标签（如紧跟在最后一条指令之后的标签）
+    for _, name in labels[label_index:]:
+        yield f"({name})"
+
+
+def read_words(source_file_path: pathlib.Path) -> Iterable[int]:
+    """逐字读取 .hack 或 .hackb 文件。"""
+    if source_file_path.suffix == HACKB_SUFFIX:
+        yield from load_hackb(source_file_path)
+        return
+    with open(source_file_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield int(line, 2)
+
+
+def disassemble_file(
+    source_file_path: pathlib.Path,
+    dest_file_path: pathlib.Path | None = None,
+    source_map_file_path: pathlib.Path | None = None,
+) -> int:
+    """反汇编 .hack/.hackb 文件，写出到 dest_file_path（为 None 时写到标准输出）。
+
+    返回输出的行数。
+    """
+    source_map = None
+    if source_map_file_path is not None:
+        source_map = SourceMap.load(source_map_file_path)
+    lines = disassemble(read_words(source_file_path), source_map)
+    count = 0
+    dest = open(dest_file_path, "w") if dest_file_path is not None else sys.stdout
+    try:
+        for line in lines:
+            dest.write(line + "\n")
+            count += 1
+    finally:
+        if dest is not sys.stdout:
+            dest.close()
+    return count
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hack 反汇编器")
+    arg_parser.add_argument("source", type=pathlib.Path, help=".hack 或 .hackb 文件")
+    arg_parser.add_argument(
+        "dest", type=pathlib.Path, nargs="?", help="输出的 .asm 文件，默认为标准输出"
+    )
+    arg_parser.add_argument(
+        "--source-map", type=pathlib.Path, help="用于恢复标签的源码映射文件"
+    )
+    args = arg_parser.parse_args()
+    disassemble_file(args.source, args.dest, args.source_map)
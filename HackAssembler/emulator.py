@@ -0,0 +1,186 @@
+"""
+Hack CPU 模拟器：在进程内执行 .hack/.hackb 机器码。
+
+ROM 与 RAM 都保存在 array('h') 中（16 位有符号整数，与 Hack 的 16 位补码运算一致）。
+指令语义由 code_writer 中的编码表推导：comp 助记符直接作为表达式求值，
+dest/jump 的三位编码按位解释。每个周期都重新解码当前指令。
+
+程序结束时通常停在 (END) @END 0;JMP 这样的死循环上，run() 检测到这种
+不再改变机器状态的跳转后停止；执行到程序末尾之后也会停止。
+
+运行方式：python emulator.py data/max/Max.hack --set 0=3 --set 1=5 --ram 0:3
+"""
+
+import argparse
+import json
+import pathlib
+from array import array
+from typing import Callable, Dict, Iterable
+
+from code_writer import COMP_SYMBOL_DICT
+from hack_binary import HACKB_SUFFIX, load_hackb, read_hack
+
+ROM_SIZE = 32768
+RAM_SIZE = 32768  # 地址只取 A 的低 15 位，24577 及以上的地址不对应任何设备
+ADDRESS_MASK = 0x7FFF
+
+# dest 三位编码的各位
+DEST_A = 0b100
+DEST_D = 0b010
+DEST_M = 0b001
+
+
+def to_signed(value: int) -> int:
+    """把整数截断为 16 位补码表示的有符号整数。"""
+    return (value + 0x8000 & 0xFFFF) - 0x8000
+
+
+def _comp_function(symbol: str) -> Callable[[int, int, int], int]:
+    expression = symbol.replace("!", "~")
+    return eval(f"lambda D, A, M: {expression}")
+
+
+# 7 位 comp 编码（含 a 位）-> f(D, A, M)，结果还需截断为 16 位
+COMP_FUNCTIONS: Dict[int, Callable[[int, int, int], int]] = {
+    int(code, 2): _comp_function(symbol)
+    for symbol, code in COMP_SYMBOL_DICT.items()
+}
+# 3 位 jump 编码 -> 是否跳转
+JUMP_CONDITIONS: Dict[int, Callable[[int], bool]] = {
+    0b000: lambda out: False,
+    0b001: lambda out: out > 0,
+    0b010: lambda out: out == 0,
+    0b011: lambda out: out >= 0,
+    0b100: lambda out: out < 0,
+    0b101: lambda out: out != 0,
+    0b110: lambda out: out <= 0,
+    0b111: lambda out: True,
+}
+
+
+class HackMachine:
+    """Hack 计算机：寄存器 pc/a/d，存储器 rom/ram，以及已执行的周期数 cycles。"""
+
+    def __init__(self, rom: Iterable[int] = ()) -> None:
+        self.rom = array("h", bytes(2 * ROM_SIZE))
+        self.ram = array("h", bytes(2 * RAM_SIZE))
+        self.load_rom(rom)
+
+    @classmethod
+    def from_file(cls, source_file_path: str | pathlib.Path) -> "HackMachine":
+        """从 .hack 或 .hackb 文件加载程序。"""
+        source_file_path = pathlib.Path(source_file_path)
+        if source_file_path.suffix == HACKB_SUFFIX:
+            return cls(load_hackb(source_file_path))
+        return cls(read_hack(source_file_path))
+
+    def load_rom(self, words: Iterable[int]) -> None:
+        """加载程序（无符号或有符号的 16 位机器码均可），清空 RAM 并复位。"""
+        rom = array("h", (to_signed(word) for word in words))
+        if len(rom) > ROM_SIZE:
+            raise ValueError(f"program has {len(rom)} words, ROM holds {ROM_SIZE}")
+        self.program_size = len(rom)
+        rom.frombytes(bytes(2 * (ROM_SIZE - len(rom))))
+        self.rom = rom
+        self.ram = array("h", bytes(2 * RAM_SIZE))
+        self.reset()
+
+    def reset(self) -> None:
+        """复位寄存器；与硬件的 reset 一样不清空 RAM。"""
+        self.pc = 0
+        self.a = 0
+        self.d = 0
+        self.cycles = 0
+        self.halted = False
+
+    @property
+    def m(self) -> int:
+        """当前 A 所指向的内存单元 M。"""
+        return self.ram[self.a & ADDRESS_MASK]
+
+    def registers(self) -> dict:
+        return {"pc": self.pc, "a": self.a, "d": self.d, "cycles": self.cycles}
+
+    def step(self) -> None:
+        """执行一条指令。"""
+        pc = self.pc
+        word = self.rom[pc]
+        self.cycles += 1
+        if word >= 0:
+            # A-指令：最高位为 0
+            self.a = word
+            self.pc = pc + 1
+            return
+        word &= 0xFFFF
+        comp = word >> 6 & 0b1111111
+        dest = word >> 3 & 0b111
+        jump = word & 0b111
+        a = self.a
+        try:
+            function = COMP_FUNCTIONS[comp]
+        except KeyError:
+            raise ValueError(f"invalid instruction {word:016b} at ROM[{pc}]")
+        out = to_signed(function(self.d, a, self.ram[a & ADDRESS_MASK]))
+        # 先用旧的 A 作为地址写 M，再更新 A 和 D
+        if dest & DEST_M:
+            self.ram[a & ADDRESS_MASK] = out
+        if dest & DEST_A:
+            self.a = out
+        if dest & DEST_D:
+            self.d = out
+        if JUMP_CONDITIONS[jump](out):
+            target = a & ADDRESS_MASK
+            if not dest and self.is_halt_loop(pc, target):
+                self.halted = True
+            self.pc = target
+        else:
+            self.pc = pc + 1
+
+    def is_halt_loop(self, pc: int, target: int) -> bool:
+        """位于 pc 的无 dest 跳转指令跳到 target 后，是否会永远重复而不改变任何状态。"""
+        # 跳到自身（A 已经是 pc），或跳回前一条加载自身地址的 A-指令
+        return target == pc or (target == pc - 1 and self.rom[target] == target)
+
+    def run(self, max_cycles: int | None = None) -> int:
+        """执行到程序停在死循环上或执行完 max_cycles 个周期，返回本次执行的周期数。"""
+        start = self.cycles
+        step = self.step
+        while not self.halted:
+            if max_cycles is not None and self.cycles - start >= max_cycles:
+                break
+            if self.pc >= self.program_size:
+                self.halted = True
+                break
+            step()
+        return self.cycles - start
+
+
+def _ram_range(text: str) -> range:
+    start, _, stop = text.partition(":")
+    return range(int(start), int(stop) if stop else int(start) + 1)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hack CPU 模拟器")
+    arg_parser.add_argument("source", type=pathlib.Path, help=".hack 或 .hackb 文件")
+    arg_parser.add_argument(
+        "--cycles", type=int, default=None, help="最多执行的周期数"
+    )
+    arg_parser.add_argument(
+        "--set", action="append", default=[], help="运行前设置 RAM，如 0=3"
+    )
+    arg_parser.add_argument(
+        "--ram", action="append", default=[], help="运行后输出的 RAM 范围，如 0:3"
+    )
+    args = arg_parser.parse_args()
+
+    machine = HackMachine.from_file(args.source)
+    for assignment in args.set:
+        address, _, value = assignment.partition("=")
+        machine.ram[int(address)] = to_signed(int(value))
+    machine.run(args.cycles)
+    report = machine.registers()
+    report["halted"] = machine.halted
+    for text in args.ram:
+        report.update({f"RAM[{i}]": machine.ram[i] for i in _ram_range(text)})
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,171 @@
+"""
+可重定位目标文件（.hobj）：单独汇编一个 .asm 模块的结果，由 linker.py 链接为最终的 .hack。
+
+模块中的地址都从 0 开始，目标文件保存：
+- 机器码：引用本模块标签的 A-指令中是相对地址，引用外部符号的 A-指令中是占位字 0；
+- 导出标签：本模块定义的全部标签及其相对地址（Hack 汇编的标签都是全局的）；
+- 重定位表：需要加上模块基地址的 A-指令地址；
+- 未解析引用：外部符号及引用它的 A-指令地址，链接时解析为其他模块的标签或变量。
+
+文件格式（小端序）：
+    magic        4 字节  b"HOBJ"
+    version      uint16  当前为 1
+    reserved     uint16  保留，写 0
+    word_count   uint32  机器码条数
+    reloc_count  uint32  重定位表项数
+    symbols_size uint32  符号段字节数
+    机器码（uint16 × word_count）、重定位表（uint16 × reloc_count）、
+    符号段（UTF-8 编码的 JSON：模块名、导出标签与未解析引用）
+"""
+
+import json
+import pathlib
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List
+
+from assembler import encode_c_instruction, iter_commands
+from symbol_table import SymbolTable
+
+MAGIC = b"HOBJ"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII")
+HOBJ_SUFFIX = ".hobj"
+
+
+class ObjectModule:
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.words = array("H")
+        self.labels: Dict[str, int] = {}  # 导出标签 -> 相对地址
+        self.relocations = array("H")  # 按地址升序排列
+        self.references: Dict[str, List[int]] = {}  # 外部符号 -> 引用它的指令地址
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+
+def assemble_object(source: str | Iterable[str], name: str = "") -> ObjectModule:
+    """把一个模块汇编为可重定位目标模块。
+
+    数字与预定义符号直接编码为绝对地址；本模块中定义的标签编码为相对地址并登记重定位；
+    其余符号留待链接时解析。
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    module = ObjectModule(name)
+    symbol_table = SymbolTable()
+    pending: Dict[str, List[int]] = {}
+    for _, command in iter_commands(source):
+        if command[0] == "(":
+            symbol = command[1:-1]
+            if not symbol_table.contains(symbol):
+                symbol_table.add_entry(symbol, len(module.words))
+                module.labels[symbol] = len(module.words)
+            continue
+        if command[0] != "@":
+            module.words.append(encode_c_instruction(command))
+            continue
+        symbol = command[1:]
+        if symbol.isdecimal():
+            module.words.append(int(symbol))
+        elif symbol in module.labels or not symbol_table.contains(symbol):
+            # 标签可能在引用之后才定义，到模块结束时再区分本地标签和外部符号
+            pending.setdefault(symbol, []).append(len(module.words))
+            module.words.append(0)
+        else:
+            module.words.append(symbol_table.get_address(symbol))
+
+    relocations = []
+    for symbol, addresses in pending.items():
+        if symbol in module.labels:
+            for address in addresses:
+                module.words[address] = module.labels[symbol]
+            relocations.extend(addresses)
+        else:
+            module.references[symbol] = addresses
+    module.relocations.extend(sorted(relocations))
+    return module
+
+
+def _to_little_endian(words: array) -> bytes:
+    if sys.byteorder == "big":
+        words = array("H", words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def _from_little_endian(buffer: bytes) -> array:
+    words = array("H", buffer)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words
+
+
+def dumps(module: ObjectModule) -> bytes:
+    """把目标模块编码为 .hobj 格式的字节串。"""
+    symbols = json.dumps(
+        {
+            "name": module.name,
+            "labels": module.labels,
+            "references": module.references,
+        },
+        separators=(",", ":"),
+    ).encode()
+    header = HEADER.pack(
+        MAGIC, VERSION, 0, len(module.words), len(module.relocations), len(symbols)
+    )
+    return (
+        header
+        + _to_little_endian(module.words)
+        + _to_little_endian(module.relocations)
+        + symbols
+    )
+
+
+def loads(buffer: bytes) -> ObjectModule:
+    """从 .hobj 格式的字节串中解码出目标模块。"""
+    if len(buffer) < HEADER.size:
+        raise ValueError("hobj buffer is shorter than its header")
+    magic, version, _, word_count, reloc_count, symbols_size = HEADER.unpack_from(
+        buffer
+    )
+    if magic != MAGIC:
+        raise ValueError(f"bad hobj magic: {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"unsupported hobj version: {version}")
+    words_end = HEADER.size + word_count * 2
+    relocations_end = words_end + reloc_count * 2
+    if len(buffer) != relocations_end + symbols_size:
+        raise ValueError("hobj buffer size does not match its header")
+    symbols = json.loads(buffer[relocations_end:])
+    module = ObjectModule(symbols["name"])
+    module.words = _from_little_endian(buffer[HEADER.size : words_end])
+    module.relocations = _from_little_endian(buffer[words_end:relocations_end])
+    module.labels = symbols["labels"]
+    module.references = symbols["references"]
+    return module
+
+
+def write_object(dest_file_path: str | pathlib.Path, module: ObjectModule) -> None:
+    """把目标模块写入 .hobj 文件。"""
+    with open(dest_file_path, "wb") as f:
+        f.write(dumps(module))
+
+
+def load_object(source_file_path: str | pathlib.Path) -> ObjectModule:
+    """读取 .hobj 文件。"""
+    with open(source_file_path, "rb") as f:
+        return loads(f.read())
+
+
+def compile_file(
+    source_file_path: pathlib.Path, dest_file_path: pathlib.Path | None = None
+) -> pathlib.Path:
+    """把 .asm 文件汇编为同名的 .hobj 文件，返回目标文件路径。"""
+    dest_file_path = dest_file_path or source_file_path.with_suffix(HOBJ_SUFFIX)
+    with open(source_file_path, "r") as f:
+        module = assemble_object(f, name=source_file_path.stem)
+    write_object(dest_file_path, module)
+    return dest_file_path
@@ -0,0 +1,118 @@
+"""
+链接器：把多个可重定位目标模块（见 hack_object.py）按给定顺序拼接为一个程序。
+
+1. 依次为每个模块分配基地址，把各模块导出的标签加上基地址登记到 SymbolTable 中；
+2. 对重定位表中的指令加上所在模块的基地址；
+3. 未解析引用在符号表中查找，仍未定义的符号按首次出现的顺序从 16 开始分配为变量。
+
+链接结果与把各模块源文件按相同顺序拼接后整体汇编的结果相同，
+因此没有变化的模块（如 OS）只需汇编一次，之后每次构建只需要链接。
+
+运行方式：
+    python linker.py -c Main.asm Math.asm          # 只汇编为 .hobj
+    python linker.py Main.asm Math.hobj -o Prog.hack
+"""
+
+import argparse
+import pathlib
+from array import array
+from typing import Iterable, List
+
+from assembler import VARIABLE_BASE_ADDRESS
+from hack_binary import HACKB_SUFFIX, write_hack, write_hackb
+from hack_object import (
+    HOBJ_SUFFIX,
+    ObjectModule,
+    assemble_object,
+    compile_file,
+    load_object,
+)
+from symbol_table import SymbolTable
+
+
+class LinkError(ValueError):
+    """同一个标签在多个模块中定义。"""
+
+
+def link(
+    modules: Iterable[ObjectModule], symbol_table: SymbolTable | None = None
+) -> array:
+    """链接目标模块，返回 16 位机器码组成的 array('H')。
+
+    给定 symbol_table 时把全部标签和变量登记到其中。
+    """
+    modules = list(modules)
+    symbol_table = symbol_table if symbol_table is not None else SymbolTable()
+    bases = []
+    base = 0
+    for module in modules:
+        bases.append(base)
+        for symbol, address in module.labels.items():
+            if symbol_table.contains(symbol):
+                raise LinkError(f"duplicate symbol {symbol} in module {module.name}")
+            symbol_table.add_entry(symbol, base + address)
+        base += len(module)
+
+    words = array("H")
+    for module, base in zip(modules, bases):
+        module_words = array("H", module.words)
+        for address in module.relocations:
+            module_words[address] += base
+        words.extend(module_words)
+
+    register_num = VARIABLE_BASE_ADDRESS
+    for module, base in zip(modules, bases):
+        for symbol, addresses in module.references.items():
+            if not symbol_table.contains(symbol):
+                # 在所有模块中都没有定义为标签的符号就是变量
+                symbol_table.add_entry(symbol, register_num)
+                register_num += 1
+            value = symbol_table.get_address(symbol)
+            for address in addresses:
+                words[base + address] = value
+    return words
+
+
+def load_modules(paths: Iterable[pathlib.Path]) -> List[ObjectModule]:
+    """读取 .hobj 文件；.asm 文件则直接在内存中汇编为目标模块。"""
+    modules = []
+    for path in paths:
+        if path.suffix == HOBJ_SUFFIX:
+            modules.append(load_object(path))
+        else:
+            with open(path, "r") as f:
+                modules.append(assemble_object(f, name=path.stem))
+    return modules
+
+
+def link_files(
+    source_file_paths: Iterable[pathlib.Path], dest_file_path: pathlib.Path
+) -> int:
+    """链接 .hobj/.asm 文件并写出 .hack（或 .hackb）文件，返回指令条数。"""
+    words = link(load_modules(source_file_paths))
+    if dest_file_path.suffix == HACKB_SUFFIX:
+        write_hackb(dest_file_path, words)
+    else:
+        write_hack(dest_file_path, words)
+    return len(words)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hack 目标文件链接器")
+    arg_parser.add_argument(
+        "paths", nargs="+", type=pathlib.Path, help=".hobj 或 .asm 文件"
+    )
+    arg_parser.add_argument(
+        "-o", "--output", type=pathlib.Path, help=".hack 或 .hackb 文件"
+    )
+    arg_parser.add_argument(
+        "-c", "--compile", action="store_true", help="只把 .asm 文件汇编为 .hobj 文件"
+    )
+    args = arg_parser.parse_args()
+    if args.compile:
+        for path in args.paths:
+            print(compile_file(path))
+    elif args.output is None:
+        arg_parser.error("the following arguments are required: -o/--output")
+    else:
+        print(f"{link_files(args.paths, args.output)} words -> {args.output}")
@@ -1,22 +1,79 @@
+import argparse
+import json
 import pathlib
 from parser import Parser
+from typing import List
 
+from assembler import (
+    VARIABLE_BASE_ADDRESS,
+    StreamingAssembler,
+    encode_c_instruction,
+    iter_commands,
+)
+from build_cache import BuildCache
 from code_writer import CodeWriter
+from dead_code import DeadCodeEliminator
+from hack_binary import HACKB_SUFFIX, loads, write_hackb
+from peephole import PeepholeOptimizer
+from source_map import SourceMap
 from symbol_table import SymbolTable
 
 DATA_ROOT = pathlib.Path(r"data")
+WORD_LINE_LENGTH = 17  # .hack 文件中每条指令占 16 位二进制字符加一个换行符
 
 
-def main(source_file_name: str, dest_file_name: str):
+def main(
+    source_file_name: str,
+    dest_file_name: str,
+    cache: BuildCache | None = None,
+    optimizer: PeepholeOptimizer | None = None,
+    eliminator: DeadCodeEliminator | None = None,
+):
     source_file_path = DATA_ROOT / source_file_name
+    dest_file_path = DATA_ROOT / dest_file_name
+    if cache is not None:
+        # 源文件内容没有变化时直接使用缓存中上一次的输出
+        options = []
+        if eliminator is not None:
+            options.append("dead-code")
+        if optimizer is not None:
+            options.append("peephole")
+        with open(source_file_path, "rb") as f:
+            cache_key = cache.key(f.read(), dest_file_path.suffix, ",".join(options))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            dest_file_path.write_bytes(cached)
+            if dest_file_path.suffix == HACKB_SUFFIX:
+                return [f"{word:016b}" for word in loads(cached)]
+            return cached.decode().splitlines()
+
+    command_lines = read_command_lines(source_file_path)
+    parser = Parser(command_lines=command_lines)
+    # 在解析之后、编码之前先删除不可达代码，再做窥孔优化
+    for code_pass in (eliminator, optimizer):
+        if code_pass is not None:
+            parser.lines = [
+                command for _, command in code_pass.optimize(enumerate(parser.lines))
+            ]
+    symbol_table = SymbolTable()
+    first_pass(parser, symbol_table)
+    parser.reset()
+    dest_command = second_pass(parser, symbol_table)
+    write_dest_file(dest_file_path, dest_command)
+    if cache is not None:
+        cache.put(cache_key, dest_file_path.read_bytes())
+    return dest_command
+
+
+def read_command_lines(source_file_path: pathlib.Path) -> List[str]:
     with open(source_file_path, "r") as f:
         command_lines = f.readlines()
-    command_lines = [line.strip() for line in command_lines]
+    return [line.strip() for line in command_lines]
+
 
-    # 第一遍：构建符号表但不生成代码
+def first_pass(parser: Parser, symbol_table: SymbolTable) -> None:
+    """第一遍：构建符号表但不生成代码"""
     commmand_line_num = 0
-    parser = Parser(command_lines=command_lines)
-    symbol_table = SymbolTable()
     while parser.has_more_commands():
         command_type = parser.command_type()
         if command_type == "L_COMMAND":
@@ -28,11 +85,12 @@ def main(source_file_name: str, dest_file_name: str):
             commmand_line_num += 1
         parser.advance()  # 下一条命令
 
-    # 第二遍：生成代码
+
+def second_pass(parser: Parser, symbol_table: SymbolTable) -> List[str]:
+    """第二遍：生成代码"""
     code_writer = CodeWriter(symbol_table=symbol_table)
-    parser = Parser(command_lines=command_lines)
     dest_command = []
-    register_num = 16
+    register_num = VARIABLE_BASE_ADDRESS
     # 将源文件转换为目标文件添加到目标文件中
     while parser.has_more_commands():
         command_type = parser.command_type()
@@ -44,22 +102,85 @@ def main(source_file_name: str, dest_file_name: str):
                 register_num += 1
             dest_command.append("0" + code_writer.symbol(com))
         elif command_type == "C_COMMAND":
-            dest_command.append(
-                "111"
-                + code_writer.comp(parser.comp())
-                + code_writer.dest(parser.dest())
-                + code_writer.jump(parser.jump())
-            )
+            # 整条 C-指令一次查表，不再分别解析 dest/comp/jump
+            dest_command.append(f"{encode_c_instruction(parser.command()):016b}")
         elif command_type == "L_COMMAND":
             pass
         parser.advance()  # 下一条命令
+    return dest_command
+
+
+def write_dest_file(dest_file_path: pathlib.Path, dest_command: List[str]) -> None:
+    # 目标文件后缀为 .hackb 时输出二进制格式
+    if dest_file_path.suffix == HACKB_SUFFIX:
+        write_hackb(dest_file_path, (int(line, 2) for line in dest_command))
+    else:
+        with open(dest_file_path, "w") as f:
+            for line in dest_command:
+                f.write(line + "\n")
 
+
+def streaming_main(
+    source_file_name: str,
+    dest_file_name: str,
+    source_map_file_name: str | None = None,
+) -> int:
+    """单遍流式汇编，返回生成的指令条数。
+
+    逐行读取源文件并立即写出机器码，不保存源文件的文本副本；
+    前向引用的符号在结束时通过 seek 回填到 .hack 文件中对应的行。
+    给定 source_map_file_name 时同时输出源码映射（见 source_map.py）。
+    """
+    assembler = StreamingAssembler()
+    source_map = SourceMap() if source_map_file_name is not None else None
+    source_file_path = DATA_ROOT / source_file_name
     dest_file_path = DATA_ROOT / dest_file_name
-    with open(dest_file_path, "w") as f:
-        for line in dest_command:
-            f.write(line + "\n")
-    return dest_command
+    with open(source_file_path, "r") as src, open(dest_file_path, "wb") as dest:
+        for line_num, command in iter_commands(src):
+            word = assembler.feed(command)
+            if word is not None:
+                dest.write(f"{word:016b}\n".encode())
+                if source_map is not None:
+                    source_map.add_instruction(line_num)
+            elif source_map is not None:
+                source_map.add_label(assembler.address, command[1:-1])
+        for address, word in assembler.finish():
+            dest.seek(address * WORD_LINE_LENGTH)
+            dest.write(f"{word:016b}".encode())
+    if source_map is not None:
+        source_map.dump(DATA_ROOT / source_map_file_name)
+    return assembler.address
 
 
 if __name__ == "__main__":
-    main("add/Add.asm", "add/Add.hack")
+    arg_parser = argparse.ArgumentParser(description="Hack 汇编编译器")
+    arg_parser.add_argument("source", nargs="?", default="add/Add.asm")
+    arg_parser.add_argument("dest", nargs="?", default="add/Add.hack")
+    arg_parser.add_argument("--no-cache", action="store_true", help="不使用构建缓存")
+    arg_parser.add_argument(
+        "--profile", action="store_true", help="输出各阶段耗时与统计信息（JSON）"
+    )
+    arg_parser.add_argument(
+        "-O", "--optimize", action="store_true", help="编码前做窥孔优化"
+    )
+    arg_parser.add_argument(
+        "--dead-code", action="store_true", help="编码前删除不可达代码"
+    )
+    args = arg_parser.parse_args()
+    if args.profile:
+        from profiler import profile_main
+
+        print(json.dumps(profile_main(args.source, args.dest), indent=2))
+    else:
+        optimizer = PeepholeOptimizer() if args.optimize else None
+        eliminator = DeadCodeEliminator() if args.dead_code else None
+        main(
+            args.source,
+            args.dest,
+            cache=None if args.no_cache else BuildCache(),
+            optimizer=optimizer,
+            eliminator=eliminator,
+        )
+        for code_pass in (eliminator, optimizer):
+            if code_pass is not None and code_pass.words_before:
+                print(json.dumps(code_pass.stats(), indent=2))
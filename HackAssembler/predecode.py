@@ -0,0 +1,176 @@
+"""
+预解码执行核心：加载 ROM 时把每条指令解码为一个处理函数，
+运行时每个周期只做一次 handlers[pc]() 的下标分派，不再重新解码机器码。
+
+C-指令的处理函数按机器码生成专用的 Python 源码（只读写用到的寄存器，
+只在可能溢出时截断为 16 位），同一个机器码只编译一次，得到的代码对象被所有地址共用：
+- 寄存器 A、D 和 RAM 是各处理函数共享的闭包变量（cell），读写与局部变量一样快；
+- 指令所在地址等常量作为参数默认值绑定到每个地址的处理函数上。
+处理函数返回下一条指令的地址。RAM 使用 list 保存，下标访问比 array 快得多。
+
+停机规则与 HackMachine 相同：到达死循环或执行到程序末尾时停止。
+"""
+
+from itertools import count
+from types import CellType, CodeType, FunctionType
+from typing import Callable, Dict, List
+
+from code_writer import COMP_SYMBOL_DICT
+from emulator import ADDRESS_MASK, DEST_A, DEST_D, DEST_M, ROM_SIZE, HackMachine
+
+COMP_EXPRESSIONS = {
+    int(code, 2): symbol.replace("!", "~") for symbol, code in COMP_SYMBOL_DICT.items()
+}
+JUMP_EXPRESSIONS = {
+    0b001: "out > 0",
+    0b010: "out == 0",
+    0b011: "out >= 0",
+    0b100: "out < 0",
+    0b101: "out != 0",
+    0b110: "out <= 0",
+    0b111: "True",
+}
+
+Handler = Callable[[], int]
+
+
+class _Halt(Exception):
+    """停机；参数为停机后的 pc，执行到程序末尾时为 -1（该周期不计数）。"""
+
+
+def _compile_handler(parameters: str, body: List[str]) -> CodeType:
+    """编译一个以 A、D、ram 为闭包变量的处理函数，返回其代码对象。"""
+    lines = [
+        "def outer():",
+        "    A = D = ram = None",
+        f"    def handler({parameters}):",
+        "        nonlocal A, D",
+    ]
+    lines.extend("        " + line for line in body)
+    lines.append("    return handler")
+    namespace: Dict[str, object] = {}
+    exec("\n".join(lines), namespace)
+    return namespace["outer"]().__code__
+
+
+def _c_instruction_body(word: int) -> List[str]:
+    """生成 C-指令处理函数的函数体。"""
+    expression = COMP_EXPRESSIONS[word >> 6 & 0b1111111]
+    dest = word >> 3 & 0b111
+    jump = word & 0b111
+    body = []
+    if "M" in expression or dest & DEST_M:
+        body.append(f"address = A & {ADDRESS_MASK}")
+    if "M" in expression:
+        body.append("M = ram[address]")
+    if any(op in expression for op in "+-"):
+        # 只有加减和取负可能溢出 16 位
+        body.append(f"out = ({expression} + 32768 & 65535) - 32768")
+    else:
+        body.append(f"out = {expression}")
+    if jump:
+        # 跳转地址是本周期开始时 A 的值
+        body.append(f"target = A & {ADDRESS_MASK}")
+    # 先用旧的 A 作为地址写 M，再更新 A 和 D
+    if dest & DEST_M:
+        body.append("ram[address] = out")
+    if dest & DEST_A:
+        body.append("A = out")
+    if dest & DEST_D:
+        body.append("D = out")
+    if jump:
+        body.append(f"if {JUMP_EXPRESSIONS[jump]}:")
+        if not dest:
+            body.append("    if target == pc or target == loop_start:")
+            body.append("        raise _Halt(target)")
+        body.append("    return target")
+    body.append("return next_pc")
+    return body
+
+
+_A_INSTRUCTION_CODE = _compile_handler(
+    "next_pc, value", ["A = value", "return next_pc"]
+)
+_c_instruction_codes: Dict[int, CodeType] = {}
+
+
+def _c_instruction_code(word: int) -> CodeType:
+    try:
+        return _c_instruction_codes[word]
+    except KeyError:
+        pass
+    if (word >> 6 & 0b1111111) in COMP_EXPRESSIONS:
+        body = _c_instruction_body(word)
+    else:
+        body = [
+            f"raise ValueError(f'invalid instruction {word:016b} at ROM[{{pc}}]')"
+        ]
+    code = _compile_handler("next_pc, pc, loop_start", body)
+    _c_instruction_codes[word] = code
+    return code
+
+
+def _end_handler() -> int:
+    raise _Halt(-1)
+
+
+class PredecodedMachine(HackMachine):
+    """与 HackMachine 接口相同，加载 ROM 时预解码全部指令。"""
+
+    def load_rom(self, words) -> None:
+        super().load_rom(words)
+        self.ram = self.ram.tolist()
+        self._cells = {"A": CellType(0), "D": CellType(0), "ram": CellType(self.ram)}
+        self.handlers = self.predecode()
+
+    def _handler(self, code: CodeType, defaults: tuple) -> Handler:
+        closure = tuple(self._cells[name] for name in code.co_freevars)
+        return FunctionType(code, {"_Halt": _Halt}, code.co_name, defaults, closure)
+
+    def predecode(self) -> List[Handler]:
+        """返回长度为 ROM_SIZE 的处理函数表；程序之外的地址都是停机处理函数。"""
+        rom = self.rom
+        handlers: List[Handler] = []
+        for pc in range(self.program_size):
+            word = rom[pc]
+            if word >= 0:
+                handlers.append(self._handler(_A_INSTRUCTION_CODE, (pc + 1, word)))
+                continue
+            # 跳回前一条加载自身地址的 A-指令就是死循环
+            loop_start = pc - 1 if pc and rom[pc - 1] == pc - 1 else -1
+            code = _c_instruction_code(word & 0xFFFF)
+            handlers.append(self._handler(code, (pc + 1, pc, loop_start)))
+        handlers.extend([_end_handler] * (ROM_SIZE - self.program_size))
+        return handlers
+
+    def step(self) -> None:
+        self.run(1)
+
+    def run(self, max_cycles: int | None = None) -> int:
+        if self.halted:
+            return 0
+        a_cell = self._cells["A"]
+        d_cell = self._cells["D"]
+        a_cell.cell_contents = self.a
+        d_cell.cell_contents = self.d
+        handlers = self.handlers
+        pc = self.pc
+        executed = 0
+        try:
+            for executed in range(max_cycles) if max_cycles is not None else count():
+                pc = handlers[pc]()
+            else:
+                executed = max_cycles
+        except _Halt as halt:
+            target = halt.args[0]
+            if target >= 0:
+                # 死循环中的跳转指令本身已经执行
+                executed += 1
+                pc = target
+            self.halted = True
+        finally:
+            self.pc = pc
+            self.a = a_cell.cell_contents
+            self.d = d_cell.cell_contents
+            self.cycles += executed
+        return executed
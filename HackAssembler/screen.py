@@ -0,0 +1,165 @@
+"""
+屏幕帧缓冲：把 RAM 中从 SCREEN（16384）开始的屏幕内存映射转换为 512x256 的单色位图。
+
+Hack 屏幕每行 32 个字，字的第 0 位是最左边的像素，1 表示黑色。
+位图每行 64 字节，每字节的最高位是最左边的像素，1 表示白色，
+即 PNG 的 1 位灰度格式，也是 ffmpeg 的 monob 原始视频格式。
+
+update() 逐行比较屏幕内存与上一帧的内容，只重建发生变化的行：
+比较和转换都是对整行切片的 C 层面操作（array 转字节串、bytes.translate 查表翻转位序），
+不需要拦截模拟器的每一次内存写入，对所有执行引擎都适用。
+
+运行方式：python screen.py data/pong/Pong.hack --frames 10 --png-dir frames
+         python screen.py data/pong/Pong.hack --frames 100 --raw pong.raw
+         ffplay -f rawvideo -pixel_format monob -video_size 512x256 pong.raw
+"""
+
+import argparse
+import pathlib
+import struct
+import sys
+import zlib
+from array import array
+from typing import BinaryIO, List, MutableSequence
+
+from block_translator import BlockMachine
+from symbol_table import PREDEFINED_SYMBOLS
+
+SCREEN = PREDEFINED_SYMBOLS["SCREEN"]
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+WORDS_PER_ROW = SCREEN_WIDTH // 16
+BYTES_PER_ROW = SCREEN_WIDTH // 8
+SCREEN_WORDS = WORDS_PER_ROW * SCREEN_HEIGHT
+FRAME_BYTES = BYTES_PER_ROW * SCREEN_HEIGHT
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# 翻转字节内的位序并取反：Hack 的黑色像素（1，低位在左）-> 位图的黑色像素（0，高位在左）
+_PIXEL_TABLE = bytes(~int(f"{byte:08b}"[::-1], 2) & 0xFF for byte in range(256))
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    chunk = kind + data
+    return struct.pack(">I", len(data)) + chunk + struct.pack(">I", zlib.crc32(chunk))
+
+
+class Framebuffer:
+    """ram 为模拟器的 RAM（array 或 list），帧缓冲只读取其中的屏幕内存映射。"""
+
+    def __init__(self, ram: MutableSequence[int]) -> None:
+        self.ram = ram
+        self.bitmap = bytearray(b"\xff" * FRAME_BYTES)  # 全白
+        # 上一帧的屏幕内容（初始为全白），与 ram 类型相同，保证切片可以直接比较
+        zero = ram[:1]
+        zero[0] = 0
+        self.words = zero * SCREEN_WORDS
+        self.frames = 0
+
+    def _render_row(self, row: int, words: MutableSequence[int]) -> None:
+        data = array("h", words)
+        if sys.byteorder == "big":
+            data.byteswap()
+        start = row * BYTES_PER_ROW
+        self.bitmap[start : start + BYTES_PER_ROW] = data.tobytes().translate(
+            _PIXEL_TABLE
+        )
+
+    def update(self) -> List[int]:
+        """重建自上一帧以来发生变化的行，返回这些行的行号。"""
+        ram = self.ram
+        screen = ram[SCREEN : SCREEN + SCREEN_WORDS]
+        self.frames += 1
+        if screen == self.words:
+            return []
+        previous = self.words
+        dirty = []
+        for row in range(SCREEN_HEIGHT):
+            start = row * WORDS_PER_ROW
+            words = screen[start : start + WORDS_PER_ROW]
+            if words != previous[start : start + WORDS_PER_ROW]:
+                self._render_row(row, words)
+                dirty.append(row)
+        self.words = screen
+        return dirty
+
+    def render(self) -> None:
+        """不比较上一帧，重建整个位图。"""
+        screen = self.ram[SCREEN : SCREEN + SCREEN_WORDS]
+        for row in range(SCREEN_HEIGHT):
+            start = row * WORDS_PER_ROW
+            self._render_row(row, screen[start : start + WORDS_PER_ROW])
+        self.words = screen
+        self.frames += 1
+
+    def pixel(self, x: int, y: int) -> bool:
+        """位图中 (x, y) 处的像素是否为黑色。"""
+        byte = self.bitmap[y * BYTES_PER_ROW + x // 8]
+        return not byte >> (7 - x % 8) & 1
+
+    def png(self) -> bytes:
+        """返回当前位图的 PNG 文件内容（1 位灰度）。"""
+        rows = b"".join(
+            b"\x00" + self.bitmap[start : start + BYTES_PER_ROW]
+            for start in range(0, FRAME_BYTES, BYTES_PER_ROW)
+        )
+        header = struct.pack(">IIBBBBB", SCREEN_WIDTH, SCREEN_HEIGHT, 1, 0, 0, 0, 0)
+        return (
+            PNG_SIGNATURE
+            + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(rows))
+            + _png_chunk(b"IEND", b"")
+        )
+
+    def write_png(self, dest_file_path: str | pathlib.Path) -> None:
+        with open(dest_file_path, "wb") as f:
+            f.write(self.png())
+
+    def write_frame(self, stream: BinaryIO) -> None:
+        """把当前位图作为一帧 monob 原始视频写入 stream。"""
+        stream.write(self.bitmap)
+
+
+def record(
+    machine: BlockMachine,
+    frames: int,
+    cycles_per_frame: int,
+    raw_stream: BinaryIO | None = None,
+    png_dir: pathlib.Path | None = None,
+) -> int:
+    """每执行 cycles_per_frame 个周期取一帧，写出原始视频流或 PNG 文件，返回帧数。"""
+    framebuffer = Framebuffer(machine.ram)
+    for frame in range(frames):
+        machine.run(cycles_per_frame)
+        framebuffer.update()
+        if raw_stream is not None:
+            framebuffer.write_frame(raw_stream)
+        if png_dir is not None:
+            framebuffer.write_png(png_dir / f"frame{frame:05d}.png")
+        if machine.halted:
+            return frame + 1
+    return frames
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hack 屏幕帧录制")
+    arg_parser.add_argument("source", type=pathlib.Path, help=".hack 或 .hackb 文件")
+    arg_parser.add_argument("--frames", type=int, default=10, help="录制的帧数")
+    arg_parser.add_argument(
+        "--cycles-per-frame", type=int, default=100_000, help="每帧之间执行的周期数"
+    )
+    arg_parser.add_argument("--png-dir", type=pathlib.Path, help="PNG 帧的输出目录")
+    arg_parser.add_argument("--raw", type=pathlib.Path, help="monob 原始视频输出文件")
+    args = arg_parser.parse_args()
+
+    machine = BlockMachine.from_file(args.source)
+    if args.png_dir is not None:
+        args.png_dir.mkdir(parents=True, exist_ok=True)
+    raw_stream = open(args.raw, "wb") if args.raw is not None else None
+    try:
+        count = record(
+            machine, args.frames, args.cycles_per_frame, raw_stream, args.png_dir
+        )
+    finally:
+        if raw_stream is not None:
+            raw_stream.close()
+    print(f"{count} frames, {machine.cycles} cycles")
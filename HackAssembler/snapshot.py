@@ -0,0 +1,164 @@
+"""
+模拟器快照：把机器的全部状态（PC、A、D、周期数、停机标志和 RAM）保存为 .hsnap 文件，之后再恢复。
+
+文件格式（小端序）：
+    magic     4 字节    b"HSNP"
+    version   uint16    当前为 1
+    flags     uint16    第 0 位为停机标志
+    rom_hash  32 字节   程序的 SHA-256（ROM 中前 program_size 个字，小端序 uint16）
+    pc        uint16
+    a, d      int16
+    reserved  uint16    保留，写 0
+    cycles    uint64
+    count     uint32    RAM 的字数
+    checksum  uint32    RAM 的 CRC-32
+之后是 RAM 的 int16 数组。恢复时通过 mmap 读取，ROM 哈希不同的快照不会被使用。
+
+典型用法是跳过操作系统的启动过程：boot() 第一次运行时执行启动周期并保存快照，
+之后对同一个程序直接恢复。
+
+运行方式：python snapshot.py data/pong/Pong.hack pong.hsnap --cycles 1000000
+"""
+
+import argparse
+import hashlib
+import mmap
+import pathlib
+import struct
+import sys
+import zlib
+from array import array
+
+from block_translator import BlockMachine
+from emulator import HackMachine
+
+MAGIC = b"HSNP"
+VERSION = 1
+HEADER = struct.Struct("<4sHH32sHhhHQII")
+SNAPSHOT_SUFFIX = ".hsnap"
+FLAG_HALTED = 0b1
+
+
+def rom_hash(machine: HackMachine) -> bytes:
+    """返回机器中程序的 SHA-256 摘要。"""
+    words = machine.rom[: machine.program_size]
+    if sys.byteorder == "big":
+        words.byteswap()
+    return hashlib.sha256(words.tobytes()).digest()
+
+
+def dumps(machine: HackMachine) -> bytes:
+    """把机器状态编码为 .hsnap 格式的字节串。"""
+    ram = array("h", machine.ram)
+    if sys.byteorder == "big":
+        ram.byteswap()
+    payload = ram.tobytes()
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        FLAG_HALTED if machine.halted else 0,
+        rom_hash(machine),
+        machine.pc,
+        machine.a,
+        machine.d,
+        0,
+        machine.cycles,
+        len(ram),
+        zlib.crc32(payload),
+    )
+    return header + payload
+
+
+def _unpack(view: memoryview, digest: bytes, verify: bool) -> tuple:
+    """校验并解析快照，返回 (RAM, (flags, pc, a, d, cycles))。"""
+    if len(view) < HEADER.size:
+        raise ValueError("snapshot buffer is shorter than its header")
+    magic, version, flags, rom_digest, pc, a, d, _, cycles, count, checksum = (
+        HEADER.unpack_from(view)
+    )
+    if magic != MAGIC:
+        raise ValueError(f"bad snapshot magic: {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"unsupported snapshot version: {version}")
+    if rom_digest != digest:
+        raise ValueError("snapshot was taken with a different program")
+    ram = array("h")
+    with view[HEADER.size : HEADER.size + count * 2] as payload:
+        if len(payload) != count * 2:
+            raise ValueError(f"snapshot payload truncated: expected {count} words")
+        if verify and zlib.crc32(payload) != checksum:
+            raise ValueError("snapshot checksum mismatch")
+        ram.frombytes(payload)
+    return ram, (flags, pc, a, d, cycles)
+
+
+def restore(machine: HackMachine, buffer, verify: bool = True) -> None:
+    """从 .hsnap 格式的缓冲区恢复机器状态，机器中必须已加载同一个程序。
+
+    RAM 原地更新，预解码和基本块引擎中引用 RAM 的代码不需要重新生成。
+    """
+    with memoryview(buffer) as view:
+        ram, (flags, pc, a, d, cycles) = _unpack(view, rom_hash(machine), verify)
+    if len(ram) != len(machine.ram):
+        raise ValueError(f"snapshot has {len(ram)} RAM words, not {len(machine.ram)}")
+    if sys.byteorder == "big":
+        ram.byteswap()
+    machine.ram[:] = ram if isinstance(machine.ram, array) else ram.tolist()
+    machine.pc = pc
+    machine.a = a
+    machine.d = d
+    machine.cycles = cycles
+    machine.halted = bool(flags & FLAG_HALTED)
+
+
+def save(machine: HackMachine, dest_file_path: str | pathlib.Path) -> None:
+    """把机器状态写入 .hsnap 文件。"""
+    with open(dest_file_path, "wb") as f:
+        f.write(dumps(machine))
+
+
+def load(
+    machine: HackMachine, source_file_path: str | pathlib.Path, verify: bool = True
+) -> None:
+    """通过 mmap 读取 .hsnap 文件并恢复机器状态。"""
+    with open(source_file_path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError("snapshot buffer is shorter than its header")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            restore(machine, mapped, verify=verify)
+
+
+def snapshot_path(
+    machine: HackMachine, cycles: int, directory: str | pathlib.Path
+) -> pathlib.Path:
+    """同一个程序执行 cycles 个周期后的快照路径，文件名以 ROM 哈希开头。"""
+    name = f"{rom_hash(machine).hex()[:16]}-{cycles}{SNAPSHOT_SUFFIX}"
+    return pathlib.Path(directory) / name
+
+
+def boot(machine: HackMachine, cycles: int, directory: str | pathlib.Path) -> bool:
+    """从头执行 cycles 个周期；已有同一程序的快照时直接恢复。
+
+    返回是否使用了快照。机器需处于刚加载程序的状态。
+    """
+    path = snapshot_path(machine, cycles, directory)
+    if path.exists():
+        load(machine, path)
+        return True
+    machine.run(cycles)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save(machine, path)
+    return False
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Hack 模拟器快照")
+    arg_parser.add_argument("source", type=pathlib.Path, help=".hack 或 .hackb 文件")
+    arg_parser.add_argument("dest", type=pathlib.Path, help="输出的 .hsnap 文件")
+    arg_parser.add_argument("--cycles", type=int, required=True, help="执行的周期数")
+    args = arg_parser.parse_args()
+
+    machine = BlockMachine.from_file(args.source)
+    machine.run(args.cycles)
+    save(machine, args.dest)
+    print(f"{args.dest}: pc={machine.pc} cycles={machine.cycles}")
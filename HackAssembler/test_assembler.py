@@ -1,9 +1,51 @@
+import json
+import os
+import pathlib
 from parser import Parser
 
 import pytest
 
-from main import main
+import snapshot
+from assembler import (
+    C_INSTRUCTION_TABLE,
+    StreamingAssembler,
+    assemble,
+    assemble_bytes,
+    encode_c_instruction,
+)
+from batch import batch_assemble, collect_sources
+from block_translator import BlockMachine
+from build_cache import BuildCache
+from disassembler import DECODE_TABLE, disassemble, disassemble_file
+from emulator import ROM_SIZE, HackMachine, to_signed
+from hack_binary import (
+    dumps,
+    hack_to_hackb,
+    hackb_to_hack,
+    load_hackb,
+    loads,
+    read_hack,
+    write_hackb,
+)
+from hack_object import assemble_object, load_object, write_object
+from linker import LinkError, link, link_files
+from main import main, streaming_main
+from dead_code import DeadCodeEliminator
+from peephole import PeepholeOptimizer, optimize_commands
+from predecode import PredecodedMachine
+from screen import FRAME_BYTES, SCREEN, Framebuffer, record
+from profiler import profile_main
+from source_map import SourceMap
 from code_writer import CodeWriter
+from tst_runner import (
+    ComparisonFailure,
+    ScriptError,
+    format_value,
+    parse_script,
+    run_script,
+    run_script_timed,
+)
+from cycle_profiler import ROOT, CycleProfiler
 from symbol_table import SymbolTable
 
 
@@ -75,6 +117,22 @@ class TestParser:
         parser.advance()
         assert parser.comp() == "A"
 
+    def test_reset(self):
+        parser = Parser(command_lines=["@2", "D=A"])
+        parser.advance()
+        parser.advance()
+        assert not parser.has_more_commands()
+
+        parser.reset()
+        assert parser.command() == "@2"
+
+    def test_command(self):
+        parser = Parser(command_lines=["@2", "D=A"])
+        assert parser.command() == "@2"
+
+        parser.advance()
+        assert parser.command() == "D=A"
+
     def test_jump(self):
         command_lines = ["@2", "D=A", "D;JGT"]
 
@@ -178,6 +236,921 @@ class TestMain:
         actual = [x.strip() for x in actual]
         assert len(actual) == 27483
 
+    @pytest.mark.parametrize(
+        "file_name", ["add/Add", "max/Max", "rect/Rect", "pong/Pong", "pong/PongL"]
+    )
+    def test_streaming_main(self, file_name):
+        with open(f"data/{file_name}.hack", "r") as f:
+            expert = f.read()
+        count = streaming_main(
+            source_file_name=file_name + ".asm", dest_file_name=file_name + ".hack"
+        )
+        with open(f"data/{file_name}.hack", "r") as f:
+            actual = f.read()
+        assert actual == expert
+        assert count == len(expert.splitlines())
+
+
+class TestStreamingAssembler:
+    def test_backpatch_forward_label(self):
+        assembler = StreamingAssembler()
+        words = [assembler.feed(command) for command in ["@LOOP", "0;JMP", "(LOOP)"]]
+        assert words == [0, 0b1110101010000111, None]
+        assert assembler.finish() == [(0, 2)]
+
+    def test_variables_allocated_in_order(self):
+        assembler = StreamingAssembler()
+        for command in ["@i", "@END", "@sum", "(END)", "@i"]:
+            assembler.feed(command)
+        assert assembler.finish() == [(0, 16), (3, 16), (1, 3), (2, 17)]
+
+
+class TestEncodeCInstruction:
+    def test_table_covers_all_combinations(self):
+        assert len(C_INSTRUCTION_TABLE) == 28 * 8 * 8
+
+    def test_encode_c_instruction(self):
+        assert f"{encode_c_instruction('AM=M-1'):016b}" == "1111110010101000"
+        assert f"{encode_c_instruction('D;JGT'):016b}" == "1110001100000001"
+        assert f"{encode_c_instruction('0;JMP'):016b}" == "1110101010000111"
+
+    def test_encode_unknown_dest_falls_back(self):
+        assert encode_c_instruction("X=D") == encode_c_instruction("D")
+
+        with pytest.raises(ValueError):
+            encode_c_instruction("D=X")
+
+    def test_commuted_operands(self):
+        assert encode_c_instruction("M=M+D") == encode_c_instruction("M=D+M")
+        assert encode_c_instruction("D=A&D;JNE") == encode_c_instruction("D=D&A;JNE")
+        with pytest.raises(ValueError):
+            encode_c_instruction("D=A-D+1")
+
+
+class TestAssemble:
+    def test_assemble_text(self):
+        with open("data/add/Add.asm", "r") as f:
+            words = assemble(f.read())
+        assert words.typecode == "H"
+        assert list(words) == [2, 0xEC10, 3, 0xE090, 0, 0xE308]
+
+    def test_assemble_lines(self):
+        with open("data/pong/Pong.asm", "r") as f:
+            words = assemble(f)
+        with open("data/pong/Pong.hack", "r") as f:
+            expert = [int(line, 2) for line in f]
+        assert list(words) == expert
+
+    def test_assemble_bytes(self):
+        assert assemble_bytes(["@2", "D=A"]) == bytes([2, 0, 0x10, 0xEC])
+
+    def test_invalid_comp(self):
+        with pytest.raises(ValueError):
+            assemble("D=X")
+
+    def test_commuted_comp(self):
+        assert list(assemble("D=M+D")) == [0b1111000010010000]
+
+
+class TestHackBinary:
+    def test_dumps_loads(self):
+        data = dumps([2, 0xEC10, 0xFFFF])
+        assert len(data) == 16 + 3 * 2
+        assert loads(data).tolist() == [2, 0xEC10, 0xFFFF]
+
+    def test_loads_rejects_corrupted_payload(self):
+        data = bytearray(dumps([2, 0xEC10]))
+        data[-1] ^= 0xFF
+        with pytest.raises(ValueError):
+            loads(data)
+
+        with pytest.raises(ValueError):
+            loads(b"HACX" + bytes(data[4:]))
+
+    def test_main_writes_hackb(self, tmp_path):
+        dest_file_path = tmp_path / "Pong.hackb"
+        main(source_file_name="pong/Pong.asm", dest_file_name=str(dest_file_path))
+        with open("data/pong/Pong.hack", "r") as f:
+            expert = [int(line, 2) for line in f]
+        assert load_hackb(dest_file_path).tolist() == expert
+
+    def test_convert_round_trip(self, tmp_path):
+        hackb_file_path = tmp_path / "Max.hackb"
+        hack_file_path = tmp_path / "Max.hack"
+        assert hack_to_hackb("data/max/Max.hack", hackb_file_path) == 16
+        assert hackb_to_hack(hackb_file_path, hack_file_path) == 16
+        with open("data/max/Max.hack", "r") as f:
+            expert = f.read()
+        assert hack_file_path.read_text() == expert
+
+
+class TestBatch:
+    def test_collect_sources(self):
+        sources = collect_sources(
+            ["data/rect", "data/add/Add.asm", "data/rect/Rect.asm"]
+        )
+        assert [str(source) for source in sources] == [
+            "data/rect/Rect.asm",
+            "data/rect/RectL.asm",
+            "data/add/Add.asm",
+        ]
+
+    def test_batch_assemble(self, tmp_path):
+        for file_name in ["max/Max.asm", "pong/Pong.asm", "rect/Rect.asm"]:
+            dest_file_path = tmp_path / file_name
+            dest_file_path.parent.mkdir(exist_ok=True)
+            dest_file_path.write_text((pathlib.Path("data") / file_name).read_text())
+
+        results = batch_assemble([tmp_path], max_workers=2)
+        assert [result.source_file_path.name for result in results] == [
+            "Max.asm",
+            "Pong.asm",
+            "Rect.asm",
+        ]
+        for result in results:
+            expert = result.source_file_path.relative_to(tmp_path).with_suffix(".hack")
+            with open(pathlib.Path("data") / expert, "r") as f:
+                assert result.dest_file_path.read_text() == f.read()
+
+
+class TestBuildCache:
+    def test_get_put(self, tmp_path):
+        cache = BuildCache(tmp_path)
+        key = cache.key(b"@2\nD=A\n", ".hack")
+        assert cache.get(key) is None
+
+        cache.put(key, b"0000000000000010\n")
+        assert cache.get(key) == b"0000000000000010\n"
+        assert cache.key(b"@2\nD=A\n", ".hackb") != key
+        assert cache.key(b"@3\nD=A\n", ".hack") != key
+
+    def test_evict_least_recently_used(self, tmp_path):
+        cache = BuildCache(tmp_path, max_bytes=25)
+        cache.put("a", b"a" * 10)
+        cache.put("b", b"b" * 10)
+        os.utime(tmp_path / "a", ns=(1_000_000_000, 1_000_000_000))
+        os.utime(tmp_path / "b", ns=(2_000_000_000, 2_000_000_000))
+
+        assert cache.get("a") is not None
+        cache.put("c", b"c" * 10)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "c"]
+
+    def test_main_with_cache(self, tmp_path):
+        cache = BuildCache(tmp_path / "cache")
+        dest_file_path = tmp_path / "Max.hack"
+        expert = main("max/Max.asm", str(dest_file_path), cache=cache)
+        dest_file_path.unlink()
+
+        assert main("max/Max.asm", str(dest_file_path), cache=cache) == expert
+        assert dest_file_path.read_text().splitlines() == expert
+
+    def test_batch_with_cache(self, tmp_path):
+        source_file_path = tmp_path / "Rect.asm"
+        source_file_path.write_text(pathlib.Path("data/rect/Rect.asm").read_text())
+        cache_dir = tmp_path / "cache"
+
+        results = batch_assemble([source_file_path], max_workers=1, cache_dir=cache_dir)
+        assert not results[0].cached
+        results = batch_assemble([source_file_path], max_workers=1, cache_dir=cache_dir)
+        assert results[0].cached
+        assert results[0].word_count == 25
+        with open("data/rect/Rect.hack", "r") as f:
+            assert results[0].dest_file_path.read_text() == f.read()
+
+
+class TestProfiler:
+    def test_profile_main(self, tmp_path):
+        stats = profile_main("rect/Rect.asm", str(tmp_path / "Rect.hack"))
+        assert list(stats["phases"]) == [
+            "read",
+            "parse",
+            "first_pass",
+            "second_pass",
+            "write",
+        ]
+        assert stats["instructions"] == {"A": 12, "C": 13, "L": 2}
+        assert stats["rom_words"] == 25
+        assert stats["symbols"] == {"predefined": 23, "label": 2, "variable": 2}
+        assert stats["max_variable_address"] == 17
+        assert json.loads(json.dumps(stats)) == stats
+
+    def test_profile_without_variables(self, tmp_path):
+        stats = profile_main("max/Max.asm", str(tmp_path / "Max.hack"))
+        assert stats["symbols"]["variable"] == 0
+        assert stats["max_variable_address"] is None
+
+
+class TestSourceMap:
+    def test_assemble_with_source_map(self):
+        source_map = SourceMap()
+        with open("data/max/Max.asm", "r") as f:
+            words = assemble(f, source_map=source_map)
+        assert len(source_map) == len(words) == 16
+        assert source_map.line_of(0) == 10
+        assert source_map.line_of(10) == 23
+        assert source_map.labels() == [(10, "ITSR0"), (12, "OUTPUT_D"), (14, "END")]
+        assert source_map.label_of(9) is None
+        assert source_map.label_of(11) == "ITSR0"
+        assert source_map.label_of(13) == "OUTPUT_D"
+        assert source_map.label_of(15) == "END"
+
+    def test_streaming_main_dumps_source_map(self, tmp_path):
+        source_map_file_path = tmp_path / "Max.hackmap"
+        streaming_main(
+            "max/Max.asm",
+            str(tmp_path / "Max.hack"),
+            source_map_file_name=str(source_map_file_path),
+        )
+        source_map = SourceMap.load(source_map_file_path)
+        assert len(source_map) == 16
+        assert source_map.label_of(13) == "OUTPUT_D"
+
+    def test_labels_must_be_sorted(self):
+        source_map = SourceMap()
+        source_map.add_label(3, "B")
+        with pytest.raises(ValueError):
+            source_map.add_label(2, "A")
+
+
+class TestPeephole:
+    def test_push_then_pop(self):
+        commands = ["@SP", "A=M", "M=D", "@SP", "M=M+1", "@SP", "AM=M-1", "D=M"]
+        assert optimize_commands(commands) == ["@SP", "A=M", "M=D", "@SP", "A=M", "D=M"]
+
+    def test_dead_and_redundant_a_loads(self):
+        assert optimize_commands(["@R13", "@SP", "M=M+1", "@SP", "D=M"]) == [
+            "@SP",
+            "M=M+1",
+            "D=M",
+        ]
+        assert optimize_commands(["@SP", "A=M", "@SP"]) == ["@SP", "A=M", "@SP"]
+
+    def test_keep_first_variable_reference(self):
+        # 删除 @x 会让 y 占用 x 原本的 RAM 地址
+        commands = ["@x", "@y", "M=1", "@x", "M=0"]
+        assert optimize_commands(commands) == commands
+        assert list(assemble(commands, optimizer=PeepholeOptimizer())) == list(
+            assemble(commands)
+        )
+        assert optimize_commands(["@x", "M=1", "@x", "@y", "M=0"]) == [
+            "@x",
+            "M=1",
+            "@y",
+            "M=0",
+        ]
+
+    def test_jump_to_next(self):
+        assert optimize_commands(["@L", "0;JMP", "(L)", "@SP"]) == ["(L)", "@SP"]
+        assert optimize_commands(["@L", "0;JMP", "(L)", "M=D"]) == [
+            "@L",
+            "0;JMP",
+            "(L)",
+            "M=D",
+        ]
+
+    def test_respect_label_boundary(self):
+        commands = ["@SP", "M=M+1", "(LOOP)", "@SP", "AM=M-1"]
+        assert optimize_commands(commands) == commands
+
+    def test_assemble_with_optimizer(self):
+        optimizer = PeepholeOptimizer()
+        source = ["@SP", "M=M+1", "@SP", "AM=M-1", "(END)", "@END", "0;JMP"]
+        words = assemble(source, optimizer=optimizer)
+        assert list(words) == list(assemble(["@SP", "A=M", "(END)", "@END", "0;JMP"]))
+        assert optimizer.words_saved == 2
+        assert optimizer.stats()["rule_hits"] == {
+            "redundant-a-load": 1,
+            "push-pop-sp": 1,
+        }
+
+    def test_rules_must_shrink(self):
+        with pytest.raises(ValueError):
+            PeepholeOptimizer(rules=[("grow", ("D=M",), ("D=M", "D=M"))])
+
+
+class TestDeadCode:
+    PROGRAM = [
+        "@RET",  # 返回地址被当作数据压栈，RET 因此可达
+        "D=A",
+        "@R14",
+        "M=D",
+        "@USED",
+        "0;JMP",
+        "(RET)",
+        "@END",
+        "0;JMP",
+        "(UNUSED)",  # 没有任何跳转到这里
+        "@R0",
+        "M=0",
+        "@UNUSED",
+        "0;JMP",
+        "(USED)",
+        "@R0",
+        "M=1",
+        "@R14",
+        "A=M",
+        "0;JMP",
+        "(END)",
+        "@END",
+        "0;JMP",
+    ]
+
+    def test_drop_unreachable_blocks(self):
+        eliminator = DeadCodeEliminator()
+        commands = eliminator.optimize(enumerate(self.PROGRAM))
+        assert [command for _, command in commands] == (
+            self.PROGRAM[:9] + self.PROGRAM[14:]
+        )
+        assert eliminator.words_saved == 4
+        assert eliminator.dropped_labels == ["UNUSED"]
+
+    def test_label_addresses_recomputed(self):
+        words = assemble(self.PROGRAM, eliminator=DeadCodeEliminator())
+        assert list(words) == list(assemble(self.PROGRAM[:9] + self.PROGRAM[14:]))
+        assert words[4] == 8  # @USED
+
+    def test_unresolved_jump_keeps_code(self):
+        program = ["@4", "0;JMP", "@R0", "M=0", "(END)", "@END", "0;JMP"]
+        eliminator = DeadCodeEliminator()
+        commands = eliminator.optimize(enumerate(program))
+        assert [command for _, command in commands] == program
+        assert eliminator.words_saved == 0
+
+    def test_conditional_jump_falls_through(self):
+        program = ["@R0", "D=M", "@END", "D;JGT", "@R1", "M=D"]
+        program += ["(END)", "@END", "0;JMP"]
+        commands = DeadCodeEliminator().optimize(enumerate(program))
+        assert [command for _, command in commands] == program
+
+
+class TestLinker:
+    MAIN = ["@i", "M=1", "(LOOP)", "@Math.double", "0;JMP"]
+    MAIN += ["(Main.ret)", "@LOOP", "0;JMP"]
+    MATH = ["(Math.double)", "@i", "D=M", "M=D+M"]
+    MATH += ["@sum", "M=D", "@Main.ret", "0;JMP"]
+
+    def test_assemble_object(self):
+        module = assemble_object(self.MAIN, name="Main")
+        assert module.labels == {"LOOP": 2, "Main.ret": 4}
+        assert list(module.relocations) == [4]
+        assert module.references == {"i": [0], "Math.double": [2]}
+        assert module.words[4] == 2
+
+    def test_link_matches_assemble(self):
+        modules = [assemble_object(self.MAIN), assemble_object(self.MATH)]
+        symbol_table = SymbolTable()
+        words = link(modules, symbol_table)
+        assert words == assemble(self.MAIN + self.MATH)
+        assert symbol_table.get_address("Math.double") == 6
+        assert symbol_table.get_address("sum") == 17
+
+    def test_link_split_program(self):
+        with open("data/pong/Pong.asm", "r") as f:
+            lines = f.read().splitlines()
+        middle = next(
+            i for i in range(len(lines) // 2, len(lines)) if lines[i].startswith("(")
+        )
+        modules = [assemble_object(lines[:middle]), assemble_object(lines[middle:])]
+        assert link(modules) == assemble(lines)
+
+    def test_duplicate_label(self):
+        with pytest.raises(LinkError):
+            link([assemble_object(self.MAIN), assemble_object(self.MAIN)])
+
+    def test_object_file_round_trip(self, tmp_path):
+        module = assemble_object(self.MATH, name="Math")
+        write_object(tmp_path / "Math.hobj", module)
+        loaded = load_object(tmp_path / "Math.hobj")
+        assert loaded.name == "Math"
+        assert loaded.words == module.words
+        assert loaded.relocations == module.relocations
+        assert loaded.labels == module.labels
+        assert loaded.references == module.references
+
+    def test_link_files(self, tmp_path):
+        (tmp_path / "Main.asm").write_text("\n".join(self.MAIN))
+        write_object(tmp_path / "Math.hobj", assemble_object(self.MATH))
+        dest_file_path = tmp_path / "Prog.hack"
+        paths = [tmp_path / "Main.asm", tmp_path / "Math.hobj"]
+        assert link_files(paths, dest_file_path) == 13
+        assert dest_file_path.read_text().splitlines() == [
+            f"{word:016b}" for word in assemble(self.MAIN + self.MATH)
+        ]
+
+
+class TestDisassembler:
+    def test_decode_table(self):
+        assert len(DECODE_TABLE) == 1 << 16
+        assert DECODE_TABLE[21] == "@21"
+        assert DECODE_TABLE[0b1110001100001000] == "M=D"
+        assert DECODE_TABLE[0b1110101010000111] == "0;JMP"
+        assert DECODE_TABLE[0b1111110111011000] == "MD=M+1"
+        assert DECODE_TABLE[0b1000001100001000] == "// invalid 1000001100001000"
+
+    def test_round_trip(self):
+        with open("data/pong/Pong.asm", "r") as f:
+            words = assemble(f)
+        assert assemble(list(disassemble(words))) == words
+
+    def test_restore_labels(self):
+        source_map = SourceMap()
+        with open("data/max/Max.asm", "r") as f:
+            words = assemble(f, source_map=source_map)
+        commands = list(disassemble(words, source_map))
+        assert commands[4:7] == ["@ITSR0", "D;JGT", "@1"]
+        assert commands[10] == "(ITSR0)"
+        assert commands[-3:] == ["(END)", "@END", "0;JMP"]
+        assert assemble(commands) == words
+
+    def test_disassemble_hackb_file(self, tmp_path):
+        words = assemble(["@2", "D=A", "@3", "D=D+A", "@0", "M=D"])
+        write_hackb(tmp_path / "Add.hackb", words)
+        dest_file_path = tmp_path / "Add.asm"
+        assert disassemble_file(tmp_path / "Add.hackb", dest_file_path) == 6
+        assert assemble(dest_file_path.read_text()) == words
+
+
+@pytest.mark.parametrize(
+    "machine_class", [HackMachine, PredecodedMachine, BlockMachine]
+)
+class TestEmulator:
+    @pytest.mark.parametrize("x, y", [(3, 5), (7, -2), (0, 0)])
+    def test_max(self, machine_class, x, y):
+        machine = machine_class.from_file("data/max/Max.hack")
+        machine.ram[0] = x
+        machine.ram[1] = y
+        machine.run()
+        assert machine.halted
+        assert machine.ram[2] == max(x, y)
+
+    def test_add_runs_off_the_end(self, machine_class):
+        machine = machine_class.from_file("data/add/Add.hack")
+        assert machine.run() == 6
+        assert machine.halted
+        assert machine.ram[0] == 5
+
+    def test_rect(self, machine_class):
+        machine = machine_class.from_file("data/rect/Rect.hack")
+        machine.ram[0] = 3
+        machine.run()
+        assert [machine.ram[16384 + 32 * row] for row in range(4)] == [-1, -1, -1, 0]
+
+    def test_max_cycles_and_registers(self, machine_class):
+        machine = machine_class(assemble(["@7", "D=A", "@R3", "AM=D-1", "D=!D"]))
+        assert machine.run(max_cycles=3) == 3
+        assert machine.registers() == {"pc": 3, "a": 3, "d": 7, "cycles": 3}
+        machine.step()
+        assert (machine.a, machine.ram[3], machine.m) == (6, 6, 0)
+        machine.step()
+        assert machine.d == -8
+
+    def test_arithmetic_wraps_to_16_bits(self, machine_class):
+        machine = machine_class(assemble(["@32767", "D=A", "D=D+1", "@R0", "M=D-1"]))
+        machine.run()
+        assert machine.d == -32768
+        assert machine.ram[0] == 32767
+        assert to_signed(0xFFFF) == -1
+
+    def test_conditional_jump(self, machine_class):
+        program = ["@R0", "D=M", "@POSITIVE", "D;JGT", "@R1", "M=-1", "(END)", "@END"]
+        program += ["0;JMP", "(POSITIVE)", "@R1", "M=1", "@END", "0;JMP"]
+        machine = machine_class(assemble(program))
+        machine.ram[0] = 9
+        machine.run()
+        assert machine.ram[1] == 1
+        machine.reset()
+        machine.ram[0] = -9
+        machine.run()
+        assert machine.ram[1] == -1
+
+    def test_rom_size(self, machine_class):
+        machine = machine_class.from_file("data/add/Add.hack")
+        assert len(machine.rom) == ROM_SIZE
+        assert machine.program_size == 6
+
+    def test_program_too_large(self, machine_class):
+        with pytest.raises(ValueError):
+            machine_class([0] * 32769)
+
+    def test_invalid_instruction(self, machine_class):
+        machine = machine_class([0b1111111111000000])
+        with pytest.raises(ValueError):
+            machine.run()
+
+
+class TestPredecode:
+    def test_same_state_as_decoding_every_cycle(self):
+        words = read_hack("data/pong/Pong.hack")
+        machines = [HackMachine(words), PredecodedMachine(words)]
+        for machine in machines:
+            machine.run(20000)
+            machine.step()
+        assert machines[0].registers() == machines[1].registers()
+        assert list(machines[0].ram) == list(machines[1].ram)
+
+    def test_handlers_cover_rom(self):
+        machine = PredecodedMachine(read_hack("data/max/Max.hack"))
+        assert len(machine.handlers) == 32768
+        assert machine.handlers[16] is machine.handlers[32767]
+
+    def test_halt_is_sticky(self):
+        machine = PredecodedMachine(read_hack("data/max/Max.hack"))
+        cycles = machine.run()
+        assert machine.halted
+        assert machine.run() == 0
+        assert machine.cycles == cycles
+
+
+class TestBlockTranslator:
+    def test_same_state_as_decoding_every_cycle(self):
+        words = read_hack("data/pong/Pong.hack")
+        machines = [HackMachine(words), BlockMachine(words)]
+        for cycles in [1, 37, 20000, 12345]:
+            for machine in machines:
+                assert machine.run(cycles) == cycles
+            assert machines[0].registers() == machines[1].registers()
+            assert list(machines[0].ram) == list(machines[1].ram)
+
+    def test_block_ends_at_jump(self):
+        machine = BlockMachine(read_hack("data/max/Max.hack"))
+        source, length = machine.block_source(0)
+        assert length == 6  # @0 D=M @1 D=D-M @10 D;JGT
+        assert "return 10, A, D" in source
+        assert source.endswith("return 6, A, D")
+
+    def test_halt_loop_block(self):
+        machine = BlockMachine(read_hack("data/max/Max.hack"))
+        source, _ = machine.block_source(14)
+        assert source.endswith("return ~14, A, D")
+
+    def test_reload_invalidates_blocks(self):
+        machine = BlockMachine(assemble(["@1", "D=A", "@R0", "M=D"]))
+        machine.run()
+        assert machine.blocks[0] is not None
+        machine.load_rom(assemble(["@2", "D=A", "@R0", "M=D"]))
+        assert machine.blocks[0] is None
+        machine.run()
+        assert machine.ram[0] == 2
+
+
+class TestCycleProfiler:
+    PROGRAM = [
+        "@End$Main.f$0",
+        "D=A",
+        "@R15",
+        "M=D",
+        "@Main.f",
+        "0;JMP",
+        "(End$Main.f$0)",
+        "@R2",
+        "M=1",
+        "(END)",
+        "@END",
+        "0;JMP",
+        "(Main.f)",
+        "@R1",
+        "M=1",
+        "@R15",
+        "A=M",
+        "0;JMP",
+    ]
+
+    def test_profile_call_and_return(self, tmp_path):
+        source_file_path = tmp_path / "Main.asm"
+        source_file_path.write_text("\n".join(self.PROGRAM))
+        profiler = CycleProfiler.from_source(source_file_path)
+        assert profiler.run() == 15
+        assert profiler.ram[1] == profiler.ram[2] == 1
+        assert profiler.calls == {(ROOT, "Main.f"): 1}
+        assert list(profiler.folded_stacks()) == [f"{ROOT} 10", f"{ROOT};Main.f 5"]
+        assert dict(profiler.flat_profile()) == {
+            ROOT: 6,
+            "End$Main.f$0": 2,
+            "END": 2,
+            "Main.f": 5,
+        }
+        assert profiler.function_profile() == [(ROOT, 0, 10, 15), ("Main.f", 1, 5, 5)]
+
+    def test_profile_shared_calls(self, tmp_path):
+        # 与 VMTranslator 共享调用模式相同的调用约定：$CALL 压入返回地址（D）和 4 个寄存器，
+        # LCL = SP 后跳转到 R13；$RETURN 跳转到 LCL - 5 处保存的返回地址
+        program = [
+            "@261",
+            "D=A",
+            "@SP",
+            "M=D",
+            "@Main.f",
+            "D=A",
+            "@R13",
+            "M=D",
+            "@End$Main.f$0",
+            "D=A",
+            "@$CALL",
+            "0;JMP",
+            "(End$Main.f$0)",
+            "@R2",
+            "M=1",
+            "(END)",
+            "@END",
+            "0;JMP",
+            "(Main.f)",
+            "@R7",
+            "M=1",
+            "@$RETURN",
+            "0;JMP",
+            "($CALL)",
+            "@SP",
+            "AM=M+1",
+            "A=A-1",
+            "M=D",
+            "@4",
+            "D=A",
+            "@SP",
+            "M=D+M",
+            "@SP",
+            "D=M",
+            "@LCL",
+            "M=D",
+            "@R13",
+            "A=M",
+            "0;JMP",
+            "($RETURN)",
+            "@LCL",
+            "D=M",
+            "@5",
+            "A=D-A",
+            "A=M",
+            "0;JMP",
+        ]
+        source_file_path = tmp_path / "Main.asm"
+        source_file_path.write_text("\n".join(program))
+        profiler = CycleProfiler.from_source(source_file_path)
+        profiler.run()
+        assert profiler.halted and profiler.ram[2] == profiler.ram[7] == 1
+        assert profiler.calls == {(ROOT, "Main.f"): 1}
+        assert profiler.stack == (ROOT,)
+        assert list(profiler.folded_stacks()) == [f"{ROOT} 31", f"{ROOT};Main.f 10"]
+
+    def test_from_file_with_source_map(self, tmp_path):
+        source_map_file_path = tmp_path / "Max.hackmap"
+        streaming_main(
+            "max/Max.asm",
+            str(tmp_path / "Max.hack"),
+            source_map_file_name=str(source_map_file_path),
+        )
+        profilers = [
+            CycleProfiler.from_file(tmp_path / "Max.hack", source_map_file_path),
+            CycleProfiler.from_source("data/max/Max.asm"),
+        ]
+        for profiler in profilers:
+            profiler.ram[0], profiler.ram[1] = 3, 5
+            profiler.run()
+            assert profiler.halted and profiler.ram[2] == 5
+        assert profilers[0].program_size == 16
+        assert profilers[0].flat_profile() == profilers[1].flat_profile()
+
+    def test_same_state_as_block_machine(self):
+        profiler = CycleProfiler.from_source("data/pong/Pong.asm")
+        machine = BlockMachine(read_hack("data/pong/Pong.hack"))
+        for cycles in [100_003, 7]:
+            assert profiler.run(cycles) == machine.run(cycles) == cycles
+        assert profiler.registers() == machine.registers()
+        assert profiler.ram == machine.ram
+        assert sum(profiler.stack_cycles.values()) == profiler.cycles
+        assert sum(cycles for _, cycles in profiler.flat_profile()) == profiler.cycles
+        functions = {row[0]: row for row in profiler.function_profile()}
+        assert functions["sys.init"][1] == 1
+        assert functions[ROOT][3] == profiler.cycles
+
+    def test_pstats_file(self, tmp_path):
+        import pstats
+
+        profiler = CycleProfiler.from_source("data/pong/Pong.asm")
+        profiler.run(50_000)
+        profiler.dump_stats(tmp_path / "pong.prof")
+        stats = pstats.Stats(str(tmp_path / "pong.prof"))
+        assert stats.total_tt == 50_000
+        init = next(key for key in stats.stats if key[2] == "sys.init")
+        assert stats.stats[init][1] == 1
+
+
+class TestScriptRunner:
+    PROJECTS_ROOT = pathlib.Path("../projects")
+
+    @pytest.mark.parametrize(
+        "script, lines",
+        [
+            ("4/mult/Mult.tst", 7),
+            ("4/fill/FillAutomatic.tst", 4),
+            ("5/ComputerAdd.tst", 15),
+            ("5/ComputerMax.tst", 28),
+            ("5/ComputerRect.tst", 65),
+        ],
+    )
+    def test_project_scripts(self, script, lines):
+        assert run_script(self.PROJECTS_ROOT / script, write_output=False) == lines
+
+    def test_halt_time(self):
+        # Mult.tst 第一次运行 R0 = R1 = 0，程序执行 12 条指令后进入结尾的死循环
+        lines, halt_time = run_script_timed(
+            self.PROJECTS_ROOT / "4/mult/Mult.tst", write_output=False
+        )
+        assert (lines, halt_time) == (7, 12)
+        _, halt_time = run_script_timed(
+            self.PROJECTS_ROOT / "5/ComputerAdd.tst", write_output=False
+        )
+        assert halt_time is None
+
+    def test_comparison_failure(self, tmp_path):
+        for name in ["Mult.tst", "Mult.asm", "Mult.cmp"]:
+            source_file_path = self.PROJECTS_ROOT / "4/mult" / name
+            (tmp_path / name).write_text(source_file_path.read_text())
+        cmp_file_path = tmp_path / "Mult.cmp"
+        cmp_file_path.write_text(cmp_file_path.read_text().replace("42", "41"))
+        with pytest.raises(ComparisonFailure) as error:
+            run_script(tmp_path / "Mult.tst")
+        assert error.value.line_num == 7
+        # 与 Java 工具一样，不一致的那一行也已写入 output-file
+        assert len((tmp_path / "Mult.out").read_text().splitlines()) == 7
+
+    def test_parse_script(self):
+        statements = parse_script(
+            "load Max.hack, // comment\nset RAM[0] %X10;\n"
+            "repeat 3 { ticktock; output; }\nwhile RAM[0] <> 0 { tick, tock; }"
+        )
+        tick, tock, ticktock, output = (
+            ("command", [name], None) for name in ["tick", "tock", "ticktock", "output"]
+        )
+        assert statements == [
+            ("command", ["load", "Max.hack"], None),
+            ("command", ["set", "RAM[0]", "%X10"], None),
+            ("repeat", 3, [ticktock, output]),
+            ("while", ["RAM[0]", "<>", "0"], [tick, tock]),
+        ]
+        with pytest.raises(ScriptError):
+            parse_script("repeat 3 { ticktock;")
+
+    def test_format_value(self):
+        assert format_value(-1, "D", 6) == "    -1"
+        assert format_value(5, "B", 4) == "0101"
+        assert format_value(-1, "X", 4) == "FFFF"
+        assert format_value("3+", "S", 3) == "3+ "
+
+    def test_unsupported_chip(self):
+        with pytest.raises(ScriptError):
+            run_script(self.PROJECTS_ROOT / "5/CPU.tst", write_output=False)
+
+    def test_missing_program(self, tmp_path):
+        script_file_path = tmp_path / "Missing.tst"
+        script_file_path.write_text("load Missing.hack;\nticktock;\n")
+        with pytest.raises(ScriptError, match="Missing.hack"):
+            run_script(script_file_path, write_output=False)
+
+
+class TestScreen:
+    def test_rect_dirty_rows(self):
+        machine = HackMachine.from_file("data/rect/Rect.hack")
+        framebuffer = Framebuffer(machine.ram)
+        machine.ram[0] = 3
+        machine.run()
+        assert framebuffer.update() == [0, 1, 2]
+        assert framebuffer.update() == []
+        assert framebuffer.pixel(0, 0) and framebuffer.pixel(15, 2)
+        assert not framebuffer.pixel(16, 0) and not framebuffer.pixel(0, 3)
+        machine.ram[SCREEN + 32 * 200 + 31] = -32768  # 第 200 行最右边的像素
+        assert framebuffer.update() == [200]
+        assert framebuffer.pixel(511, 200) and not framebuffer.pixel(510, 200)
+
+    def test_incremental_matches_full_render(self):
+        machine = BlockMachine(read_hack("data/pong/Pong.hack"))
+        framebuffer = Framebuffer(machine.ram)
+        for _ in range(5):
+            machine.run(200_000)
+            framebuffer.update()
+            full = Framebuffer(machine.ram)
+            full.render()
+            assert framebuffer.bitmap == full.bitmap
+
+    def test_png(self):
+        import struct
+        import zlib
+
+        framebuffer = Framebuffer([0] * 32768)
+        framebuffer.ram[SCREEN] = 1
+        framebuffer.update()
+        data = framebuffer.png()
+        assert data[:8] == b"\x89PNG\r\n\x1a\n"
+        assert struct.unpack(">II", data[16:24]) == (512, 256)
+        start = data.index(b"IDAT") + 4
+        (length,) = struct.unpack(">I", data[start - 8 : start - 4])
+        rows = zlib.decompress(data[start : start + length])
+        assert len(rows) == 256 * 65
+        assert rows[:3] == b"\x00\x7f\xff"  # 过滤字节，然后最左边一个黑色像素
+
+    def test_record_raw_stream(self, tmp_path):
+        machine = BlockMachine(read_hack("data/rect/Rect.hack"))
+        machine.ram[0] = 4
+        with open(tmp_path / "rect.raw", "wb") as f:
+            assert record(machine, 10, 100, raw_stream=f) == 1
+        assert (tmp_path / "rect.raw").stat().st_size == FRAME_BYTES
+
+
+@pytest.mark.parametrize(
+    "machine_class", [HackMachine, PredecodedMachine, BlockMachine]
+)
+class TestSnapshot:
+    def test_resume_from_snapshot(self, machine_class, tmp_path):
+        words = read_hack("data/pong/Pong.hack")
+        expected = machine_class(words)
+        expected.run(30_000)
+        machine = machine_class(words)
+        assert not snapshot.boot(machine, 20_000, tmp_path)
+        machine = machine_class(words)
+        assert snapshot.boot(machine, 20_000, tmp_path)
+        assert machine.cycles == 20_000
+        machine.run(10_000)
+        assert machine.registers() == expected.registers()
+        assert list(machine.ram) == list(expected.ram)
+
+    def test_rejects_other_program(self, machine_class, tmp_path):
+        machine = machine_class(read_hack("data/max/Max.hack"))
+        machine.run()
+        snapshot.save(machine, tmp_path / "max.hsnap")
+        restored = machine_class(read_hack("data/max/Max.hack"))
+        snapshot.load(restored, tmp_path / "max.hsnap")
+        assert restored.halted and restored.registers() == machine.registers()
+        other = machine_class(read_hack("data/add/Add.hack"))
+        with pytest.raises(ValueError):
+            snapshot.load(other, tmp_path / "max.hsnap")
+
+    def test_rejects_corrupted_snapshot(self, machine_class, tmp_path):
+        machine = machine_class(read_hack("data/max/Max.hack"))
+        data = bytearray(snapshot.dumps(machine))
+        data[-1] ^= 0xFF
+        (tmp_path / "max.hsnap").write_bytes(data)
+        with pytest.raises(ValueError):
+            snapshot.load(machine, tmp_path / "max.hsnap")
+        data[4] = 2  # 版本号
+        with pytest.raises(ValueError):
+            snapshot.restore(machine, data)
+
+
+class TestBatchEmulator:
+    @pytest.fixture(autouse=True)
+    def numpy(self):
+        return pytest.importorskip("numpy")
+
+    def test_alu_matches_comp_table(self, numpy):
+        from batch_emulator import BatchMachine
+        from emulator import COMP_FUNCTIONS
+
+        values = [0, 1, -1, 5, -7, 12345, 32767, -32768]
+        x = numpy.array([x for x in values for _ in values], dtype=numpy.int32)
+        y = numpy.array([y for _ in values for y in values], dtype=numpy.int32)
+        for comp, function in COMP_FUNCTIONS.items():
+            out = BatchMachine.alu(x, y, numpy.full(len(x), comp))
+            a, m = (0 * y, y) if comp & 0b1000000 else (y, 0 * y)
+            expected = [to_signed(function(*args)) for args in zip(x, a, m)]
+            assert out.tolist() == expected
+
+    def test_same_state_as_decoding_every_cycle(self):
+        from batch_emulator import run_programs
+
+        sources = ["add/Add", "max/Max", "rect/Rect", "pong/Pong"]
+        programs = [read_hack(f"data/{source}.hack") for source in sources]
+        for program, batch_machine in zip(programs, run_programs(programs, 3000)):
+            machine = HackMachine(program)
+            machine.run(3000)
+            assert batch_machine.registers() == machine.registers()
+            assert batch_machine.halted == machine.halted
+            assert batch_machine.ram == machine.ram
+
+    def test_same_program_different_inputs(self):
+        from batch_emulator import BatchMachine
+
+        inputs = [(3, 5), (7, -2), (0, 0), (-4, -9)]
+        batch = BatchMachine.from_files(["data/max/Max.hack"] * len(inputs))
+        batch.ram[:, :2] = inputs
+        batch.run()
+        assert batch.halted.all()
+        assert batch.ram[:, 2].tolist() == [max(x, y) for x, y in inputs]
+
+    def test_halted_machines_are_masked(self):
+        from batch_emulator import BatchMachine
+
+        batch = BatchMachine(
+            [assemble(["@1", "D=A"]), read_hack("data/max/Max.hack"), []]
+        )
+        assert batch.run() == 14
+        assert batch.cycles.tolist() == [2, 14, 0]
+        assert batch.halted.all()
+
+    def test_invalid_instruction(self):
+        from batch_emulator import BatchMachine
+
+        with pytest.raises(ValueError):
+            BatchMachine([[0], [0b1111111111000000]]).run()
+
 
 class TestSymbolTable:
     def test_symbol_table_constructor(self):
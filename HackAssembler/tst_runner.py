@@ -0,0 +1,379 @@
+"""
+.tst/.cmp 测试脚本运行器：不启动 JVM，在进程内解释 CPU 模拟器的测试脚本语言。
+
+支持的命令：load、output-file、compare-to、output-list、set、tick/tock/ticktock、
+output、repeat（含无次数的无限循环）、while，以及 echo 等只对界面有意义的命令（忽略）。
+程序由内置的 Hack CPU 模型（BlockMachine）执行；load .asm 时在进程内汇编。
+此外支持 projects/5 中以 Computer.hdl 为对象的脚本：ROM32K load、ARegister[]、
+DRegister[]、PC[]、RAM16K[i] 和 reset 都映射到同一个 CPU 模型上；其他芯片不支持。
+
+output 产生的每一行立即写入 output-file，并与 compare-to 文件的对应行比较
+（.cmp 中的 * 匹配任意字符），第一处不同就抛出 ComparisonFailure。
+
+运行方式：python tst_runner.py ../projects/4/mult/Mult.tst ../projects/5/ComputerMax.tst
+"""
+
+import argparse
+import pathlib
+import re
+import sys
+from itertools import count
+from typing import IO, Iterator, List, Tuple
+
+from assembler import assemble
+from block_translator import BlockMachine
+from emulator import to_signed
+
+TOKEN_PATTERN = re.compile(r'"[^"]*"|[{},;!]|[^\s{},;!]+')
+COMMENT_PATTERN = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+COLUMN_PATTERN = re.compile(r"(.+?)%([BDSX])(\d+)\.(\d+)\.(\d+)$")
+VARIABLE_PATTERN = re.compile(r"([A-Za-z][\w-]*)(?:\[(\d*)\])?$")
+DEFAULT_FORMAT = ("B", 1, 16, 1)  # 不带格式的输出项按 %B1.16.1 输出
+
+# Computer 芯片中的部件名 -> CPU 模拟器中的变量名
+ALIASES = {"ARegister": "A", "DRegister": "D", "RAM16K": "RAM", "ROM32K": "ROM"}
+SUPPORTED_CHIPS = {"Computer.hdl"}
+# 只对界面有意义的命令
+IGNORED_COMMANDS = {"echo", "clear-echo", "breakpoint", "clear-breakpoints"}
+
+Column = Tuple[str, str, int, int, int]  # (变量名, 格式, 左边距, 宽度, 右边距)
+
+
+class ScriptError(ValueError):
+    """脚本有语法错误，或使用了不支持的命令、变量或芯片。"""
+
+
+class ComparisonFailure(Exception):
+    """输出与 .cmp 文件不一致。"""
+
+    def __init__(self, line_num: int, expected: str | None, actual: str) -> None:
+        super().__init__(
+            f"comparison failure at line {line_num}: "
+            f"expected {expected!r}, got {actual!r}"
+        )
+        self.line_num = line_num
+        self.expected = expected
+        self.actual = actual
+
+
+def parse_script(text: str) -> list:
+    """把脚本解析为语句列表。
+
+    每条语句为 ("command", 单词列表, None)、("repeat", 次数或 None, 循环体)
+    或 ("while", 条件单词列表, 循环体)。
+    """
+    tokens = iter(TOKEN_PATTERN.findall(COMMENT_PATTERN.sub(" ", text)))
+    return _parse_block(tokens)
+
+
+def _parse_block(tokens: Iterator[str], nested: bool = False) -> list:
+    statements = []
+    words: List[str] = []
+    for token in tokens:
+        if token in ",;!":
+            if words:
+                statements.append(("command", words, None))
+                words = []
+        elif token == "{":
+            if not words or words[0] not in ("repeat", "while"):
+                raise ScriptError(f"unexpected {{ after {' '.join(words)!r}")
+            body = _parse_block(tokens, nested=True)
+            if words[0] == "repeat":
+                times = int(words[1]) if len(words) > 1 else None
+                statements.append(("repeat", times, body))
+            else:
+                statements.append(("while", words[1:], body))
+            words = []
+        elif token == "}":
+            if not nested:
+                raise ScriptError("unexpected }")
+            if words:
+                statements.append(("command", words, None))
+            return statements
+        else:
+            words.append(token)
+    if nested:
+        raise ScriptError("missing }")
+    if words:
+        statements.append(("command", words, None))
+    return statements
+
+
+def parse_value(text: str) -> int:
+    """解析 12、-1、%D12、%B0101、%X1F 形式的数值。"""
+    if text.startswith("%"):
+        base = {"B": 2, "D": 10, "X": 16}.get(text[1:2])
+        if base is None:
+            raise ScriptError(f"invalid value {text}")
+        return to_signed(int(text[2:], base))
+    return to_signed(int(text))
+
+
+def parse_column(text: str) -> Column:
+    match = COLUMN_PATTERN.match(text)
+    if match is None:
+        return (text,) + DEFAULT_FORMAT
+    name, format_, left, width, right = match.groups()
+    return name, format_, int(left), int(width), int(right)
+
+
+def format_value(value: int | str, format_: str, width: int) -> str:
+    if isinstance(value, str) or format_ == "S":
+        return str(value).ljust(width)
+    if format_ == "D":
+        return str(value).rjust(width)
+    if format_ == "B":
+        return f"{value & 0xFFFF:016b}"[-width:]
+    return f"{value & 0xFFFF:04X}"[-width:].rjust(width)
+
+
+def compare_line(expected: str, actual: str) -> bool:
+    """逐字符比较，expected 中的 * 匹配任意字符。"""
+    return len(expected) == len(actual) and all(
+        e == "*" or e == a for e, a in zip(expected, actual)
+    )
+
+
+class ScriptRunner:
+    """执行一个 .tst 脚本；文件名都相对于脚本所在的目录。"""
+
+    def __init__(
+        self, script_file_path: str | pathlib.Path, write_output: bool = True
+    ) -> None:
+        self.script_file_path = pathlib.Path(script_file_path)
+        self.directory = self.script_file_path.parent
+        self.write_output = write_output
+        self.machine = BlockMachine()
+        self.time = 0
+        self.ticked = False  # 已执行 tick 而未执行 tock，此时 time 输出为 "N+"
+        # 程序第一次停机（进入死循环或执行到末尾）时的 time，用于比较程序的执行周期数
+        self.halt_time: int | None = None
+        self.reset_bit = 0
+        self.columns: List[Column] = []
+        self.output_file: IO[str] | None = None
+        self.compare_lines: Iterator[str] | None = None
+        self.line_num = 0
+
+    def run(self) -> Iterator[str]:
+        """执行脚本，逐行产生输出（已写入 output-file 并通过比较）。"""
+        statements = parse_script(self.script_file_path.read_text())
+        try:
+            yield from self._execute(statements)
+        finally:
+            if self.output_file is not None:
+                self.output_file.close()
+
+    def _execute(self, statements: list) -> Iterator[str]:
+        for kind, argument, body in statements:
+            if kind == "command":
+                line = self.command(argument)
+                if line is not None:
+                    yield self._emit(line)
+            elif kind == "repeat":
+                if argument is not None and body == [("command", ["ticktock"], None)]:
+                    # 只有 ticktock 的循环一次执行完
+                    self.run_cycles(argument)
+                    continue
+                for _ in range(argument) if argument is not None else count():
+                    yield from self._execute(body)
+            else:
+                while self.condition(argument):
+                    yield from self._execute(body)
+
+    def _emit(self, line: str) -> str:
+        self.line_num += 1
+        if self.output_file is not None:
+            self.output_file.write(line + "\n")
+        if self.compare_lines is not None:
+            expected = next(self.compare_lines, None)
+            if expected is None or not compare_line(expected, line):
+                raise ComparisonFailure(self.line_num, expected, line)
+        return line
+
+    def command(self, words: List[str]) -> str | None:
+        """执行一条命令，产生输出时返回输出行。"""
+        name, arguments = words[0], words[1:]
+        if name in IGNORED_COMMANDS:
+            return None
+        if name == "load" or name == "ROM32K" and arguments[:1] == ["load"]:
+            if name == "ROM32K":
+                arguments = arguments[1:]
+            if arguments:
+                self.load(arguments[0])
+        elif name == "output-file":
+            if self.write_output:
+                self.output_file = open(self.directory / arguments[0], "w")
+        elif name == "compare-to":
+            with open(self.directory / arguments[0], "r") as f:
+                lines = [line.rstrip("\r\n") for line in f]
+            self.compare_lines = iter(lines)
+        elif name == "output-list":
+            self.columns = [parse_column(argument) for argument in arguments]
+            return self.header()
+        elif name == "output":
+            return self.output()
+        elif name == "set":
+            self.set(arguments[0], parse_value(arguments[1]))
+        elif name == "tick":
+            self.ticked = True
+        elif name == "tock":
+            self.run_cycles(1)
+        elif name == "ticktock":
+            self.run_cycles(1)
+        else:
+            raise ScriptError(f"unsupported command {name}")
+        return None
+
+    def load(self, file_name: str) -> None:
+        path = self.directory / file_name
+        if path.suffix == ".hdl":
+            if file_name not in SUPPORTED_CHIPS:
+                raise ScriptError(f"unsupported chip {file_name}")
+            self.machine = BlockMachine()
+        elif not path.exists():
+            raise ScriptError(f"cannot load {file_name}: file not found")
+        elif path.suffix == ".asm":
+            with open(path, "r") as f:
+                self.machine = BlockMachine(assemble(f))
+        else:
+            self.machine = BlockMachine.from_file(path)
+
+    def run_cycles(self, count: int) -> None:
+        """执行 count 个时钟周期（每个周期一条指令）。"""
+        machine = self.machine
+        self.time += count
+        self.ticked = False
+        if self.reset_bit:
+            # reset 为 1 时指令照常执行，但下一条指令的地址总是 0
+            for _ in range(count):
+                machine.step()
+                machine.pc = 0
+            return
+        machine.halted = False
+        remaining = count - machine.run(count)
+        if remaining and self.halt_time is None:
+            self.halt_time = self.time - remaining
+        if remaining and machine.pc >= machine.program_size:
+            # 程序之外的 ROM 都是 0，即 @0，逐条执行
+            for _ in range(remaining):
+                machine.step()
+        elif remaining:
+            # 停在死循环上：跳到自身时状态不再变化，两条指令的循环按奇偶决定 pc
+            for _ in range(remaining % 2):
+                machine.step()
+
+    def get(self, name: str) -> int | str:
+        """读取变量的值；time 返回字符串。"""
+        base, index = self._variable(name)
+        machine = self.machine
+        if base == "time":
+            return f"{self.time}+" if self.ticked else str(self.time)
+        if base == "A":
+            return machine.a
+        if base == "D":
+            return machine.d
+        if base == "PC":
+            return machine.pc
+        if base == "RAM":
+            return machine.ram[index]
+        if base == "ROM":
+            return machine.rom[index]
+        if base == "reset":
+            return self.reset_bit
+        raise ScriptError(f"unknown variable {name}")
+
+    def set(self, name: str, value: int) -> None:
+        base, index = self._variable(name)
+        machine = self.machine
+        if base == "A":
+            machine.a = value
+        elif base == "D":
+            machine.d = value
+        elif base == "PC":
+            machine.pc = value
+            machine.halted = False
+        elif base == "RAM":
+            machine.ram[index] = value
+        elif base == "reset":
+            self.reset_bit = value & 1
+        else:
+            raise ScriptError(f"cannot set {name}")
+
+    def _variable(self, name: str) -> Tuple[str, int]:
+        match = VARIABLE_PATTERN.match(name)
+        if match is None:
+            raise ScriptError(f"invalid variable {name}")
+        base, index = match.groups()
+        return ALIASES.get(base, base), int(index) if index else 0
+
+    def condition(self, words: List[str]) -> bool:
+        """计算 while 的条件，形如 RAM[0] <> 0。"""
+        if len(words) != 3:
+            raise ScriptError(f"invalid condition {' '.join(words)}")
+        left, operator, right = words
+        a, b = self.get(left), parse_value(right)
+        operations = {
+            "=": a == b,
+            "<>": a != b,
+            "<": a < b,
+            "<=": a <= b,
+            ">": a > b,
+            ">=": a >= b,
+        }
+        if operator not in operations:
+            raise ScriptError(f"invalid operator {operator}")
+        return operations[operator]
+
+    def header(self) -> str:
+        cells = []
+        for name, _, left, width, right in self.columns:
+            total = left + width + right
+            name = name[:total]
+            padding = total - len(name)
+            cells.append(" " * (padding // 2) + name + " " * (padding - padding // 2))
+        return "|" + "|".join(cells) + "|"
+
+    def output(self) -> str:
+        cells = []
+        for name, format_, left, width, right in self.columns:
+            text = format_value(self.get(name), format_, width)
+            cells.append(" " * left + text + " " * right)
+        return "|" + "|".join(cells) + "|"
+
+
+def run_script(script_file_path: str | pathlib.Path, write_output: bool = True) -> int:
+    """执行脚本并与 .cmp 文件比较，返回输出的行数；不一致时抛出 ComparisonFailure。"""
+    lines, _ = run_script_timed(script_file_path, write_output)
+    return lines
+
+
+def run_script_timed(
+    script_file_path: str | pathlib.Path, write_output: bool = True
+) -> Tuple[int, int | None]:
+    """与 run_script 相同，同时返回程序第一次停机时的周期数（没有停机时为 None）。"""
+    runner = ScriptRunner(script_file_path, write_output)
+    lines = 0
+    for _ in runner.run():
+        lines += 1
+    return lines, runner.halt_time
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=".tst/.cmp 测试脚本运行器")
+    arg_parser.add_argument("scripts", type=pathlib.Path, nargs="+", help=".tst 文件")
+    arg_parser.add_argument(
+        "--no-output", action="store_true", help="不写出 output-file 指定的文件"
+    )
+    args = arg_parser.parse_args()
+
+    failed = 0
+    for script_file_path in args.scripts:
+        try:
+            lines, halt_time = run_script_timed(script_file_path, not args.no_output)
+        except (ComparisonFailure, ScriptError, OSError) as error:
+            failed += 1
+            print(f"{script_file_path}: FAIL {error}")
+        else:
+            halted = f", halted at cycle {halt_time}" if halt_time is not None else ""
+            print(f"{script_file_path}: ok ({lines} lines{halted})")
+    sys.exit(1 if failed else 0)
@@ -2,12 +2,18 @@ import os
 import sys
 from pathlib import Path
 
+import vm_ir
+from code_writer import COMPARE_ROUTINES, HALT_LABEL, ROUTINES
+from vm_ir import LAST_ARITHMETIC, Op, Segment
+
 
 class VMTranslator:
     """docstring for VMTranslator"""
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, shared_compares=False):
         """
+        @para shared_compares (bool): route eq/gt/lt through the shared $EQ/$GT/$LT
+            routines of code_writer.py, see CodeWriter
         @attr self.vm_files (list of str):the Xxx.vm files needed to be translated
         @attr self.asm_filename (str): output filename
         @attr self.output_path (str): path for the output_file
@@ -18,6 +24,8 @@ class VMTranslator:
         self.asm_codes = []
         self.symbol_index = 0
         self.ret_index = 0
+        self.shared_compares = shared_compares
+        self.routines = []
         if os.path.isdir(file_path):
             for file in os.listdir(file_path):
                 if file[-2:] == "vm":
@@ -56,11 +64,23 @@ class VMTranslator:
             self.asm_codes += ["@Sys.init", "0;JMP", "(bootstrap)"]
 
         for file in self.vm_files:
-            single_parse = SingleVMTranslator(file, self.symbol_index, self.ret_index)
+            single_parse = SingleVMTranslator(
+                file, self.symbol_index, self.ret_index, self.shared_compares
+            )
             single_parse.parse()
             self.asm_codes += single_parse.asm_codes
             self.symbol_index = single_parse.symbol_index
             self.ret_index = single_parse.ret_index
+            for routine in single_parse.routines:
+                if routine not in self.routines:
+                    self.routines.append(routine)
+
+        if self.routines:
+            if not self.multi:  # halt before falling into the routines
+                self.asm_codes += ["(" + HALT_LABEL + ")", "@" + HALT_LABEL, "0;JMP"]
+            for routine in self.routines:
+                self.asm_codes += ["//" + routine, "(" + routine + ")"]
+                self.asm_codes += ROUTINES[routine]
 
     def save_file(self):
         """
@@ -78,108 +98,92 @@ class SingleVMTranslator:
     translate a .vm file into assembly codes for hack machine
     """
 
-    def __init__(self, file_path, symbol_index, ret_index):
+    def __init__(self, file_path, symbol_index, ret_index, shared_compares=False):
         """
-        open the file and filter the blanks and comments
+        parse the file once into a VMModule
         @attr self.vm_filename (str): input file
-        @attr self.codes (list of str): a list contains clean vm code with no blank or comments
-        @attr self.asm_codes(list of str): a list contains assembly codes generated from self.codes
+        @attr self.module (VMModule): the parsed vm codes, see vm_ir.py
+        @attr self.asm_codes(list of str): a list contains assembly codes generated from it
 
         @attr self.symbol_index(int): use it to make sure that each symbol is unique
         @attr self.ret_index(int): use it to make sure that each ret label is unique
+        @attr self.shared_compares (bool): eq/gt/lt jump to the shared routines
+        @attr self.routines (list of str): the shared routines used by this file
         """
         self.vm_filename = os.path.basename(file_path)
         suffix = self.vm_filename[self.vm_filename.find(".") + 1 :]
         assert suffix == "vm", "please choose an input file named xxx.vm"
-        self.codes = []
+        self.module = vm_ir.load(file_path)
         self.asm_codes = []
-        with open(file_path, "r") as file:
-            for line in file:
-                _line = line.strip()
-                if len(_line) == 0 or _line[0] == "/":
-                    continue
-                if _line.find("/") != -1:
-                    _line = _line[: _line.find("/")]
-                self.codes.append(_line.strip())
 
         # below are the variables needed while parsing
         self.arith_dict = {
-            "not": "!",
-            "neg": "-",
-            "add": "+",
-            "sub": "-",
-            "and": "&",
-            "or": "|",
-            "eq": "JNE",
-            "lt": "JGE",
-            "gt": "JLE",
+            Op.NOT: "!",
+            Op.NEG: "-",
+            Op.ADD: "+",
+            Op.SUB: "-",
+            Op.AND: "&",
+            Op.OR: "|",
+            Op.EQ: "JNE",
+            Op.LT: "JGE",
+            Op.GT: "JLE",
         }
         self.mapping = {
-            "local": "LCL",
-            "argument": "ARG",
-            "this": "THIS",
-            "that": "THAT",
-            "temp": "5",
-            "pointer": "3",
+            Segment.LOCAL: "LCL",
+            Segment.ARGUMENT: "ARG",
+            Segment.THIS: "THIS",
+            Segment.THAT: "THAT",
+            Segment.TEMP: "5",
+            Segment.POINTER: "3",
         }
         self.symbol_index = symbol_index
         self.ret_index = ret_index
         self.cur_funcname = ""
+        self.shared_compares = shared_compares
+        self.routines = []
 
     def parse(self):
         """
-        for each line in self.codes, generate its corresponding assembly codes
+        for each command in self.module, generate its corresponding assembly codes
         """
-        for code in self.codes:
-            part = code.split()
-            if len(part) == 1:
-                if part[0] == "return":
-                    self.asm_codes += ["//" + code]
-                    self.asm_codes += self.C_return()
-                else:
-                    # arithmetic commands
-                    self.asm_codes += ["//" + code]
-                    self.asm_codes += self.C_arith(part[0])
-            elif part[0] == "push":  # push command
-                self.asm_codes += ["//" + code]
-                self.asm_codes += self.C_push(part[1:])
-            elif part[0] == "pop":  # pop command
-                self.asm_codes += ["//" + code]
-                self.asm_codes += self.C_pop(part[1:])
-            elif part[0] == "label":
-                self.asm_codes += ["//" + code]
-                label_ = self.cur_funcname + "$" + part[1]
+        symbols = self.module.symbols
+        for index, (op, arg, value) in enumerate(self.module):
+            self.asm_codes += ["//" + self.module.text(index)]
+            if op == Op.RETURN:
+                self.asm_codes += self.C_return()
+            elif op <= LAST_ARITHMETIC:  # arithmetic commands
+                self.asm_codes += self.C_arith(Op(op))
+            elif op == Op.PUSH:  # push command
+                self.asm_codes += self.C_push(Segment(arg), value)
+            elif op == Op.POP:  # pop command
+                self.asm_codes += self.C_pop(Segment(arg), value)
+            elif op == Op.LABEL:
+                label_ = self.cur_funcname + "$" + symbols[arg]
                 self.asm_codes += ["(" + label_ + ")"]
-            elif part[0] == "goto":
-                self.asm_codes += ["//" + code]
-                label_ = self.cur_funcname + "$" + part[1]
+            elif op == Op.GOTO:
+                label_ = self.cur_funcname + "$" + symbols[arg]
                 self.asm_codes += ["@" + label_, "0;JMP"]
-            elif part[0] == "if-goto":
-                self.asm_codes += ["//" + code]
-                label_ = self.cur_funcname + "$" + part[1]
+            elif op == Op.IF_GOTO:
+                label_ = self.cur_funcname + "$" + symbols[arg]
                 self.asm_codes += ["@SP", "AM=M-1", "D=M", "@" + label_, "D;JNE"]
-            elif part[0] == "function":
-                self.asm_codes += ["//" + code]
-                self.asm_codes += self.C_function(part[1:])
-            elif part[0] == "call":
-                self.asm_codes += ["//" + code]
-                self.asm_codes += self.C_call(part[1:])
+            elif op == Op.FUNCTION:
+                self.asm_codes += self.C_function(symbols[arg], value)
             else:
-                raise ValueError("illegal vm codes found")
+                self.asm_codes += self.C_call(symbols[arg], value)
 
-    def C_call(self, command):
+    def C_call(self, func_name, arg_num):
         """
         generate assembly codes for call commands
-        @para command (list of str):[func_name,argument num]
+        @para func_name (str), arg_num (int)
         """
-        label = "End$" + command[0] + "$" + str(self.ret_index)
+        label = "End$" + func_name + "$" + str(self.ret_index)
         self.ret_index += 1
         push_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
         asm_code = ["@" + label, "D=A"] + push_D  # push retAddr
         for x in ["LCL", "ARG", "THIS", "THAT"]:  # push LCL,ARG,THIS,THAT
             asm_code += ["@" + x, "D=M"] + push_D
         asm_code += [
-            "@" + str(int(command[1]) + 5),
+            "@" + str(arg_num + 5),
             "D=A",
             "@SP",
             "D=M-D",
@@ -187,7 +191,7 @@ class SingleVMTranslator:
             "M=D",
         ]  # ARG=SP-n-5
         asm_code += ["@SP", "D=M", "@LCL", "M=D"]  # LCL=SP
-        asm_code += ["@" + command[0], "0;JMP"]  # goto f
+        asm_code += ["@" + func_name, "0;JMP"]  # goto f
         asm_code += ["(" + label + ")"]  # retAddr label
         return asm_code
 
@@ -238,30 +242,38 @@ class SingleVMTranslator:
         asm_code += ["@R14", "A=M", "0;JMP"]  # goto retAddr
         return asm_code
 
-    def C_function(self, command):
+    def C_function(self, func_name, local_num):
         """
         generate assembly codes for function commands
-        @para command (list of str): [function_name,local variable num]
+        @para func_name (str), local_num (int): local variable num
         """
-        self.cur_funcname = command[0]
-        asm_code = ["(" + command[0] + ")"]
-        for i in range(int(command[1])):
+        self.cur_funcname = func_name
+        asm_code = ["(" + func_name + ")"]
+        for i in range(local_num):
             asm_code += ["@SP", "A=M", "M=0", "@SP", "M=M+1"]
         return asm_code
 
     def C_arith(self, command):
         """
         generate assembly codes for arithmetic commands
-        @para command (str): the arithmetic command to be translated
+        @para command (Op): the arithmetic command to be translated
         """
-        if command in ["not", "neg"]:  # one argument command
+        if command in [Op.NOT, Op.NEG]:  # one argument command
             spec = "M=" + self.arith_dict[command] + "M"
             asm_code = ["@SP", "A=M-1", spec]
-        elif command in ["add", "sub", "and", "or"]:
+        elif command in [Op.ADD, Op.SUB, Op.AND, Op.OR]:
             spec = "M=M" + self.arith_dict[command] + "D"
             asm_code = ["@SP", "AM=M-1", "D=M", "A=A-1", spec]
-        elif command in ["eq", "gt", "lt"]:
-            symbol = command + "_" + str(self.symbol_index)
+        elif command in [Op.EQ, Op.GT, Op.LT] and self.shared_compares:
+            # the return address goes to the routine in D, see code_writer.py
+            symbol = command.keyword + "_" + str(self.symbol_index)
+            routine = COMPARE_ROUTINES[command]
+            if routine not in self.routines:
+                self.routines.append(routine)
+            asm_code = ["@" + symbol, "D=A", "@" + routine, "0;JMP", "(" + symbol + ")"]
+            self.symbol_index += 1
+        elif command in [Op.EQ, Op.GT, Op.LT]:
+            symbol = command.keyword + "_" + str(self.symbol_index)
             symbol1 = "@" + symbol
             symbol2 = "(" + symbol + ")"
             spec = "D;" + self.arith_dict[command]
@@ -283,64 +295,64 @@ class SingleVMTranslator:
 
         return asm_code
 
-    def C_push(self, command):
+    def C_push(self, segment, index):
         """
         generate assembly codes for push commands
-        @para command (list of str): the push command to be translated
+        @para segment (Segment), index (int): the push command to be translated
         """
         # put the value which will be pushed into the stack in D
         asm_code = []
-        if command[0] == "constant":
-            asm_code = ["@" + command[1], "D=A"]
-        elif command[0] in ["local", "argument", "this", "that"]:
+        if segment == Segment.CONSTANT:
+            asm_code = ["@" + str(index), "D=A"]
+        elif segment in [Segment.LOCAL, Segment.ARGUMENT, Segment.THIS, Segment.THAT]:
             asm_code = [
-                "@" + command[1],
+                "@" + str(index),
                 "D=A",
-                "@" + self.mapping[command[0]],
+                "@" + self.mapping[segment],
                 "A=M+D",
                 "D=M",
             ]
-        elif command[0] in ["temp", "pointer"]:
+        elif segment in [Segment.TEMP, Segment.POINTER]:
             asm_code = [
-                "@" + command[1],
+                "@" + str(index),
                 "D=A",
-                "@" + self.mapping[command[0]],
+                "@" + self.mapping[segment],
                 "A=A+D",
                 "D=M",
             ]
-        elif command[0] == "static":
-            symbol = "@" + self.vm_filename[:-3] + "." + command[1]
+        elif segment == Segment.STATIC:
+            symbol = "@" + self.vm_filename[:-3] + "." + str(index)
             asm_code = [symbol, "D=M"]
 
         # put the value in D into *SP, then SP++
         return asm_code + ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
 
-    def C_pop(self, command):
+    def C_pop(self, segment, index):
         """
         generate assembly codes for pop commands
-        @para command (list of str): the pop command to be translated
+        @para segment (Segment), index (int): the pop command to be translated
         """
         # compute the address
-        if command[0] in ["local", "argument", "this", "that"]:
+        if segment in [Segment.LOCAL, Segment.ARGUMENT, Segment.THIS, Segment.THAT]:
             asm_code = [
-                "@" + command[1],
+                "@" + str(index),
                 "D=A",
-                "@" + self.mapping[command[0]],
+                "@" + self.mapping[segment],
                 "D=M+D",
                 "@R15",
                 "M=D",
             ]
-        elif command[0] in ["temp", "pointer"]:
+        elif segment in [Segment.TEMP, Segment.POINTER]:
             asm_code = [
-                "@" + command[1],
+                "@" + str(index),
                 "D=A",
-                "@" + self.mapping[command[0]],
+                "@" + self.mapping[segment],
                 "D=A+D",
                 "@R15",
                 "M=D",
             ]
-        elif command[0] == "static":
-            symbol = "@" + self.vm_filename[:-3] + "." + command[1]
+        elif segment == Segment.STATIC:
+            symbol = "@" + self.vm_filename[:-3] + "." + str(index)
             asm_code = [symbol, "D=A", "@R15", "M=D"]
 
         # put the value *SP into M[address],then SP--
@@ -0,0 +1,238 @@
+"""
+比较不同翻译选项生成的汇编程序：
+
+- 程序大小：每个程序的 ROM 字数（指令数，不含标签和注释）。程序是一个包含 .vm 文件的文件夹，
+  给定 --os 时，文件夹中没有的类从 OS 文件夹补齐（如 projects/12 的 MathTest 只有 Main.vm 和 Math.vm）；
+- 程序的执行周期数（--run）：删除不可达代码后汇编，执行到调用 Sys.halt 为止的周期数，
+  超出 ROM 或在 --max-cycles 内没有结束的程序不统计；
+- 执行周期数（--tests）：对 projects/7、8 的 .tst 脚本，按各个选项翻译后用
+  HackAssembler/tst_runner.py 运行，检查结果并统计程序停机（进入死循环或执行到末尾）时的周期数。
+
+运行方式：python benchmark.py ../JackOperatingSystem/Pong ../JackOperatingSystem/*Test --os ../tools/OS
+         python benchmark.py ../JackOperatingSystem/ArrayTest --os ../tools/OS --run
+         python benchmark.py ../JackOperatingSystem/ArrayTest --os ../tools/OS --run \
+             --modes shared-calls+fuse-branches shared-calls+fuse-branches+superinstructions
+         python benchmark.py --tests ../projects/7 ../projects/8
+"""
+
+import argparse
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, Iterable, List, Tuple
+
+import vm_ir
+from main import translate
+from vm_ir import VMModule
+
+# 模式名 -> translate() 的参数，用 + 连接的模式名表示同时使用，如 shared-calls+fuse-branches
+MODES: Dict[str, dict] = {
+    "default": {},
+    "shared-calls": {"shared_calls": True},
+    "shared-compares": {"shared_compares": True},
+    "shared": {"shared_calls": True, "shared_compares": True},
+    "fuse-branches": {"fuse_branches": True},
+    "superinstructions": {"superinstructions": True},
+}
+
+HACK_ASSEMBLER_DIR = pathlib.Path(__file__).resolve().parent.parent / "HackAssembler"
+# HackAssembler 中有与本目录同名的模块（parser、code_writer、main），只能在子进程中运行
+TEST_SCRIPT = """
+import sys
+from tst_runner import run_script_timed
+print(run_script_timed(sys.argv[1], write_output=False)[1])
+"""
+# 在 Sys.halt 的入口放一个死循环，模拟器执行到这里即停机
+PROGRAM_SCRIPT = """
+import sys
+from assembler import assemble
+from block_translator import BlockMachine
+from dead_code import DeadCodeEliminator
+source = open(sys.argv[1]).read()
+source = source.replace("(Sys.halt)\\n", "(Sys.halt)\\n@Sys.halt\\n0;JMP\\n")
+machine = BlockMachine(assemble(source, eliminator=DeadCodeEliminator()))
+machine.run(int(sys.argv[2]))
+print(machine.cycles if machine.halted else None)
+"""
+
+
+def mode_options(mode: str) -> dict:
+    """模式名 -> translate() 的参数"""
+    options = {}
+    for name in mode.split("+"):
+        if name not in MODES:
+            raise ValueError(f"unknown mode {name}, choose from {', '.join(MODES)}")
+        options.update(MODES[name])
+    return options
+
+
+def load_program(
+    directory: pathlib.Path, os_directory: pathlib.Path | None = None
+) -> List[VMModule]:
+    """读取文件夹中的全部 .vm 文件，缺少的 OS 类从 os_directory 补齐"""
+    paths = {path.name: path for path in directory.glob("*.vm")}
+    if os_directory is not None:
+        for path in os_directory.glob("*.vm"):
+            paths.setdefault(path.name, path)
+    return [vm_ir.load(paths[name]) for name in sorted(paths)]
+
+
+def rom_words(asm_lines: Iterable[str]) -> int:
+    """汇编程序的指令数"""
+    return sum(
+        1 for line in asm_lines if line and not line.startswith(("//", "("))
+    )
+
+
+def measure(modules: List[VMModule], modes: Iterable[str]) -> Dict[str, int]:
+    """各个模式下的 ROM 字数"""
+    return {
+        mode: rom_words(translate(modules, bootstrap=True, **mode_options(mode)))
+        for mode in modes
+    }
+
+
+def _run_hack(script: str, *arguments: str) -> int | None:
+    """在 HackAssembler 目录下运行 script，返回它输出的周期数；出错时抛出 RuntimeError"""
+    result = subprocess.run(
+        [sys.executable, "-c", script, *arguments],
+        cwd=HACK_ASSEMBLER_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    output = result.stdout.strip()
+    return None if output == "None" else int(output)
+
+
+def run_test(script_file_path: pathlib.Path) -> int | None:
+    """运行 .tst 脚本，返回程序停机时的周期数；结果与 .cmp 不一致时抛出 RuntimeError"""
+    return _run_hack(TEST_SCRIPT, str(script_file_path.resolve()))
+
+
+def run_program(asm_lines: List[str], max_cycles: int) -> int | None:
+    """执行引导后的程序直到调用 Sys.halt，返回周期数；max_cycles 内没有结束时为 None"""
+    with tempfile.TemporaryDirectory() as temp:
+        asm_file_path = pathlib.Path(temp) / "program.asm"
+        with open(asm_file_path, "w") as f:
+            f.writelines(f"{line}\n" for line in asm_lines)
+        return _run_hack(PROGRAM_SCRIPT, str(asm_file_path), str(max_cycles))
+
+
+def measure_test(
+    script_file_path: pathlib.Path, modes: Iterable[str]
+) -> Dict[str, Tuple[int, int | None]]:
+    """在临时目录中按各个模式翻译 .tst 所在的文件夹并运行脚本，返回 (ROM 字数, 周期数)
+
+    文件夹中有 Sys.vm 时加入引导代码，否则按单个文件翻译（与 main 相同）。
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as temp:
+        for mode in modes:
+            directory = pathlib.Path(temp) / mode
+            shutil.copytree(script_file_path.parent, directory)
+            bootstrap = (directory / "Sys.vm").exists()
+            asm = translate(load_program(directory), bootstrap, **mode_options(mode))
+            with open(directory / (script_file_path.stem + ".asm"), "w") as f:
+                f.writelines(f"{line}\n" for line in asm)
+            try:
+                cycles = run_test(directory / script_file_path.name)
+            except RuntimeError as error:
+                raise RuntimeError(f"{script_file_path.name} ({mode}): {error}")
+            results[mode] = (rom_words(asm), cycles)
+    return results
+
+
+def _change(value: int, baseline: int) -> str:
+    return f"{value:>7} ({100 * (value - baseline) / baseline:+4.0f}%)"
+
+
+def _row(name: str, cells: Iterable[str], width: int) -> str:
+    return f"{name:<18}" + "".join(f"{cell:>{width}}" for cell in cells)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="比较 VM 翻译选项的 ROM 字数和周期数")
+    arg_parser.add_argument(
+        "programs", type=pathlib.Path, nargs="*", help="包含 .vm 文件的文件夹"
+    )
+    arg_parser.add_argument("--os", type=pathlib.Path, help="补齐缺少的类的 OS 文件夹")
+    arg_parser.add_argument(
+        "--run", action="store_true", help="同时统计程序执行到 Sys.halt 的周期数"
+    )
+    arg_parser.add_argument(
+        "--max-cycles", type=int, default=50_000_000, help="--run 最多执行的周期数"
+    )
+    arg_parser.add_argument(
+        "--tests", type=pathlib.Path, nargs="+", default=[], help="搜索 .tst 脚本的文件夹"
+    )
+    arg_parser.add_argument(
+        "--modes", nargs="+", default=list(MODES), help="比较的模式，可用 + 组合"
+    )
+    args = arg_parser.parse_args()
+    modes = args.modes
+    width = max(17, *(len(mode) + 2 for mode in modes))
+
+    if args.programs:
+        print("ROM words")
+        print(_row("program", modes, width))
+        for directory in args.programs:
+            words = measure(load_program(directory, args.os), modes)
+            cells = [_change(words[mode], words[modes[0]]) for mode in modes]
+            print(_row(directory.name, cells, width))
+        print()
+
+    if args.programs and args.run:
+        print("cycles until Sys.halt")
+        print(_row("program", modes, width))
+        for directory in args.programs:
+            modules = load_program(directory, args.os)
+            cycles = {}
+            for mode in modes:
+                try:
+                    asm = translate(modules, bootstrap=True, **mode_options(mode))
+                    cycles[mode] = run_program(asm, args.max_cycles)
+                except RuntimeError:  # 删除不可达代码后仍超出 ROM
+                    cycles[mode] = None
+            base = cycles[modes[0]]
+            cells = [
+                "-" if cycles[mode] is None
+                else _change(cycles[mode], base) if base is not None
+                else str(cycles[mode])
+                for mode in modes
+            ]
+            print(_row(directory.name, cells, width))
+        print()
+
+    scripts = sorted(
+        path
+        for root in args.tests
+        for path in root.rglob("*.tst")
+        if not path.stem.endswith("VME")
+    )
+    if scripts:
+        totals = dict.fromkeys(modes, (0, 0))
+        print("ROM words / cycles until halt")
+        width = max(34, width)
+        print(_row("test", modes, width))
+        for script_file_path in scripts:
+            results = measure_test(script_file_path, modes)
+            base_words, base_cycles = results[modes[0]]
+            cells = []
+            for mode in modes:
+                words, cycles = results[mode]
+                cycles = cycles or 0
+                totals[mode] = (totals[mode][0] + words, totals[mode][1] + cycles)
+                cells.append(
+                    f"{_change(words, base_words)} {_change(cycles, base_cycles or 1)}"
+                )
+            print(_row(script_file_path.stem, cells, width))
+        base_words, base_cycles = totals[modes[0]]
+        cells = [
+            f"{_change(words, base_words)} {_change(cycles, base_cycles)}"
+            for words, cycles in totals.values()
+        ]
+        print(_row("total", cells, width))
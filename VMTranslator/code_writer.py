@@ -1,41 +1,91 @@
 """将 VM 命令翻译成 Hack 汇编代码"""
 
-from typing import List
+from typing import List, Tuple
+
+from vm_ir import (
+    JUMP_MNEMONICS,
+    LAST_ARITHMETIC,
+    SEGMENT_OPS,
+    Op,
+    Segment,
+    VMModule,
+)
 
 ARITHMETIC_LOGIC_MAPPING = {
-    "add": "M=D+M",
-    "sub": "M=M-D",
-    "neg": "M=-M",
-    "eq": "D;JNE",
-    "gt": "D;JLE",
-    "lt": "D;JGE",
-    "and": "M=D&M",
-    "or": "M=D|M",
-    "not": "M=!M",
+    Op.ADD: "M=D+M",
+    Op.SUB: "M=M-D",
+    Op.NEG: "M=-M",
+    Op.EQ: "D;JNE",
+    Op.GT: "D;JLE",
+    Op.LT: "D;JGE",
+    Op.AND: "M=D&M",
+    Op.OR: "M=D|M",
+    Op.NOT: "M=!M",
 }
 MEMORY_SEGMENT_MAPPING = {
-    "local": "LCL",
-    "argument": "ARG",
-    "this": "THIS",
-    "that": "THAT",
-    "temp": "5",
-    "pointer": "3",
-    "static": "R16",
+    Segment.LOCAL: "LCL",
+    Segment.ARGUMENT: "ARG",
+    Segment.THIS: "THIS",
+    Segment.THAT: "THAT",
+    Segment.TEMP: "5",
+    Segment.POINTER: "3",
+    Segment.STATIC: "R16",
+}
+# D = D op M，op 为 add/sub/and/or，用于超级指令
+BINARY_COMPUTATIONS = {
+    Op.ADD: "D=D+M",
+    Op.SUB: "D=D-M",
+    Op.AND: "D=D&M",
+    Op.OR: "D=D|M",
 }
+# 共享调用模式下的全局子程序
+CALL_ROUTINE = "$CALL"
+RETURN_ROUTINE = "$RETURN"
+# 共享比较模式下 eq/gt/lt 的全局子程序
+COMPARE_ROUTINES = {Op.EQ: "$EQ", Op.GT: "$GT", Op.LT: "$LT"}
+HALT_LABEL = "$END"
 
 
 class CodeWriter:
     """删除了直接写入文件，而是返回一个列表"""
 
-    def __init__(self, file_name: str = '') -> None:
-        """需要给定目标文件名，用于生成静态变量名"""
+    def __init__(
+        self,
+        file_name: str = '',
+        shared_calls: bool = False,
+        shared_compares: bool = False,
+    ) -> None:
+        """需要给定目标文件名，用于生成静态变量名
+
+        shared_calls 为 True 时，call 和 return 跳转到全局的 $CALL、$RETURN 子程序，
+        不再在每个调用处和每个函数中展开调用约定；
+        shared_compares 为 True 时，eq/gt/lt 跳转到全局的 $EQ、$GT、$LT 子程序，
+        返回地址放在 R15。子程序由 write_routines() 生成。
+
+        两个选项都是用周期换 ROM。shared_compares 在 Pong 上省下约 2% 的 ROM，
+        在 projects/7、8 的测试上几乎不省 ROM，周期数增加约 4%，只应在程序超出 ROM 时打开。
+        """
         self.label_index = 0
         self.return_index = 0
         self.file_name = file_name.split(".")[0]
+        # 当前所在的函数，label/goto/if-goto 的标签以函数名为作用域
+        self.function_name = ""
+        self.shared_calls = shared_calls
+        self.shared_compares = shared_compares
+        # 已经用到的全局子程序
+        self.routines: List[str] = []
+
+    def use_routine(self, name: str) -> None:
+        """登记用到的全局子程序，由 write_routines() 生成"""
+        if name not in self.routines:
+            self.routines.append(name)
 
     @staticmethod
-    def write_init() -> List[str]:
-        """初始化"""
+    def write_init(shared_calls: bool = False) -> List[str]:
+        """初始化
+
+        shared_calls 为 True 时经 $CALL 调用 Sys.init，调用者需要用 use_routine 登记 $CALL。
+        """
         init_command = []
         # 初始寄存器赋值
         initial_register_map = {
@@ -52,6 +102,9 @@ class CodeWriter:
                 f"@{register}",
                 "M=D",
             ]
+        if shared_calls:
+            call_site = CodeWriter._write_call_site("Sys.init", 0, "bootstrap")
+            return init_command + call_site
 
         # 将寄存器中的值设置到全局堆栈中
         push_D = [
@@ -76,16 +129,78 @@ class CodeWriter:
 
     def set_file_name(self, file_name: str) -> None:
         self.file_name = file_name.split(".")[0]
+        self.function_name = ""
+
+    def write_module(self, module: VMModule) -> List[str]:
+        """翻译一个 VM 模块中的全部命令"""
+        self.set_file_name(module.name)
+        symbols = module.symbols
+        code = []
+        commands = iter(module)
+        for op, arg, value in commands:
+            if op <= LAST_ARITHMETIC:
+                code += self.write_arithmetic(Op(op))
+            elif op == Op.PUSH:
+                code += self.write_push(Segment(arg), value)
+            elif op == Op.POP:
+                code += self.write_pop(Segment(arg), value)
+            elif op == Op.LABEL:
+                code += self.write_label(symbols[arg])
+            elif op == Op.GOTO:
+                code += self.write_goto(symbols[arg])
+            elif op == Op.IF_GOTO:
+                code += self.write_if(symbols[arg])
+            elif op == Op.FUNCTION:
+                code += self.write_function(symbols[arg], value)
+            elif op == Op.CALL:
+                code += self.write_call(symbols[arg], value)
+            elif op == Op.RETURN:
+                code += self.write_return()
+            elif op == Op.IF_COMPARE:
+                code += self.write_if_compare(symbols[arg], JUMP_MNEMONICS[value])
+            elif op == Op.SUPERINSTRUCTION:
+                # 之后的 value 条命令由超级指令一起翻译
+                parts = []
+                for _ in range(value):
+                    part_op, part_arg, part_value = next(commands)
+                    part_op = Op(part_op)
+                    if part_op in SEGMENT_OPS:
+                        part_arg = Segment(part_arg)
+                    elif part_op == Op.IF_COMPARE:
+                        part_arg = symbols[part_arg]
+                        part_value = JUMP_MNEMONICS[part_value]
+                    parts.append((part_op, part_arg, part_value))
+                code += self.write_superinstruction(symbols[arg], parts)
+            else:
+                raise ValueError(f"Invalid opcode: {op}")
+        return code
 
-    def write_arithmetic(self, command: str) -> List[str]:
+    def write_arithmetic(self, command: Op | str) -> List[str]:
+        command = Op.of(command)
+        if command > LAST_ARITHMETIC:
+            raise ValueError(f"Invalid command: {command.keyword}")
         sepcific_command_lines = ARITHMETIC_LOGIC_MAPPING[command]
-        command_comment = f"// {command}"
-        if command in ["not", "neg"]:
+        command_comment = f"// {command.keyword}"
+        if command in [Op.NOT, Op.NEG]:
             generic_command_lines = ["@SP", "A=M-1"]
             return [command_comment] + generic_command_lines + [sepcific_command_lines]
-        elif command in ["eq", "gt", "lt"]:
+        elif command in [Op.EQ, Op.GT, Op.LT] and self.shared_compares:
+            # 返回地址经 D 传给子程序，由子程序弹出操作数并写回结果
+            label = f"{command.keyword}_{self.label_index}"
+            self.label_index += 1
+            routine = COMPARE_ROUTINES[command]
+            self.use_routine(routine)
+            return [
+                command_comment,
+                f"@{label}",
+                "D=A",
+                f"@{routine}",
+                "0;JMP",
+                f"({label})",
+            ]
+        elif command in [Op.EQ, Op.GT, Op.LT]:
             generic_command_lines = ["@SP", "AM=M-1", "D=M", "A=A-1", "D=M-D", "M=0"]
-            label = f"{command}_{self.label_index}"
+            label = f"{command.keyword}_{self.label_index}"
             self.label_index += 1
             return (
                 [command_comment]
@@ -99,21 +214,20 @@ class CodeWriter:
                     f"({label})",
                 ]
             )
-        elif command in ["add", "sub", "and", "or"]:
+        else:
             generic_command_lines = ["@SP", "AM=M-1", "D=M", "A=A-1"]
             return [command_comment] + generic_command_lines + [sepcific_command_lines]
-        else:
-            raise ValueError(f"Invalid command: {command}")
 
-    def write_push(self, segment: str, index: int | str) -> List[str]:
+    def write_push(self, segment: Segment | str, index: int | str) -> List[str]:
         """将 segment[index] 的值压入栈顶"""
-        command_comment = f"// push {segment} {index}"
-        if segment == "constant":
+        segment = Segment.of(segment)
+        command_comment = f"// push {segment.keyword} {index}"
+        if segment == Segment.CONSTANT:
             command = [
                 f"@{index}",
                 "D=A",
             ]
-        elif segment in ["local", "argument", "this", "that"]:
+        elif segment in [Segment.LOCAL, Segment.ARGUMENT, Segment.THIS, Segment.THAT]:
             command = [
                 f"@{index}",
                 "D=A",
@@ -121,7 +235,7 @@ class CodeWriter:
                 "A=D+M",
                 "D=M",
             ]
-        elif segment in ["pointer", "temp"]:
+        elif segment in [Segment.POINTER, Segment.TEMP]:
             command = [
                 f"@{index}",
                 "D=A",
@@ -129,13 +243,13 @@ class CodeWriter:
                 "A=D+A",
                 "D=M",
             ]
-        elif segment == "static":
+        elif segment == Segment.STATIC:
             command = [
                 f"@{self.file_name.split('.')[0]}.{index}",
                 "D=M",
             ]
         else:
-            raise ValueError(f"Invalid segment: {segment}")
+            raise ValueError(f"Invalid segment: {segment.keyword}")
         # 将 D 值压入栈顶，并调整栈顶指针
         command += [
             "@SP",
@@ -146,10 +260,11 @@ class CodeWriter:
         ]
         return [command_comment] + command
 
-    def write_pop(self, segment: str, index: int) -> List[str]:
+    def write_pop(self, segment: Segment | str, index: int) -> List[str]:
         """将栈顶的值弹出到 segment[index]"""
-        command_comment = f"// pop {segment} {index}"
-        if segment in ["local", "argument", "this", "that"]:
+        segment = Segment.of(segment)
+        command_comment = f"// pop {segment.keyword} {index}"
+        if segment in [Segment.LOCAL, Segment.ARGUMENT, Segment.THIS, Segment.THAT]:
             # 取出segment[index]地址放到 R13
             command = [
                 f"@{index}",
@@ -159,7 +274,7 @@ class CodeWriter:
                 "@R13",
                 "M=D",
             ]
-        elif segment in ["pointer", "temp"]:
+        elif segment in [Segment.POINTER, Segment.TEMP]:
             # 取出segment[index]地址放到 R13
             command = [
                 f"@{index}",
@@ -169,7 +284,7 @@ class CodeWriter:
                 "@R13",
                 "M=D",
             ]
-        elif segment == "static":
+        elif segment == Segment.STATIC:
             # 将栈顶元素弹出然后赋值给静态变量名，不用要再弹出
             command = [
                 f"@{self.file_name.split('.')[0]}.{index}",
@@ -178,7 +293,7 @@ class CodeWriter:
                 "M=D",
             ]
         else:
-            raise ValueError(f"Invalid segment: {segment}")
+            raise ValueError(f"Invalid segment: {segment.keyword}")
         # 弹出栈顶的值放到 segment[index]
         command += [
             "@SP",
@@ -190,35 +305,247 @@ class CodeWriter:
         ]
         return [command_comment] + command
 
+    def _scoped(self, label: str) -> str:
+        """标签的全局名称：函数名$label，不在函数中时为文件名$label"""
+        return f"{self.function_name or self.file_name}${label}"
+
     def write_label(self, label: str) -> List[str]:
         """生成 label"""
-        return [f"// {self.file_name}${label}", f"({self.file_name}${label})"]
+        label = self._scoped(label)
+        return [f"// {label}", f"({label})"]
 
     def write_goto(self, label: str) -> List[str]:
         """跳转到 label"""
+        label = self._scoped(label)
         return [
-            f"// goto {self.file_name}${label}",
-            f"@{self.file_name}${label}",
+            f"// goto {label}",
+            f"@{label}",
             "0;JMP",
         ]
 
     def write_if(self, label: str) -> List[str]:
         """如果栈顶的值为f非零，跳转到 label"""
+        label = self._scoped(label)
         return [
-            f"// if-goto {self.file_name}${label}",
+            f"// if-goto {label}",
             "@SP",
             "AM=M-1",
             "D=M",
-            f"@{self.file_name}${label}",
+            f"@{label}",
             "D;JNE",
         ]
 
+    def write_if_compare(self, label: str, jump: str) -> List[str]:
+        """弹出 y 和 x，x - y 满足 jump（如 JLT）时跳转到 label（见 vm_optimizer.py）"""
+        label = self._scoped(label)
+        return [
+            f"// if-compare {label} {jump}",
+            "@SP",
+            "AM=M-1",
+            "D=M",  # D = y
+            "@SP",
+            "AM=M-1",
+            "D=M-D",  # D = x - y
+            f"@{label}",
+            f"D;{jump}",
+        ]
+
+    def write_superinstruction(
+        self, name: str, commands: List[Tuple[Op, Segment | str, int | str]]
+    ) -> List[str]:
+        """把一组命令翻译为一段汇编（见 vm_optimizer.py 的 SUPERINSTRUCTIONS）
+
+        commands 中每条命令为 (操作码, 内存段或标签, 下标或跳转助记符)。
+        """
+        if name not in SUPERINSTRUCTION_WRITERS:
+            raise ValueError(f"Invalid superinstruction: {name}")
+        comment = "; ".join(
+            " ".join(str(getattr(word, "keyword", word)) for word in command)
+            if command[0] in SEGMENT_OPS or command[0] == Op.IF_COMPARE
+            else command[0].keyword
+            for command in commands
+        )
+        return [f"// {name}: {comment}"] + SUPERINSTRUCTION_WRITERS[name](
+            self, *commands
+        )
+
+    def _address(self, segment: Segment, index: int) -> List[str] | None:
+        """A = segment[index] 的地址，不改变 D；需要用到 D 时返回 None"""
+        if segment == Segment.STATIC:
+            return [f"@{self.file_name}.{index}"]
+        if segment == Segment.TEMP:
+            return [f"@{5 + index}"]
+        if segment == Segment.POINTER:
+            return [f"@{3 + index}"]
+        if segment == Segment.CONSTANT or index > 3:
+            return None
+        register = f"@{MEMORY_SEGMENT_MAPPING[segment]}"
+        if index == 0:
+            return [register, "A=M"]
+        return [register, "A=M+1"] + ["A=A+1"] * (index - 1)
+
+    def _load(self, segment: Segment, index: int) -> List[str]:
+        """D = segment[index]"""
+        if segment == Segment.CONSTANT:
+            return [f"@{index}", "D=A"]
+        address = self._address(segment, index)
+        if address is not None:
+            return address + ["D=M"]
+        register = MEMORY_SEGMENT_MAPPING[segment]
+        return [f"@{index}", "D=A", f"@{register}", "A=D+M", "D=M"]
+
+    def _operate(self, op: Op, segment: Segment, index: int) -> List[str]:
+        """D = D op segment[index]，op 为 add/sub/and/or"""
+        if segment == Segment.CONSTANT:
+            return [f"@{index}", BINARY_COMPUTATIONS[op].replace("M", "A")]
+        address = self._address(segment, index)
+        if address is not None:
+            return address + [BINARY_COMPUTATIONS[op]]
+        # 先把 D 存到 R14，取出 segment[index] 后再计算
+        reversed_computation = "D=M-D" if op == Op.SUB else BINARY_COMPUTATIONS[op]
+        return (
+            ["@R14", "M=D"]
+            + self._load(segment, index)
+            + ["@R14", reversed_computation]
+        )
+
+    def _store(self, segment: Segment, index: int) -> Tuple[List[str], List[str]]:
+        """segment[index] = D，返回 (计算 D 之前执行的代码, 写入 D 的代码)
+
+        地址需要用到 D 时，先把地址算好存到 R13。
+        """
+        address = self._address(segment, index)
+        if address is not None:
+            return [], address + ["M=D"]
+        register = MEMORY_SEGMENT_MAPPING[segment]
+        return (
+            [f"@{index}", "D=A", f"@{register}", "D=D+M", "@R13", "M=D"],
+            ["@R13", "A=M", "M=D"],
+        )
+
+    def _write_binary_pop(self, x, y, binary, z) -> List[str]:
+        """push x; push y; add/sub/and/or; pop z"""
+        (_, x_segment, x_index), (_, y_segment, y_index) = x, y
+        op, (_, z_segment, z_index) = binary[0], z
+        address = self._address(z_segment, z_index)
+        if (x_segment, x_index) == (z_segment, z_index) and address is not None:
+            # 原地修改，如 i = i + 1
+            increments = {Op.ADD: "M=M+1", Op.SUB: "M=M-1"}
+            if (y_segment, y_index) == (Segment.CONSTANT, 1) and op in increments:
+                return address + [increments[op]]
+            computation = ARITHMETIC_LOGIC_MAPPING[op]
+            return self._load(y_segment, y_index) + address + [computation]
+        before, after = self._store(z_segment, z_index)
+        return (
+            before
+            + self._load(x_segment, x_index)
+            + self._operate(op, y_segment, y_index)
+            + after
+        )
+
+    def _write_push_binary(self, x, y, binary) -> List[str]:
+        """push x; push y; add/sub/and/or"""
+        (_, x_segment, x_index), (_, y_segment, y_index) = x, y
+        return (
+            self._load(x_segment, x_index)
+            + self._operate(binary[0], y_segment, y_index)
+            + _push_d()
+        )
+
+    def _write_binary_top(self, y, binary) -> List[str]:
+        """push y; add/sub/and/or：直接与栈顶计算"""
+        _, y_segment, y_index = y
+        return (
+            self._load(y_segment, y_index)
+            + ["@SP", "A=M-1", ARITHMETIC_LOGIC_MAPPING[binary[0]]]
+        )
+
+    def _write_move(self, x, z) -> List[str]:
+        """push x; pop z"""
+        (_, x_segment, x_index), (_, z_segment, z_index) = x, z
+        before, after = self._store(z_segment, z_index)
+        return before + self._load(x_segment, x_index) + after
+
+    def _write_compare_branch(self, x, y, compare) -> List[str]:
+        """push x; push y; if-compare L：x - y 满足条件时跳转"""
+        (_, x_segment, x_index), (_, y_segment, y_index) = x, y
+        _, label, jump = compare
+        return (
+            self._load(x_segment, x_index)
+            + self._operate(Op.SUB, y_segment, y_index)
+            + [f"@{self._scoped(label)}", f"D;{jump}"]
+        )
+
+    def _write_compare_top(self, y, compare) -> List[str]:
+        """push y; if-compare L：弹出栈顶的 x，x - y 满足条件时跳转"""
+        _, y_segment, y_index = y
+        _, label, jump = compare
+        return self._load(y_segment, y_index) + [
+            "@SP",
+            "AM=M-1",
+            "D=M-D",
+            f"@{self._scoped(label)}",
+            f"D;{jump}",
+        ]
+
+    def _write_array_read(self, x, y, *_) -> List[str]:
+        """push x; push y; add; pop pointer 1; push that 0"""
+        (_, x_segment, x_index), (_, y_segment, y_index) = x, y
+        return (
+            self._load(x_segment, x_index)
+            + self._operate(Op.ADD, y_segment, y_index)
+            + ["@THAT", "M=D", "A=D", "D=M"]
+            + _push_d()
+        )
+
+    def _write_element_read(self, *_) -> List[str]:
+        """add; pop pointer 1; push that 0：栈顶的两个值相加作为地址，替换为该地址的值"""
+        return [
+            "@SP",
+            "AM=M-1",
+            "D=M",
+            "A=A-1",
+            "D=D+M",
+            "@THAT",
+            "M=D",
+            "A=D",
+            "D=M",
+            "@SP",
+            "A=M-1",
+            "M=D",
+        ]
+
+    def _write_array_write(self, x, *_) -> List[str]:
+        """push x; pop temp 0; pop pointer 1; push temp 0; pop that 0"""
+        _, x_segment, x_index = x
+        return self._load(x_segment, x_index) + ["@5", "M=D"] + self._write_that_write()
+
+    def _write_element_write(self, *_) -> List[str]:
+        """pop temp 0; pop pointer 1; push temp 0; pop that 0"""
+        return ["@SP", "AM=M-1", "D=M", "@5", "M=D"] + self._write_that_write()
+
+    def _write_that_write(self, *_) -> List[str]:
+        """pop pointer 1; push temp 0; pop that 0：弹出地址，写入 temp 0 的值"""
+        return [
+            "@SP",
+            "AM=M-1",
+            "D=M",
+            "@THAT",
+            "M=D",  # pointer 1 = 地址
+            "@5",
+            "D=M",
+            "@THAT",
+            "A=M",
+            "M=D",
+        ]
+
     def write_function(self, function_name: str, num_locals: int) -> List[str]:
         """函数命令
 
         形式为 function {funcition_name} {num_locals}，表示函数名为 {function_name}，
         函数的局部变量数量为 {num_locals}
         """
+        self.function_name = function_name
         command = [f"// function {function_name} {num_locals}", f"({function_name})"]
         for _ in range(num_locals):
             command += ["@SP", "A=M", "M=0", "@SP", "M=M+1"]
@@ -227,9 +554,12 @@ class CodeWriter:
     def write_call(self, function_name: str, num_args: int) -> List[str]:
         """在调用函数之前，需要先将函数的返回地址和参数压入栈中"""
         comment = f"// call {function_name} {num_args}"
-        push_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
         label = f"End${function_name}${self.return_index}"
         self.return_index += 1
+        if self.shared_calls:
+            self.use_routine(CALL_ROUTINE)
+            return [comment] + self._write_call_site(function_name, num_args, label)
+        push_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
         command = ["@" + label, "D=A"] + push_D
         for symbol in ["LCL", "ARG", "THIS", "THAT"]:
             command += [
@@ -270,6 +600,9 @@ class CodeWriter:
         8. LCL = *(FRAM - 4)
         9. goto RET
         """
+        if self.shared_calls:
+            self.use_routine(RETURN_ROUTINE)
+            return ["// return", f"@{RETURN_ROUTINE}", "0;JMP"]
         command = [
             "// return",
             "@LCL",
@@ -313,3 +646,125 @@ class CodeWriter:
             "0;JMP",
         ]
         return command
+
+    @staticmethod
+    def _write_call_site(function_name: str, num_args: int, label: str) -> List[str]:
+        """共享调用模式的调用处：R13 = 目标函数，R14 = 参数个数，D = 返回地址"""
+        if num_args in (0, 1):
+            set_num_args = ["@R14", f"M={num_args}"]
+        else:
+            set_num_args = [f"@{num_args}", "D=A", "@R14", "M=D"]
+        return (
+            [f"@{function_name}", "D=A", "@R13", "M=D"]
+            + set_num_args
+            + [f"@{label}", "D=A", f"@{CALL_ROUTINE}", "0;JMP", f"({label})"]
+        )
+
+    def write_routines(self) -> List[str]:
+        """生成已经用到的全局子程序，放在所有函数之后"""
+        command = []
+        for name in self.routines:
+            command += [f"// {name}", f"({name})"] + ROUTINES[name]
+        return command
+
+
+def _push_d() -> List[str]:
+    """把 D 压入栈顶"""
+    return ["@SP", "AM=M+1", "A=A-1", "M=D"]
+
+
+# $CALL：压入返回地址（D）和调用者的 LCL、ARG、THIS、THAT，
+# ARG = SP - R14 - 5，LCL = SP，然后跳转到 R13
+CALL_ROUTINE_CODE = _push_d()
+for _register in ["LCL", "ARG", "THIS", "THAT"]:
+    CALL_ROUTINE_CODE += [f"@{_register}", "D=M"] + _push_d()
+CALL_ROUTINE_CODE += [
+    "@R14",
+    "D=M",
+    "@5",
+    "D=D+A",
+    "@SP",
+    "D=M-D",
+    "@ARG",
+    "M=D",  # ARG = SP - n - 5
+    "@SP",
+    "D=M",
+    "@LCL",
+    "M=D",  # LCL = SP
+    "@R13",
+    "A=M",
+    "0;JMP",  # goto f
+]
+
+# $RETURN：与 write_return 相同的步骤，R13 = FRAME 逐个递减读取保存的寄存器
+RETURN_ROUTINE_CODE = [
+    "@LCL",
+    "D=M",
+    "@R13",
+    "M=D",  # FRAME = LCL
+    "@5",
+    "A=D-A",
+    "D=M",
+    "@R14",
+    "M=D",  # RET = *(FRAME - 5)
+    "@SP",
+    "AM=M-1",
+    "D=M",
+    "@ARG",
+    "A=M",
+    "M=D",  # *ARG = pop()
+    "@ARG",
+    "D=M+1",
+    "@SP",
+    "M=D",  # SP = ARG+1
+]
+for _register in ["THAT", "THIS", "ARG", "LCL"]:
+    RETURN_ROUTINE_CODE += ["@R13", "AM=M-1", "D=M", f"@{_register}", "M=D"]
+RETURN_ROUTINE_CODE += ["@R14", "A=M", "0;JMP"]  # goto RET
+
+
+def _compare_routine(name: str, jump: str) -> List[str]:
+    """$EQ/$GT/$LT：R15 = 返回地址（D），弹出 y，栈顶的 x 替换为 x ? y 的结果"""
+    return [
+        "@R15",
+        "M=D",
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "A=A-1",
+        "D=M-D",
+        "M=-1",  # 先写入真
+        f"@{name}$RET",
+        f"D;{jump}",
+        "@SP",
+        "A=M-1",
+        "M=0",
+        f"({name}$RET)",
+        "@R15",
+        "A=M",
+        "0;JMP",
+    ]
+
+
+ROUTINES = {
+    CALL_ROUTINE: CALL_ROUTINE_CODE,
+    RETURN_ROUTINE: RETURN_ROUTINE_CODE,
+    COMPARE_ROUTINES[Op.EQ]: _compare_routine(COMPARE_ROUTINES[Op.EQ], "JEQ"),
+    COMPARE_ROUTINES[Op.GT]: _compare_routine(COMPARE_ROUTINES[Op.GT], "JGT"),
+    COMPARE_ROUTINES[Op.LT]: _compare_routine(COMPARE_ROUTINES[Op.LT], "JLT"),
+}
+
+# 超级指令名 -> 翻译方法，参数为模式中的各条命令
+SUPERINSTRUCTION_WRITERS = {
+    "array-read": CodeWriter._write_array_read,
+    "array-write": CodeWriter._write_array_write,
+    "element-write": CodeWriter._write_element_write,
+    "binary-pop": CodeWriter._write_binary_pop,
+    "element-read": CodeWriter._write_element_read,
+    "that-write": CodeWriter._write_that_write,
+    "compare-branch": CodeWriter._write_compare_branch,
+    "push-binary": CodeWriter._write_push_binary,
+    "compare-top": CodeWriter._write_compare_top,
+    "binary-top": CodeWriter._write_binary_top,
+    "move": CodeWriter._write_move,
+}
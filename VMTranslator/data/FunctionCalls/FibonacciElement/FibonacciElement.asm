@@ -100,17 +100,17 @@ D;JGE
 A=M-1
 M=-1
 (lt_0)
-// if-goto Main$N_LT_2
+// if-goto Main.fibonacci$N_LT_2
 @SP
 AM=M-1
 D=M
-@Main$N_LT_2
+@Main.fibonacci$N_LT_2
 D;JNE
-// goto Main$N_GE_2
-@Main$N_GE_2
+// goto Main.fibonacci$N_GE_2
+@Main.fibonacci$N_GE_2
 0;JMP
-// Main$N_LT_2
-(Main$N_LT_2)
+// Main.fibonacci$N_LT_2
+(Main.fibonacci$N_LT_2)
 // push argument 0
 @0
 D=A
@@ -173,8 +173,8 @@ M=D
 @R14
 A=M
 0;JMP
-// Main$N_GE_2
-(Main$N_GE_2)
+// Main.fibonacci$N_GE_2
+(Main.fibonacci$N_GE_2)
 // push argument 0
 @0
 D=A
@@ -439,8 +439,8 @@ M=D
 @Main.fibonacci
 0;JMP
 (End$Main.fibonacci$2)
-// Sys$END
-(Sys$END)
-// goto Sys$END
-@Sys$END
+// Sys.init$END
+(Sys.init$END)
+// goto Sys.init$END
+@Sys.init$END
 0;JMP
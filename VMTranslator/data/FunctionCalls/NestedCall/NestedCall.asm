@@ -172,10 +172,10 @@ D=M
 @R13
 A=M
 M=D
-// Sys$LOOP
-(Sys$LOOP)
-// goto Sys$LOOP
-@Sys$LOOP
+// Sys.init$LOOP
+(Sys.init$LOOP)
+// goto Sys.init$LOOP
+@Sys.init$LOOP
 0;JMP
 // function Sys.main 5
 (Sys.main)
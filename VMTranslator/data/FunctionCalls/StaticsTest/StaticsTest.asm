@@ -66,6 +66,186 @@ M=D
 @Sys.init
 0;JMP
 (bootstrap)
+// function Class1.set 0
+(Class1.set)
+// push argument 0
+@0
+D=A
+@ARG
+A=D+M
+D=M
+@SP
+A=M
+M=D
+@SP
+M=M+1
+// pop static 0
+@Class1.0
+D=A
+@R13
+M=D
+@SP
+AM=M-1
+D=M
+@R13
+A=M
+M=D
+// push argument 1
+@1
+D=A
+@ARG
+A=D+M
+D=M
+@SP
+A=M
+M=D
+@SP
+M=M+1
+// pop static 1
+@Class1.1
+D=A
+@R13
+M=D
+@SP
+AM=M-1
+D=M
+@R13
+A=M
+M=D
+// push constant 0
+@0
+D=A
+@SP
+A=M
+M=D
+@SP
+M=M+1
+// return
+@LCL
+D=M
+@R13
+M=D
+@5
+D=A
+@R13
+A=M-D
+D=M
+@R14
+M=D
+@SP
+AM=M-1
+D=M
+@ARG
+A=M
+M=D
+@ARG
+D=M+1
+@SP
+M=D
+@R13
+A=M-1
+D=M
+@THAT
+M=D
+@2
+D=A
+@R13
+A=M-D
+D=M
+@THIS
+M=D
+@3
+D=A
+@R13
+A=M-D
+D=M
+@ARG
+M=D
+@4
+D=A
+@R13
+A=M-D
+D=M
+@LCL
+M=D
+@R14
+A=M
+0;JMP
+// function Class1.get 0
+(Class1.get)
+// push static 0
+@Class1.0
+D=M
+@SP
+A=M
+M=D
+@SP
+M=M+1
+// push static 1
+@Class1.1
+D=M
+@SP
+A=M
+M=D
+@SP
+M=M+1
+// sub
+@SP
+AM=M-1
+D=M
+A=A-1
+M=M-D
+// return
+@LCL
+D=M
+@R13
+M=D
+@5
+D=A
+@R13
+A=M-D
+D=M
+@R14
+M=D
+@SP
+AM=M-1
+D=M
+@ARG
+A=M
+M=D
+@ARG
+D=M+1
+@SP
+M=D
+@R13
+A=M-1
+D=M
+@THAT
+M=D
+@2
+D=A
+@R13
+A=M-D
+D=M
+@THIS
+M=D
+@3
+D=A
+@R13
+A=M-D
+D=M
+@ARG
+M=D
+@4
+D=A
+@R13
+A=M-D
+D=M
+@LCL
+M=D
+@R14
+A=M
+0;JMP
 // function Class2.set 0
 (Class2.set)
 // push argument 0
@@ -502,188 +682,8 @@ M=D
 @Class2.get
 0;JMP
 (End$Class2.get$3)
-// Sys$END
-(Sys$END)
-// goto Sys$END
-@Sys$END
-0;JMP
-// function Class1.set 0
-(Class1.set)
-// push argument 0
-@0
-D=A
-@ARG
-A=D+M
-D=M
-@SP
-A=M
-M=D
-@SP
-M=M+1
-// pop static 0
-@Class1.0
-D=A
-@R13
-M=D
-@SP
-AM=M-1
-D=M
-@R13
-A=M
-M=D
-// push argument 1
-@1
-D=A
-@ARG
-A=D+M
-D=M
-@SP
-A=M
-M=D
-@SP
-M=M+1
-// pop static 1
-@Class1.1
-D=A
-@R13
-M=D
-@SP
-AM=M-1
-D=M
-@R13
-A=M
-M=D
-// push constant 0
-@0
-D=A
-@SP
-A=M
-M=D
-@SP
-M=M+1
-// return
-@LCL
-D=M
-@R13
-M=D
-@5
-D=A
-@R13
-A=M-D
-D=M
-@R14
-M=D
-@SP
-AM=M-1
-D=M
-@ARG
-A=M
-M=D
-@ARG
-D=M+1
-@SP
-M=D
-@R13
-A=M-1
-D=M
-@THAT
-M=D
-@2
-D=A
-@R13
-A=M-D
-D=M
-@THIS
-M=D
-@3
-D=A
-@R13
-A=M-D
-D=M
-@ARG
-M=D
-@4
-D=A
-@R13
-A=M-D
-D=M
-@LCL
-M=D
-@R14
-A=M
-0;JMP
-// function Class1.get 0
-(Class1.get)
-// push static 0
-@Class1.0
-D=M
-@SP
-A=M
-M=D
-@SP
-M=M+1
-// push static 1
-@Class1.1
-D=M
-@SP
-A=M
-M=D
-@SP
-M=M+1
-// sub
-@SP
-AM=M-1
-D=M
-A=A-1
-M=M-D
-// return
-@LCL
-D=M
-@R13
-M=D
-@5
-D=A
-@R13
-A=M-D
-D=M
-@R14
-M=D
-@SP
-AM=M-1
-D=M
-@ARG
-A=M
-M=D
-@ARG
-D=M+1
-@SP
-M=D
-@R13
-A=M-1
-D=M
-@THAT
-M=D
-@2
-D=A
-@R13
-A=M-D
-D=M
-@THIS
-M=D
-@3
-D=A
-@R13
-A=M-D
-D=M
-@ARG
-M=D
-@4
-D=A
-@R13
-A=M-D
-D=M
-@LCL
-M=D
-@R14
-A=M
+// Sys.init$END
+(Sys.init$END)
+// goto Sys.init$END
+@Sys.init$END
 0;JMP
@@ -1,136 +1,97 @@
-from parser import Parser
 from pathlib import Path
+from typing import List
 
-from code_writer import CodeWriter
+import vm_ir
+from code_writer import CALL_ROUTINE, HALT_LABEL, CodeWriter
+from vm_ir import VMModule
+from vm_optimizer import fuse_compare_branches, fuse_superinstructions
 
 
-def main(source_file_path: Path):
+def translate(
+    modules: List[VMModule],
+    bootstrap: bool = True,
+    shared_calls: bool = False,
+    shared_compares: bool = False,
+    fuse_branches: bool = False,
+    superinstructions: bool = False,
+) -> List[str]:
+    """把若干个 VM 模块翻译为一个汇编程序，bootstrap 为 True 时在开头加入引导代码
+
+    shared_calls、shared_compares 见 CodeWriter，
+    fuse_branches、superinstructions 见 vm_optimizer.py。
+    """
+    code_writer = CodeWriter(
+        file_name="", shared_calls=shared_calls, shared_compares=shared_compares
+    )
+    dest_command = []
+    if bootstrap:
+        dest_command = CodeWriter.write_init(shared_calls)
+        if shared_calls:
+            code_writer.use_routine(CALL_ROUTINE)
+    for module in modules:
+        if fuse_branches:
+            module = fuse_compare_branches(module)
+        if superinstructions:
+            module = fuse_superinstructions(module)
+        dest_command += code_writer.write_module(module)
+    routines = code_writer.write_routines()
+    if routines and not bootstrap:
+        # 没有引导代码的程序可能执行到末尾，先停机，不能进入子程序
+        dest_command += [f"({HALT_LABEL})", f"@{HALT_LABEL}", "0;JMP"]
+    return dest_command + routines
+
+
+def main(
+    source_file_path: Path,
+    shared_calls: bool = False,
+    shared_compares: bool = False,
+    fuse_branches: bool = False,
+    superinstructions: bool = False,
+):
     """VM to Assembly Code Compiler
 
     Args:
         source_file_path (Path): 单一的 file_name.vm 文件路径，或者包含多个 .vm 文件的 directory_name 文件夹路径
+        shared_calls (bool): call/return 使用共享的全局子程序，见 CodeWriter
+        shared_compares (bool): eq/gt/lt 使用共享的全局子程序，见 CodeWriter；
+            周期数增加，只在程序超出 ROM 时使用
+        fuse_branches (bool): 比较和 if-goto 合并为条件跳转，见 vm_optimizer.py
+        superinstructions (bool): 常见的命令序列合并为超级指令，见 vm_optimizer.py
 
     Output:
         file_name.asm 文件 或 directory_name.asm 文件
 
     解析过程：
-    1. 构造一个 CodeWriter 对象
-    2. 如果输入的是 .vm 文件，则
-        - 构造一个 Parser 对象去处理输入文件
-        - 遍历输入文件，解析每一行并生成对应的编码
-    3. 如果输入的是 .vm 文件夹，则
-        - 遍历文件夹，对每个 .vm 文件进行处理
+    1. 每个 .vm 文件解析一次，得到 VMModule（见 vm_ir.py）
+    2. 如果输入的是 .vm 文件，则直接翻译这个模块
+    3. 如果输入的是 .vm 文件夹，则按文件名顺序翻译所有模块，并在开头加入引导代码
     """
-    dest_command = []
+    options = {
+        "shared_calls": shared_calls,
+        "shared_compares": shared_compares,
+        "fuse_branches": fuse_branches,
+        "superinstructions": superinstructions,
+    }
     if source_file_path.is_dir():
         """如果输入的是文件夹，则遍历文件夹，对每个 .vm 文件进行处理，这些文件会被编译成一个 .asm 文件"""
-        file_names = [
-            file_name.name
-            for file_name in source_file_path.iterdir()
-            if file_name.suffix == ".vm"
+        modules = [
+            vm_ir.load(file_path)
+            for file_path in sorted(source_file_path.iterdir())
+            if file_path.suffix == ".vm"
         ]
-        dest_command += CodeWriter.write_init()
-
-        code_writer = CodeWriter(file_name='')
-        for file_name in file_names:
-            with open(source_file_path / file_name, "r") as f:
-                command_line = f.readlines()
-            parser = Parser(command_lines=command_line)
-            code_writer.set_file_name(file_name=file_name)
-            while parser.has_more_commands():
-                command_type = parser.command_type()
-                if command_type == "C_ARITHMETIC":
-                    code_lines = code_writer.write_arithmetic(command=parser.arg1())
-                elif command_type == "C_PUSH":
-                    code_lines = code_writer.write_push(
-                        segment=parser.arg1(), index=parser.arg2()
-                    )
-                elif command_type == "C_POP":
-                    code_lines = code_writer.write_pop(
-                        segment=parser.arg1(), index=parser.arg2()
-                    )
-                elif command_type == "C_LABEL":
-                    code_lines = code_writer.write_label(label=parser.arg1())
-                elif command_type == "C_GOTO":
-                    code_lines = code_writer.write_goto(label=parser.arg1())
-                elif command_type == "C_IF":
-                    code_lines = code_writer.write_if(label=parser.arg1())
-                elif command_type == "C_FUNCTION":
-                    code_lines = code_writer.write_function(
-                        function_name=parser.arg1(), num_locals=parser.arg2()
-                    )
-                elif command_type == "C_RETURN":
-                    code_lines = code_writer.write_return()
-                elif command_type == "C_CALL":
-                    code_lines = code_writer.write_call(
-                        function_name=parser.arg1(), num_args=parser.arg2()
-                    )
-                else:
-                    raise ValueError(f"Invalid command type: {command_type}")
-                dest_command.extend(code_lines)
-                parser.advance()
-
-        destination_file_path = source_file_path / (
-            source_file_path.name + ".asm"
-        )
-
-        with open(destination_file_path, "w") as f:
-            for command in dest_command:
-                f.write(f"{command}\n")
+        dest_command = translate(modules, bootstrap=True, **options)
+        destination_file_path = source_file_path / (source_file_path.name + ".asm")
     else:
-        with open(source_file_path, "r") as f:
-            command_lines = f.readlines()
-        parser = Parser(command_lines=command_lines)
-        code_writer = CodeWriter(file_name=source_file_path.name)
-        dest_command = []
-        while parser.has_more_commands():
-            command_type = parser.command_type()
-            if command_type == "C_ARITHMETIC":
-                code_lines = code_writer.write_arithmetic(command=parser.arg1())
-                dest_command.extend(code_lines)
-            elif command_type == "C_PUSH":
-                code_lines = code_writer.write_push(
-                    segment=parser.arg1(), index=parser.arg2()
-                )
-                dest_command.extend(code_lines)
-            elif command_type == "C_POP":
-                code_lines = code_writer.write_pop(
-                    segment=parser.arg1(), index=parser.arg2()
-                )
-                dest_command.extend(code_lines)
-            elif command_type == "C_LABEL":
-                code_lines = code_writer.write_label(label=parser.arg1())
-                dest_command.extend(code_lines)
-            elif command_type == "C_GOTO":
-                code_lines = code_writer.write_goto(label=parser.arg1())
-                dest_command.extend(code_lines)
-            elif command_type == "C_IF":
-                code_lines = code_writer.write_if(label=parser.arg1())
-                dest_command.extend(code_lines)
-            elif command_type == "C_FUNCTION":
-                code_lines = code_writer.write_function(
-                    function_name=parser.arg1(), num_locals=parser.arg2()
-                )
-                dest_command.extend(code_lines)
-            elif command_type == "C_RETURN":
-                code_lines = code_writer.write_return()
-                dest_command.extend(code_lines)
-            elif command_type == "C_CALL":
-                code_lines = code_writer.write_call(
-                    function_name=parser.arg1(), num_args=parser.arg2()
-                )
-                dest_command.extend(code_lines)
-            else:
-                raise ValueError(f"Invalid command type: {command_type}")
-            parser.advance()
-
+        dest_command = translate(
+            [vm_ir.load(source_file_path)], bootstrap=False, **options
+        )
         destination_file_path = source_file_path.parent / (
             source_file_path.name.split(".")[0] + ".asm"
         )
 
-        with open(destination_file_path, "w") as f:
-            for command in dest_command:
-                f.write(f"{command}\n")
+    with open(destination_file_path, "w") as f:
+        for command in dest_command:
+            f.write(f"{command}\n")
 
 
 if __name__ == "__main__":
@@ -1,10 +1,28 @@
+import shutil
 from parser import Parser
 from pathlib import Path
 
 import pytest
 
-from code_writer import CodeWriter
-from main import main
+import vm_ir
+from benchmark import (
+    MODES,
+    load_program,
+    measure,
+    measure_test,
+    rom_words,
+    run_test,
+)
+from code_writer import (
+    CALL_ROUTINE,
+    HALT_LABEL,
+    RETURN_ROUTINE,
+    CodeWriter,
+)
+from main import main, translate
+from VMTranslator import VMTranslator
+from vm_ir import Op, Segment
+from vm_optimizer import fuse_compare_branches, fuse_superinstructions
 
 
 class TestParser:
@@ -84,6 +102,171 @@ class TestParser:
             parser2.arg2()
 
 
+class TestVMIR:
+    def test_parse(self):
+        module = vm_ir.parse(
+            [
+                "// 注释",
+                "function Main.main 2",
+                "push constant 7  // 行尾注释",
+                "pop local 1",
+                "label LOOP",
+                "if-goto LOOP",
+                "call Math.multiply 2",
+                "eq",
+                "return",
+            ],
+            name="Main",
+        )
+        assert list(module.ops) == [
+            Op.FUNCTION,
+            Op.PUSH,
+            Op.POP,
+            Op.LABEL,
+            Op.IF_GOTO,
+            Op.CALL,
+            Op.EQ,
+            Op.RETURN,
+        ]
+        assert module.args[1] == Segment.CONSTANT
+        assert module.values[1] == 7
+        assert module.symbols == ["Main.main", "LOOP", "Math.multiply"]
+        assert module.args[3] == module.args[4] == 1
+        assert list(module.lines) == [2, 3, 4, 5, 6, 7, 8, 9]
+        assert module.text(2) == "pop local 1"
+        assert module.text(4) == "if-goto LOOP"
+        assert module.text(5) == "call Math.multiply 2"
+
+    def test_parse_errors(self):
+        for line in ["push nowhere 1", "pop constant 1", "push local", "jump L1"]:
+            with pytest.raises(ValueError, match="Main.vm:1"):
+                vm_ir.parse([line], name="Main")
+
+    def test_internal_ops(self):
+        with pytest.raises(ValueError):
+            vm_ir.parse(["if-compare L 4"], name="Main")
+
+    def test_load(self):
+        module = vm_ir.load(Path("data/StackArithmetic/SimpleAdd/SimpleAdd.vm"))
+        assert module.name == "SimpleAdd"
+        assert [module.text(i) for i in range(len(module))] == [
+            "push constant 7",
+            "push constant 8",
+            "add",
+        ]
+
+
+class TestVMOptimizer:
+    def fuse(self, lines):
+        module = fuse_compare_branches(vm_ir.parse(lines, name="Main"))
+        return [module.text(i) for i in range(len(module))]
+
+    def test_fuse_compare_branches(self):
+        assert self.fuse(["lt", "if-goto A"]) == ["if-compare A JLT"]
+        assert self.fuse(["gt", "not", "if-goto A"]) == ["if-compare A JLE"]
+        assert self.fuse(["eq", "not", "if-goto A"]) == ["if-compare A JNE"]
+        assert self.fuse(["lt", "not", "not", "if-goto A"]) == ["if-compare A JLT"]
+        assert self.fuse(["push constant 1", "eq", "if-goto A", "goto B"]) == [
+            "push constant 1",
+            "if-compare A JEQ",
+            "goto B",
+        ]
+
+    def test_keep_other_sequences(self):
+        lines = ["lt", "label A", "if-goto A", "gt", "not", "pop local 0", "eq"]
+        assert self.fuse(lines) == lines
+
+    def test_derived_module(self):
+        module = vm_ir.parse(["function Main.f 0", "lt", "if-goto L"], name="Main")
+        fused = fuse_compare_branches(module)
+        assert fused.name == "Main" and fused.symbols == module.symbols
+        assert list(fused.lines) == [1, 2]
+        assert len(module) == 3
+
+    def test_fuse_superinstructions(self):
+        module = fuse_superinstructions(
+            vm_ir.parse(
+                [
+                    "push local 0",
+                    "push constant 1",
+                    "add",
+                    "pop local 0",
+                    "label L",
+                    "push argument 0",
+                    "push static 1",
+                    "add",
+                    "pop pointer 1",
+                    "push that 0",
+                    "neg",
+                    # let a[i] = x
+                    "push local 0",
+                    "push argument 1",
+                    "add",
+                    "push local 2",
+                    "pop temp 0",
+                    "pop pointer 1",
+                    "push temp 0",
+                    "pop that 0",
+                    # let a[i] = x + 1
+                    "push local 2",
+                    "push constant 1",
+                    "add",
+                    "pop temp 0",
+                    "pop pointer 1",
+                    "push temp 0",
+                    "pop that 0",
+                ],
+                name="Main",
+            )
+        )
+        assert [module.text(i) for i in range(len(module))] == [
+            "superinstruction binary-pop 4",
+            "push local 0",
+            "push constant 1",
+            "add",
+            "pop local 0",
+            "label L",
+            "superinstruction array-read 5",
+            "push argument 0",
+            "push static 1",
+            "add",
+            "pop pointer 1",
+            "push that 0",
+            "neg",
+            "superinstruction push-binary 3",
+            "push local 0",
+            "push argument 1",
+            "add",
+            "superinstruction array-write 5",
+            "push local 2",
+            "pop temp 0",
+            "pop pointer 1",
+            "push temp 0",
+            "pop that 0",
+            "superinstruction binary-pop 4",
+            "push local 2",
+            "push constant 1",
+            "add",
+            "pop temp 0",
+            "superinstruction that-write 3",
+            "pop pointer 1",
+            "push temp 0",
+            "pop that 0",
+        ]
+
+    def test_superinstructions_keep_input_module(self):
+        lines = ["push local 0", "push constant 1", "add", "pop local 0"]
+        module = vm_ir.parse(lines, name="Main")
+        fused = fuse_superinstructions(module)
+        assert fused.symbols == ["binary-pop"]
+        assert module.symbols == [] and len(module) == 4
+
+    def test_superinstructions_stop_at_labels(self):
+        lines = ["push local 0", "label L", "pop local 1", "push constant 1", "neg"]
+        module = fuse_superinstructions(vm_ir.parse(lines, name="Main"))
+        assert [module.text(i) for i in range(len(module))] == lines
+
+
 class TestCodeWriter:
     def test_arithmetic(self):
         # arithmetic_ = ["add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not"]
@@ -325,6 +508,88 @@ class TestCodeWriter:
             "D;JNE",
         ]
 
+    def test_label_in_function(self):
+        code_writer = CodeWriter(file_name="test.vm")
+        code_writer.write_function("test.f", 0)
+        assert code_writer.write_label("L1") == ["// test.f$L1", "(test.f$L1)"]
+        assert code_writer.write_goto("L1")[1] == "@test.f$L1"
+        code_writer.set_file_name("other.vm")
+        assert code_writer.write_label("L1") == ["// other$L1", "(other$L1)"]
+
+    def test_if_compare(self):
+        code_writer = CodeWriter(file_name="test.vm")
+        code_writer.write_function("test.f", 0)
+        assert code_writer.write_if_compare("L1", "JLT") == [
+            "// if-compare test.f$L1 JLT",
+            "@SP",
+            "AM=M-1",
+            "D=M",
+            "@SP",
+            "AM=M-1",
+            "D=M-D",
+            "@test.f$L1",
+            "D;JLT",
+        ]
+
+    def test_write_module(self):
+        lines = ["function test.f 0", "push static 2", "pop temp 1", "label L", "not"]
+        module = vm_ir.parse(lines, name="test")
+        code_writer = CodeWriter()
+        assert code_writer.write_module(module) == (
+            code_writer.write_function("test.f", 0)
+            + code_writer.write_push("static", 2)
+            + code_writer.write_pop("temp", 1)
+            + code_writer.write_label("L")
+            + code_writer.write_arithmetic("not")
+        )
+
+    def test_superinstruction(self):
+        code_writer = CodeWriter(file_name="test.vm")
+        push_local = (Op.PUSH, Segment.LOCAL, 0)
+        one, add = (Op.PUSH, Segment.CONSTANT, 1), (Op.ADD, 0, 0)
+        assert code_writer.write_superinstruction(
+            "binary-pop", [push_local, one, add, (Op.POP, Segment.LOCAL, 0)]
+        ) == [
+            "// binary-pop: push local 0; push constant 1; add; pop local 0",
+            "@LCL",
+            "A=M",
+            "M=M+1",
+        ]
+        # local 5 的地址需要用到 D，先存到 R13
+        push_static, sub = (Op.PUSH, Segment.STATIC, 2), (Op.SUB, 0, 0)
+        assert code_writer.write_superinstruction(
+            "binary-pop", [push_local, push_static, sub, (Op.POP, Segment.LOCAL, 5)]
+        )[1:] == [
+            "@5",
+            "D=A",
+            "@LCL",
+            "D=D+M",
+            "@R13",
+            "M=D",
+            "@LCL",
+            "A=M",
+            "D=M",
+            "@test.2",
+            "D=D-M",
+            "@R13",
+            "A=M",
+            "M=D",
+        ]
+        code_writer.write_function("test.f", 0)
+        compare = (Op.IF_COMPARE, "L1", "JLT")
+        code = code_writer.write_superinstruction("compare-top", [one, compare])
+        assert code[1:] == [
+            "@1",
+            "D=A",
+            "@SP",
+            "AM=M-1",
+            "D=M-D",
+            "@test.f$L1",
+            "D;JLT",
+        ]
+        with pytest.raises(ValueError):
+            code_writer.write_superinstruction("push-push", [one, one])
+
     def test_function(self):
         code_writer = CodeWriter(file_name="test.vm")
         assert code_writer.write_function("f", 1) == [
@@ -433,6 +698,94 @@ class TestCodeWriter:
 
         assert code_writer.write_return() == expected
 
+    def test_shared_calls(self):
+        code_writer = CodeWriter(file_name="test.vm", shared_calls=True)
+        assert code_writer.write_call("f", 1) == [
+            "// call f 1",
+            "@f",
+            "D=A",
+            "@R13",
+            "M=D",
+            "@R14",
+            "M=1",
+            "@End$f$0",
+            "D=A",
+            "@$CALL",
+            "0;JMP",
+            "(End$f$0)",
+        ]
+        assert code_writer.write_call("g", 3)[5:9] == ["@3", "D=A", "@R14", "M=D"]
+        assert code_writer.write_return() == ["// return", "@$RETURN", "0;JMP"]
+        routines = code_writer.write_routines()
+        assert routines.count(f"({CALL_ROUTINE})") == 1
+        assert routines.count(f"({RETURN_ROUTINE})") == 1
+
+    def test_shared_calls_init(self):
+        init = CodeWriter.write_init(shared_calls=True)
+        assert init[-3:] == ["@$CALL", "0;JMP", "(bootstrap)"]
+        assert CodeWriter.write_init()[-3:] == ["@Sys.init", "0;JMP", "(bootstrap)"]
+
+        # 没有 call 命令的程序也要生成 $CALL
+        module = vm_ir.parse(["function Sys.init 0", "label L", "goto L"], name="Sys")
+        assert f"({CALL_ROUTINE})" in translate([module], shared_calls=True)
+
+    def test_shared_compares(self):
+        code_writer = CodeWriter(file_name="test.vm", shared_compares=True)
+        assert code_writer.write_arithmetic("lt") == [
+            "// lt",
+            "@lt_0",
+            "D=A",
+            "@$LT",
+            "0;JMP",
+            "(lt_0)",
+        ]
+        code_writer.write_arithmetic("lt")
+        code_writer.write_arithmetic("eq")
+        assert code_writer.routines == ["$LT", "$EQ"]
+        routines = code_writer.write_routines()
+        assert "($LT)" in routines and "($EQ)" in routines and "($GT)" not in routines
+        assert routines[routines.index("($LT)") + 10] == "D;JLT"
+
+
+class TestTranslate:
+    def test_routines_after_code(self):
+        module = vm_ir.parse(["function f 0", "push constant 1", "return"], name="f")
+        code = translate([module], bootstrap=False, shared_calls=True)
+        halt = code.index(f"({HALT_LABEL})")
+        assert code.index("// return") < halt < code.index(f"({RETURN_ROUTINE})")
+        assert f"({CALL_ROUTINE})" not in code
+
+        assert HALT_LABEL not in "".join(translate([module], bootstrap=False))
+
+    def test_shared_calls_rom_words(self):
+        modules = load_program(Path("data/FunctionCalls/FibonacciElement"))
+        words = measure(modules, ["default", "shared-calls"])
+        assert words["shared-calls"] < words["default"]
+        assert words["default"] == rom_words(translate(modules))
+
+    @pytest.mark.parametrize("mode", [*MODES, "shared+fuse-branches+superinstructions"])
+    def test_mode_passes_scripts(self, mode):
+        # 用 HackAssembler 的 .tst 运行器检查结果，与 .cmp 不一致时抛出 RuntimeError
+        for script_file_path in [
+            "../projects/7/StackArithmetic/StackTest/StackTest.tst",
+            "../projects/7/MemoryAccess/BasicTest/BasicTest.tst",
+            "../projects/8/FunctionCalls/FibonacciElement/FibonacciElement.tst",
+        ]:
+            measure_test(Path(script_file_path), [mode])
+
+
+class TestVMTranslator:
+    def test_shared_compares_script(self, tmp_path):
+        directory = tmp_path / "StackTest"
+        shutil.copytree("../projects/7/StackArithmetic/StackTest", directory)
+        translator = VMTranslator(str(directory / "StackTest.vm"), shared_compares=True)
+        translator.parse()
+        translator.save_file()
+        assert sorted(translator.routines) == ["$EQ", "$GT", "$LT"]
+        assert translator.asm_codes.count("@$EQ") == 3
+        # 结果与 .cmp 不一致时抛出 RuntimeError
+        run_test(directory / "StackTest.tst")
+
 
 class TestMain:
     def test_main_file(self):
@@ -0,0 +1,199 @@
+"""
+VM 中间表示：每个 .vm 文件只解析一次，命令保存在 VMModule 的几个并行数组中。
+
+- ops：操作码（Op，小整数）
+- args：push/pop 的内存段（Segment），或 label/goto/if-goto/function/call 的符号编号
+- values：push/pop 的下标、function 的局部变量数、call 的参数个数
+- lines：命令在源文件中的行号，用于报错
+
+标签名和函数名保存在 symbols 中，同一个名字只保存一次。
+CodeWriter 和各个分析、优化过程直接读取这些数组，不再重复切分命令字符串。
+
+Op.RETURN 之后的操作码不是 VM 语言的命令，只由优化过程（见 vm_optimizer.py）生成。
+"""
+
+import pathlib
+from array import array
+from enum import IntEnum
+from typing import Iterable, Iterator, List, Tuple
+
+
+class Op(IntEnum):
+    ADD = 0
+    SUB = 1
+    NEG = 2
+    EQ = 3
+    GT = 4
+    LT = 5
+    AND = 6
+    OR = 7
+    NOT = 8
+    PUSH = 9
+    POP = 10
+    LABEL = 11
+    GOTO = 12
+    IF_GOTO = 13
+    FUNCTION = 14
+    CALL = 15
+    RETURN = 16
+    # 弹出 y 和 x，x - y 满足跳转条件时跳转到标签；values 为 Hack 跳转字段的值
+    IF_COMPARE = 17
+    # 之后的 values 条命令合并为一条超级指令，args 为超级指令名的符号编号
+    SUPERINSTRUCTION = 18
+
+    @property
+    def keyword(self) -> str:
+        """VM 语言中的命令名"""
+        return self.name.lower().replace("_", "-")
+
+    @classmethod
+    def of(cls, command: "Op | str") -> "Op":
+        """命令名或操作码 -> 操作码"""
+        if isinstance(command, cls):
+            return command
+        if command not in OPCODES:
+            raise ValueError(f"Invalid command: {command}")
+        return OPCODES[command]
+
+
+class Segment(IntEnum):
+    CONSTANT = 0
+    LOCAL = 1
+    ARGUMENT = 2
+    THIS = 3
+    THAT = 4
+    TEMP = 5
+    POINTER = 6
+    STATIC = 7
+
+    @property
+    def keyword(self) -> str:
+        """VM 语言中的内存段名"""
+        return self.name.lower()
+
+    @classmethod
+    def of(cls, segment: "Segment | str") -> "Segment":
+        """内存段名或内存段 -> 内存段"""
+        if isinstance(segment, cls):
+            return segment
+        if segment not in SEGMENTS:
+            raise ValueError(f"Invalid segment: {segment}")
+        return SEGMENTS[segment]
+
+
+OPCODES = {op.keyword: op for op in Op if op <= Op.RETURN}
+SEGMENTS = {segment.keyword: segment for segment in Segment}
+# Hack 跳转字段的值 -> 助记符
+JUMP_MNEMONICS = ("", "JGT", "JEQ", "JGE", "JLT", "JNE", "JLE", "JMP")
+
+# 算术逻辑命令的操作码为 0 ~ Op.NOT
+LAST_ARITHMETIC = Op.NOT
+SEGMENT_OPS = (Op.PUSH, Op.POP)
+SYMBOL_OPS = (Op.LABEL, Op.GOTO, Op.IF_GOTO)
+FUNCTION_OPS = (Op.FUNCTION, Op.CALL)
+
+
+class VMModule:
+    """一个 .vm 文件的全部命令，name 为文件名（不含扩展名），用于生成静态变量名"""
+
+    __slots__ = ("name", "ops", "args", "values", "lines", "symbols", "_symbol_ids")
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.ops = array("B")
+        self.args = array("H")
+        self.values = array("H")
+        self.lines = array("I")
+        self.symbols: List[str] = []
+        self._symbol_ids = {}
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+        """逐条返回 (操作码, 参数, 数值)"""
+        return zip(self.ops, self.args, self.values)
+
+    def derive(self) -> "VMModule":
+        """返回同名、符号编号相同的空模块，供优化过程写入改写后的命令
+
+        符号表是复制的，优化过程新登记的符号不会写入原模块。
+        """
+        module = VMModule(self.name)
+        module.symbols = list(self.symbols)
+        module._symbol_ids = dict(self._symbol_ids)
+        return module
+
+    def symbol_id(self, name: str) -> int:
+        """返回符号的编号，第一次出现时登记"""
+        index = self._symbol_ids.get(name)
+        if index is None:
+            index = self._symbol_ids[name] = len(self.symbols)
+            self.symbols.append(name)
+        return index
+
+    def append(self, op: Op, arg: int = 0, value: int = 0, line_num: int = 0) -> None:
+        self.ops.append(op)
+        self.args.append(arg)
+        self.values.append(value)
+        self.lines.append(line_num)
+
+    def text(self, index: int) -> str:
+        """还原第 index 条命令的 VM 源码"""
+        op = Op(self.ops[index])
+        arg, value = self.args[index], self.values[index]
+        if op in SEGMENT_OPS:
+            return f"{op.keyword} {Segment(arg).keyword} {value}"
+        if op in SYMBOL_OPS:
+            return f"{op.keyword} {self.symbols[arg]}"
+        if op in FUNCTION_OPS:
+            return f"{op.keyword} {self.symbols[arg]} {value}"
+        if op == Op.IF_COMPARE:
+            return f"{op.keyword} {self.symbols[arg]} {JUMP_MNEMONICS[value]}"
+        if op == Op.SUPERINSTRUCTION:
+            return f"{op.keyword} {self.symbols[arg]} {value}"
+        return op.keyword
+
+
+def _parse_line(module: VMModule, words: List[str], line_num: int) -> None:
+    op = Op.of(words[0])
+    if op in SEGMENT_OPS:
+        if len(words) != 3:
+            raise ValueError(f"{op.keyword} takes a segment and an index")
+        segment = Segment.of(words[1])
+        if op == Op.POP and segment == Segment.CONSTANT:
+            raise ValueError("Cannot pop to constant segment")
+        module.append(op, segment, int(words[2]), line_num)
+    elif op in SYMBOL_OPS:
+        if len(words) != 2:
+            raise ValueError(f"{op.keyword} takes a label")
+        module.append(op, module.symbol_id(words[1]), 0, line_num)
+    elif op in FUNCTION_OPS:
+        if len(words) != 3:
+            raise ValueError(f"{op.keyword} takes a function name and a count")
+        module.append(op, module.symbol_id(words[1]), int(words[2]), line_num)
+    else:
+        if len(words) != 1:
+            raise ValueError(f"{op.keyword} takes no arguments")
+        module.append(op, 0, 0, line_num)
+
+
+def parse(command_lines: Iterable[str], name: str = "") -> VMModule:
+    """把 VM 源码解析为 VMModule，忽略空行和注释"""
+    module = VMModule(name)
+    for line_num, line in enumerate(command_lines, start=1):
+        words = line.split("//", 1)[0].split()
+        if not words:
+            continue
+        try:
+            _parse_line(module, words, line_num)
+        except (ValueError, OverflowError) as e:
+            raise ValueError(f"{name}.vm:{line_num}: {e}") from None
+    return module
+
+
+def load(source_file_path: str | pathlib.Path) -> VMModule:
+    """读取并解析 .vm 文件，模块名为文件名（不含扩展名）"""
+    source_file_path = pathlib.Path(source_file_path)
+    with open(source_file_path, "r") as f:
+        return parse(f, source_file_path.name.split(".")[0])
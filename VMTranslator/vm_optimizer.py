@@ -0,0 +1,124 @@
+"""
+VM 层的优化过程：读取 VMModule 的命令数组，返回改写后的新模块，不修改原模块。
+
+fuse_compare_branches：Jack 的 if 和 while 编译为 "eq/gt/lt [not] if-goto L"，
+先在栈上生成布尔值，再弹出并判断。改写为一条 Op.IF_COMPARE，翻译时只计算 x - y
+并按比较结果直接跳转（D;Jxx），省去布尔值的生成、压栈和出栈以及比较用的标签。
+与 eq/gt/lt 的翻译相同，x - y 按 16 位计算。
+
+fuse_superinstructions：按 SUPERINSTRUCTIONS 表匹配常见的命令序列（如 i = i + 1 编译出的
+"push local 0; push constant 1; add; pop local 0"、数组元素的读写），在序列前插入一条
+Op.SUPERINSTRUCTION。原来的命令保留在它之后，由 CodeWriter 一起翻译为一段汇编，
+中间结果放在 D、A 中，不经过栈。序列中不含标签和调用，不会从中间进入。
+"""
+
+from typing import FrozenSet, List, Tuple
+
+from vm_ir import SEGMENTS, Op, VMModule
+
+# 比较命令 -> 条件成立时的 Hack 跳转字段（JEQ、JGT、JLT），取反为 value ^ 0b111
+COMPARE_JUMPS = {Op.EQ: 0b010, Op.GT: 0b001, Op.LT: 0b100}
+
+
+def fuse_compare_branches(module: VMModule) -> VMModule:
+    """把 "eq/gt/lt [not]... if-goto L" 改写为 IF_COMPARE L"""
+    ops, args, values, lines = module.ops, module.args, module.values, module.lines
+    result = module.derive()
+    count = len(ops)
+    index = 0
+    while index < count:
+        op = ops[index]
+        if op in COMPARE_JUMPS:
+            end = index + 1
+            while end < count and ops[end] == Op.NOT:
+                end += 1
+            if end < count and ops[end] == Op.IF_GOTO:
+                jump = COMPARE_JUMPS[op]
+                if (end - index - 1) % 2:
+                    jump ^= 0b111
+                result.append(Op.IF_COMPARE, args[end], jump, lines[index])
+                index = end + 1
+                continue
+        result.append(op, args[index], values[index], lines[index])
+        index += 1
+    return result
+
+
+# 超级指令名 -> 命令模式。每条命令写为 "操作码[|操作码...] [内存段] [下标]"，省略的部分匹配任意值。
+# 在同一位置按表中的顺序尝试，较长的模式放在前面
+BINARY = "add|sub|and|or"
+SUPERINSTRUCTIONS = {
+    # 读数组元素 a[i]：push a; push i; add; pop pointer 1; push that 0
+    "array-read": ("push", "push", "add", "pop pointer 1", "push that 0"),
+    # 写数组元素 a[i] = v：地址已在栈上，push v 要和后面一起匹配，否则会被 move 取走
+    "array-write": ("push", "pop temp 0", "pop pointer 1", "push temp 0", "pop that 0"),
+    # 值已在栈上（如函数的返回值）
+    "element-write": ("pop temp 0", "pop pointer 1", "push temp 0", "pop that 0"),
+    "binary-pop": ("push", "push", BINARY, "pop"),
+    "element-read": ("add", "pop pointer 1", "push that 0"),
+    # 值已由 binary-pop 存入 temp 0
+    "that-write": ("pop pointer 1", "push temp 0", "pop that 0"),
+    "compare-branch": ("push", "push", "if-compare"),
+    "push-binary": ("push", "push", BINARY),
+    "compare-top": ("push", "if-compare"),
+    "binary-top": ("push", BINARY),
+    "move": ("push", "pop"),
+}
+
+Matcher = Tuple[FrozenSet[int], int | None, int | None]
+
+
+def _matcher(command: str) -> Matcher:
+    """命令模式 -> (操作码集合, 内存段, 下标)，None 表示任意"""
+    words = command.split()
+    ops = frozenset(
+        Op[keyword.upper().replace("-", "_")] for keyword in words[0].split("|")
+    )
+    segment = SEGMENTS[words[1]] if len(words) > 1 else None
+    index = int(words[2]) if len(words) > 2 else None
+    return ops, segment, index
+
+
+PATTERNS: List[Tuple[str, Tuple[Matcher, ...]]] = [
+    (name, tuple(_matcher(command) for command in pattern))
+    for name, pattern in SUPERINSTRUCTIONS.items()
+]
+
+
+def _matches(module: VMModule, start: int, pattern: Tuple[Matcher, ...]) -> bool:
+    if start + len(pattern) > len(module.ops):
+        return False
+    for offset, (ops, segment, index) in enumerate(pattern):
+        position = start + offset
+        if module.ops[position] not in ops:
+            return False
+        if segment is not None and module.args[position] != segment:
+            return False
+        if index is not None and module.values[position] != index:
+            return False
+    return True
+
+
+def fuse_superinstructions(module: VMModule) -> VMModule:
+    """在匹配 SUPERINSTRUCTIONS 的命令序列前插入 SUPERINSTRUCTION，返回新模块"""
+    ops, args, values, lines = module.ops, module.args, module.values, module.lines
+    result = module.derive()
+    count = len(ops)
+    index = 0
+    while index < count:
+        for name, pattern in PATTERNS:
+            if _matches(module, index, pattern):
+                length = len(pattern)
+                result.append(
+                    Op.SUPERINSTRUCTION, result.symbol_id(name), length, lines[index]
+                )
+                for position in range(index, index + length):
+                    result.append(
+                        ops[position], args[position], values[position], lines[position]
+                    )
+                index += length
+                break
+        else:
+            result.append(ops[index], args[index], values[index], lines[index])
+            index += 1
+    return result
@@ -0,0 +1,174 @@
+"""
+单遍流式汇编：用游标顺序遍历一次输入，边读边生成机器码，
+遇到尚未定义的符号时先输出占位字，输入结束后再统一回填（backpatch）。
+"""
+
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from my_code import COMP_SYMBOL_DICT, DEST_SYMBOL_DICT, JUMP_SYMBOL_DICT
+from dead_code import DeadCodeEliminator
+from peephole import PeepholeOptimizer
+from source_map import SourceMap
+from symbol_table import SymbolTable
+
+ASSEMBLER_VERSION = 1  # 输出结果发生变化时递增，使构建缓存中的旧结果失效
+VARIABLE_BASE_ADDRESS = 16  # 变量从 RAM[16] 开始分配
+
+# 各个域的二进制码预先转换为整数，避免每条指令都拼接字符串
+COMP_CODES = {symbol: int(code, 2) for symbol, code in COMP_SYMBOL_DICT.items()}
+DEST_CODES = {symbol: int(code, 2) for symbol, code in DEST_SYMBOL_DICT.items()}
+JUMP_CODES = {symbol: int(code, 2) for symbol, code in JUMP_SYMBOL_DICT.items()}
+
+
+def iter_commands(command_lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """逐行去掉注释和空白，产生 (源文件行号, 命令)，行号从 1 开始。
+
+    command_lines 可以是打开的文件对象，此时不会把整个文件读入内存。
+    """
+    for line_num, line in enumerate(command_lines, start=1):
+        if "//" in line:
+            line = line.split("//")[0]
+        line = line.strip()
+        if line:
+            yield line_num, line
+
+
+def _encode_c_fields(command: str) -> int:
+    """逐个域查表计算 C-指令的机器码，未知的 dest/jump 按 000 处理。
+
+    可交换的运算允许交换两个操作数，如 M+D 与 D+M 的编码相同。
+    """
+    dest, _, rest = command.rpartition("=")
+    comp, _, jump = rest.partition(";")
+    comp_code = COMP_CODES.get(comp)
+    if comp_code is None and len(comp) == 3 and comp[1] in "+&|":
+        comp_code = COMP_CODES.get(comp[::-1])
+    if comp_code is None:
+        raise ValueError(f"{comp} is not a valid comp symbol")
+    return (
+        0b111 << 13
+        | comp_code << 6
+        | DEST_CODES.get(dest, 0) << 3
+        | JUMP_CODES.get(jump, 0)
+    )
+
+
+def _build_c_instruction_table() -> Dict[str, int]:
+    """枚举所有合法的 dest=comp;jump 组合（28 × 8 × 8 种），预先计算其机器码。"""
+    table = {}
+    for comp in COMP_CODES:
+        for dest in [""] + list(DEST_CODES):
+            for jump in [""] + list(JUMP_CODES):
+                command = comp
+                if dest:
+                    command = f"{dest}={command}"
+                if jump:
+                    command = f"{command};{jump}"
+                table[command] = _encode_c_fields(command)
+    return table
+
+
+C_INSTRUCTION_TABLE = _build_c_instruction_table()
+
+
+def encode_c_instruction(command: str) -> int:
+    """返回 C-指令 dest=comp;jump 对应的 16 位机器码，合法指令只需一次查表。"""
+    try:
+        return C_INSTRUCTION_TABLE[command]
+    except KeyError:
+        return _encode_c_fields(command)
+
+
+class StreamingAssembler:
+    """单遍汇编器。
+
+    每次调用 feed() 处理一条命令：L-指令只登记标签地址；A-指令引用尚未出现的符号时
+    先返回占位字 0，并把该指令的 ROM 地址记录到 fixups 中。全部输入处理完后调用
+    finish()：仍未定义的符号按首次出现的顺序从 16 开始分配为变量，并返回需要回填的
+    (ROM 地址, 机器码) 列表。
+    """
+
+    def __init__(self, symbol_table: SymbolTable | None = None) -> None:
+        self.symbol_table = symbol_table if symbol_table is not None else SymbolTable()
+        self.address = 0  # 下一条指令的 ROM 地址
+        self.fixups: Dict[str, List[int]] = {}
+
+    def feed(self, command: str) -> int | None:
+        """处理一条命令，返回其机器码；L-指令不生成代码，返回 None。"""
+        if command[0] == "(":
+            symbol = command[1:-1]
+            if not self.symbol_table.contains(symbol):
+                # 仅仅保存下一条命令的地址作为其值
+                self.symbol_table.add_entry(symbol, self.address)
+            return None
+        self.address += 1
+        if command[0] == "@":
+            return self._a_instruction(command[1:])
+        return encode_c_instruction(command)
+
+    def _a_instruction(self, symbol: str) -> int:
+        if symbol.isdecimal():
+            return int(symbol)
+        if self.symbol_table.contains(symbol):
+            return self.symbol_table.get_address(symbol)
+        self.fixups.setdefault(symbol, []).append(self.address - 1)
+        return 0
+
+    def finish(self) -> List[Tuple[int, int]]:
+        """解析所有前向引用，返回需要回填的 (ROM 地址, 机器码) 列表。"""
+        patches = []
+        register_num = VARIABLE_BASE_ADDRESS
+        for symbol, addresses in self.fixups.items():
+            if not self.symbol_table.contains(symbol):
+                # 到最后仍未定义为标签的符号就是变量
+                self.symbol_table.add_entry(symbol, register_num)
+                register_num += 1
+            value = self.symbol_table.get_address(symbol)
+            patches.extend((address, value) for address in addresses)
+        self.fixups = {}
+        return patches
+
+
+def assemble(
+    source: str | Iterable[str],
+    source_map: SourceMap | None = None,
+    optimizer: PeepholeOptimizer | None = None,
+    eliminator: DeadCodeEliminator | None = None,
+) -> array:
+    """在内存中汇编，返回 16 位机器码组成的 array('H')。
+
+    source 可以是完整的汇编文本，也可以是逐行的可迭代对象（如列表或打开的文件）。
+    给定 source_map 时同时把每条指令的源文件行号和标签地址登记到其中；
+    给定 eliminator 时先删除不可达代码，给定 optimizer 时再做窥孔优化，
+    节省的字数分别记录在两者中。
+    """
+    if isinstance(source, str):
+        source = source.splitlines()
+    commands = iter_commands(source)
+    if eliminator is not None:
+        commands = eliminator.optimize(commands)
+    if optimizer is not None:
+        commands = optimizer.optimize(commands)
+    assembler = StreamingAssembler()
+    words = array("H")
+    for line_num, command in commands:
+        word = assembler.feed(command)
+        if word is not None:
+            words.append(word)
+            if source_map is not None:
+                source_map.add_instruction(line_num)
+        elif source_map is not None:
+            source_map.add_label(assembler.address, command[1:-1])
+    for address, word in assembler.finish():
+        words[address] = word
+    return words
+
+
+def assemble_bytes(source: str | Iterable[str]) -> bytes:
+    """在内存中汇编，返回小端序 uint16 机器码组成的字节串。"""
+    words = assemble(source)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words.tobytes()
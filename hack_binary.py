@@ -0,0 +1,137 @@
+"""
+.hackb 二进制机器码格式：16 字节文件头 + 小端序 uint16 指令流。
+
+文件头（小端序）：
+    magic     4 字节  b"HACK"
+    version   uint16  当前为 1
+    reserved  uint16  保留，写 0
+    count     uint32  指令条数
+    checksum  uint32  指令流的 CRC-32
+
+与 .hack 文本格式（每条指令 17 个字节）相比体积只有约 1/8，
+并且可以通过 mmap 零拷贝地把指令流作为 memoryview 读出。
+"""
+
+import argparse
+import mmap
+import pathlib
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterable
+
+MAGIC = b"HACK"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+HACK_SUFFIX = ".hack"
+HACKB_SUFFIX = ".hackb"
+
+
+def dumps(words: Iterable[int]) -> bytes:
+    """把机器码序列编码为 .hackb 格式的字节串。"""
+    payload = array("H", words)
+    if sys.byteorder == "big":
+        payload.byteswap()
+    payload = payload.tobytes()
+    header = HEADER.pack(MAGIC, VERSION, 0, len(payload) // 2, zlib.crc32(payload))
+    return header + payload
+
+
+def loads(buffer, verify: bool = True) -> memoryview:
+    """从 .hackb 格式的缓冲区中取出指令流，返回以 uint16 为元素的 memoryview。
+
+    在小端序机器上返回的是原缓冲区的视图，不会复制数据。
+    """
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        raise ValueError("hackb buffer is shorter than its header")
+    magic, version, _, count, checksum = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"bad hackb magic: {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"unsupported hackb version: {version}")
+    payload = view[HEADER.size : HEADER.size + count * 2]
+    if len(payload) != count * 2:
+        raise ValueError(f"hackb payload truncated: expected {count} words")
+    if verify and zlib.crc32(payload) != checksum:
+        raise ValueError("hackb checksum mismatch")
+    if sys.byteorder == "big":
+        words = array("H", payload.tobytes())
+        words.byteswap()
+        return memoryview(words)
+    return payload.cast("H")
+
+
+def write_hackb(dest_file_path: str | pathlib.Path, words: Iterable[int]) -> None:
+    """把机器码写入 .hackb 文件。"""
+    with open(dest_file_path, "wb") as f:
+        f.write(dumps(words))
+
+
+def load_hackb(
+    source_file_path: str | pathlib.Path, verify: bool = True
+) -> memoryview:
+    """通过 mmap 读取 .hackb 文件，返回以 uint16 为元素的 memoryview。
+
+    返回的视图会一直持有映射，视图被释放后映射随之关闭。
+    """
+    with open(source_file_path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError("hackb buffer is shorter than its header")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(mapped, verify=verify)
+
+
+def read_hack(source_file_path: str | pathlib.Path) -> array:
+    """读取 .hack 文本文件，返回机器码组成的 array('H')。"""
+    with open(source_file_path, "r") as f:
+        return array("H", (int(line, 2) for line in f if line.strip()))
+
+
+def write_hack(dest_file_path: str | pathlib.Path, words: Iterable[int]) -> None:
+    """把机器码写入 .hack 文本文件。"""
+    with open(dest_file_path, "w") as f:
+        for word in words:
+            f.write(f"{word:016b}\n")
+
+
+def hack_to_hackb(
+    source_file_path: str | pathlib.Path, dest_file_path: str | pathlib.Path
+) -> int:
+    """把 .hack 文本文件转换为 .hackb 文件，返回指令条数。"""
+    words = read_hack(source_file_path)
+    write_hackb(dest_file_path, words)
+    return len(words)
+
+
+def hackb_to_hack(
+    source_file_path: str | pathlib.Path, dest_file_path: str | pathlib.Path
+) -> int:
+    """把 .hackb 文件转换为 .hack 文本文件，返回指令条数。"""
+    words = load_hackb(source_file_path)
+    write_hack(dest_file_path, words)
+    return len(words)
+
+
+def convert(
+    source_file_path: pathlib.Path, dest_file_path: pathlib.Path | None = None
+) -> pathlib.Path:
+    """根据后缀在 .hack 与 .hackb 之间互相转换，返回目标文件路径。"""
+    if source_file_path.suffix == HACK_SUFFIX:
+        dest_file_path = dest_file_path or source_file_path.with_suffix(HACKB_SUFFIX)
+        hack_to_hackb(source_file_path, dest_file_path)
+    elif source_file_path.suffix == HACKB_SUFFIX:
+        dest_file_path = dest_file_path or source_file_path.with_suffix(HACK_SUFFIX)
+        hackb_to_hack(source_file_path, dest_file_path)
+    else:
+        raise ValueError(f"Invalid file suffix: {source_file_path.suffix}")
+    return dest_file_path
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="在 .hack 与 .hackb 之间转换")
+    arg_parser.add_argument("source", type=pathlib.Path)
+    arg_parser.add_argument("dest", type=pathlib.Path, nargs="?")
+    args = arg_parser.parse_args()
+    print(convert(args.source, args.dest))
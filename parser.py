@@ -20,6 +20,7 @@ class Parser:
             line = self._remove_comment(command_line)
             if line:
                 self.lines.append(line)
+        self.current = 0  # 当前命令在 self.lines 中的下标
 
     def _remove_comment(self, line: str) -> str | None:
         """去掉注释。"""
@@ -29,19 +30,28 @@ class Parser:
 
     def has_more_commands(self) -> bool:
         """判断是否还有更多命令。"""
-        return len(self.lines) > 0
+        return self.current < len(self.lines)
 
     def advance(self):
         """从输入中读取下一条命令。"""
         if self.has_more_commands():
-            return self.lines.pop(0)
+            self.current += 1
+            return self.lines[self.current - 1]
         return None  # TODO 应该抛出异常的，需要在测试修改
 
+    def reset(self) -> None:
+        """回到第一条命令，以便再遍历一遍。"""
+        self.current = 0
+
+    def command(self) -> str:
+        """返回当前命令（已去掉注释）。"""
+        return self.lines[self.current]
+
     def command_type(self) -> str:
         """返回当前命令的类型。""" ""
-        if self.lines[0].startswith("@"):
+        if self.lines[self.current].startswith("@"):
             return "A_COMMAND"
-        elif self.lines[0].startswith("("):
+        elif self.lines[self.current].startswith("("):
             return "L_COMMAND"
         else:
             return "C_COMMAND"
@@ -49,16 +59,16 @@ class Parser:
     def symbol(self) -> str:
         """返回当前命令的符号或十进制值（当且仅当当前命令为A-指令或L-指令时）。"""
         if self.command_type() == "A_COMMAND":
-            return self.lines[0][1:]
+            return self.lines[self.current][1:]
         elif self.command_type() == "L_COMMAND":
-            return self.lines[0][1:-1]
+            return self.lines[self.current][1:-1]
         else:
             raise Exception("symbol() called when command_type() != A_COMMAND")
 
     def dest(self) -> str:
         """返回当前C-指令的dest助记符。"""
         if self.command_type() == "C_COMMAND":
-            result = self.lines[0].split("=")[0]
+            result = self.lines[self.current].split("=")[0]
             return result if result else ""
         else:
             raise Exception("dest() called when command_type() != C_COMMAND")
@@ -67,10 +77,10 @@ class Parser:
         """返回当前C-指令的comp助记符。"""
         if self.command_type() == "C_COMMAND":
             try:
-                result = self.lines[0].split("=")[1].split(";")[0]
+                result = self.lines[self.current].split("=")[1].split(";")[0]
                 return result if result else ""
             except Exception:
-                return self.lines[0].split(";")[0]
+                return self.lines[self.current].split(";")[0]
         else:
             raise Exception("comp() called when command_type() != C_COMMAND")
 
@@ -78,7 +88,7 @@ class Parser:
         """返回当前C-指令的jump助记符。"""
         if self.command_type() == "C_COMMAND":
             try:
-                return self.lines[0].split(";")[1]
+                return self.lines[self.current].split(";")[1]
             except Exception:
                 return ""
         else:
@@ -0,0 +1,187 @@
+"""
+窥孔优化：在解析之后、编码之前，用一张改写规则表在命令流上做滑动窗口匹配，
+删除 VM 翻译器生成的冗余指令。
+
+规则模式中的元素：
+    "@$n"  任意 A-指令，符号绑定到 $n（同一个 $n 出现多次时必须相同）
+    "($n)" 任意标签，符号绑定到 $n
+    "$Cn"  任意不写 A 寄存器的 C-指令，整条命令绑定到 $Cn
+    "$Jn"  任意没有 dest、带跳转的 C-指令，整条命令绑定到 $Jn
+    其他   与命令完全相同
+
+除了显式写出标签的规则外，标签不会出现在匹配窗口中，因此改写不会跨越跳转目标。
+变量按第一次被引用的顺序分配 RAM 地址，所以改写不会删除对变量的第一次引用。
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+from symbol_table import PREDEFINED_SYMBOLS
+
+# (规则名, 模式, 改写结果)，每条规则都必须让指令变少
+PEEPHOLE_RULES = [
+    # 紧接着的第二条 A-指令会覆盖第一条的结果
+    ("dead-a-load", ("@$1", "@$2"), ("@$2",)),
+    # A 寄存器没有被改写过，再次加载同一个符号是多余的
+    ("redundant-a-load", ("@$1", "$C1", "@$1"), ("@$1", "$C1")),
+    ("redundant-a-load", ("@$1", "$C1", "$C2", "@$1"), ("@$1", "$C1", "$C2")),
+    # push 之后立刻 pop：SP 先加一再减一
+    ("push-pop-sp", ("M=M+1", "AM=M-1"), ("A=M",)),
+    ("push-pop-sp", ("M=M+1", "M=M-1"), ()),
+    # 刚写入内存的值再读回 D，或把刚读出的值写回原处
+    ("store-load", ("M=D", "D=M"), ("M=D",)),
+    ("load-store", ("D=M", "M=D"), ("D=M",)),
+    # 跳转到紧随其后的指令；标签后是 A-指令，所以 A 的值不会被用到
+    ("jump-to-next", ("@$1", "$J1", "($1)", "@$2"), ("($1)", "@$2")),
+]
+
+
+def _writes_a(command: str) -> bool:
+    return "A" in command.rpartition("=")[0]
+
+
+def _match_element(element: str, command: str, bindings: Dict[str, str]) -> bool:
+    if element.startswith("@$"):
+        if command[0] != "@":
+            return False
+        key, value = element[1:], command[1:]
+    elif element.startswith("($"):
+        if command[0] != "(":
+            return False
+        key, value = element[1:-1], command[1:-1]
+    elif element.startswith("$C"):
+        if command[0] in "@(" or _writes_a(command):
+            return False
+        key, value = element, command
+    elif element.startswith("$J"):
+        if command[0] in "@(" or "=" in command or ";" not in command:
+            return False
+        key, value = element, command
+    else:
+        return element == command
+    return bindings.setdefault(key, value) == value
+
+
+def _substitute(element: str, bindings: Dict[str, str]) -> str:
+    if element.startswith("@$"):
+        return "@" + bindings[element[1:]]
+    if element.startswith("($"):
+        return "(" + bindings[element[1:-1]] + ")"
+    if element.startswith("$"):
+        return bindings[element]
+    return element
+
+
+class PeepholeOptimizer:
+    """对 (源文件行号, 命令) 序列做窥孔优化，并统计节省的 ROM 字数。"""
+
+    def __init__(self, rules=PEEPHOLE_RULES) -> None:
+        for name, pattern, replacement in rules:
+            if len(replacement) >= len(pattern):
+                raise ValueError(f"peephole rule {name} does not shrink the code")
+        self.rules = rules
+        # 按模式最后一个元素建立索引，压入一条命令时只尝试可能匹配的规则
+        self._rules_by_command: Dict[str, List[int]] = {}
+        self._rules_by_kind: Dict[str, List[int]] = {"@": [], "(": [], "C": []}
+        for index, (_, pattern, _) in enumerate(rules):
+            last = pattern[-1]
+            if last.startswith(("@$", "($")):
+                self._rules_by_kind[last[0]].append(index)
+            elif last.startswith("$"):
+                self._rules_by_kind["C"].append(index)
+            else:
+                self._rules_by_command.setdefault(last, []).append(index)
+        self.rule_hits: Counter = Counter()
+        # 每个可能是变量的符号第一次被引用时的行号，以及已经出现过的标签
+        self._first_references: Dict[str, int] = {}
+        self._labels: Set[str] = set()
+        self.words_before = 0
+        self.words_after = 0
+
+    @property
+    def words_saved(self) -> int:
+        return self.words_before - self.words_after
+
+    def optimize(self, commands: Iterable[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """逐条压入输出序列，每次压入后在序列末尾尝试所有规则，直到不再有规则匹配。"""
+        output: List[Tuple[int, str]] = []
+        self._first_references = {}
+        self._labels = set()
+        for item in commands:
+            line_num, command = item
+            if command[0] == "(":
+                self._labels.add(command[1:-1])
+            else:
+                self.words_before += 1
+                symbol = command[1:]
+                if (
+                    command[0] == "@"
+                    and not symbol.isdecimal()
+                    and symbol not in PREDEFINED_SYMBOLS
+                ):
+                    self._first_references.setdefault(symbol, line_num)
+            output.append(item)
+            while self._rewrite_tail(output):
+                pass
+        self.words_after += sum(1 for item in output if item[1][0] != "(")
+        return output
+
+    def _rewrite_tail(self, output: List[Tuple[int, str]]) -> bool:
+        last_command = output[-1][1]
+        kind = last_command[0] if last_command[0] in "@(" else "C"
+        candidates = self._rules_by_kind[kind] + self._rules_by_command.get(
+            last_command, []
+        )
+        for index in sorted(candidates):
+            name, pattern, replacement = self.rules[index]
+            if len(output) < len(pattern):
+                continue
+            window = output[-len(pattern) :]
+            bindings: Dict[str, str] = {}
+            if not all(
+                _match_element(element, command, bindings)
+                for element, (_, command) in zip(pattern, window)
+            ):
+                continue
+            rewritten = []
+            for element in replacement:
+                command = _substitute(element, bindings)
+                # 保留原指令的行号；新生成的指令使用窗口中第一条指令的行号
+                line_num = next(
+                    (line for line, matched in window if matched == command),
+                    window[0][0],
+                )
+                rewritten.append((line_num, command))
+            if any(
+                self._is_first_reference(item) and item not in rewritten
+                for item in window
+            ):
+                continue
+            output[-len(pattern) :] = rewritten
+            self.rule_hits[name] += 1
+            return True
+        return False
+
+    def _is_first_reference(self, item: Tuple[int, str]) -> bool:
+        """判断命令是否是对某个变量的第一次引用，删除它会改变之后变量的 RAM 地址。"""
+        line_num, command = item
+        symbol = command[1:]
+        return (
+            command[0] == "@"
+            and self._first_references.get(symbol) == line_num
+            and symbol not in self._labels
+        )
+
+    def stats(self) -> dict:
+        return {
+            "words_before": self.words_before,
+            "words_after": self.words_after,
+            "words_saved": self.words_saved,
+            "rule_hits": dict(self.rule_hits),
+        }
+
+
+def optimize_commands(commands: List[str]) -> List[str]:
+    """对不带行号的命令列表做窥孔优化。"""
+    optimizer = PeepholeOptimizer()
+    return [command for _, command in optimizer.optimize(list(enumerate(commands)))]
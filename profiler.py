@@ -0,0 +1,94 @@
+"""
+汇编过程的分阶段统计：记录读取、构造 Parser、第一遍、第二遍与写出各阶段的耗时和内存分配，
+并统计各类指令与符号的数量，结果可以直接序列化为 JSON。
+
+运行方式：python main.py pong/Pong.asm pong/Pong.hack --profile
+"""
+
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from parser import Parser
+from typing import Dict, Iterator
+
+from assembler import VARIABLE_BASE_ADDRESS
+from main import DATA_ROOT, first_pass, read_command_lines, second_pass, write_dest_file
+from symbol_table import PREDEFINED_SYMBOLS, SymbolTable
+
+
+class PhaseProfiler:
+    """按阶段记录耗时与内存分配，需要在 tracemalloc 开启时使用。"""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, dict] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        tracemalloc.reset_peak()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        start_blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            blocks = sys.getallocatedblocks() - start_blocks
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            self.phases[name] = {
+                "seconds": seconds,
+                "allocated_blocks": blocks,  # 阶段结束时仍存活的新增内存块数
+                "allocated_bytes": current_bytes - start_bytes,
+                "peak_bytes": peak_bytes - start_bytes,
+            }
+
+
+def profile_main(source_file_name: str, dest_file_name: str) -> dict:
+    """与 main() 相同地汇编一个文件（不使用构建缓存），返回各阶段的统计信息。"""
+    source_file_path = DATA_ROOT / source_file_name
+    dest_file_path = DATA_ROOT / dest_file_name
+    profiler = PhaseProfiler()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        with profiler.phase("read"):
+            command_lines = read_command_lines(source_file_path)
+        with profiler.phase("parse"):
+            parser = Parser(command_lines=command_lines)
+        symbol_table = SymbolTable()
+        with profiler.phase("first_pass"):
+            first_pass(parser, symbol_table)
+        label_count = len(symbol_table) - len(PREDEFINED_SYMBOLS)
+        parser.reset()
+        with profiler.phase("second_pass"):
+            dest_command = second_pass(parser, symbol_table)
+        with profiler.phase("write"):
+            write_dest_file(dest_file_path, dest_command)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    a_count = sum(1 for line in parser.lines if line[0] == "@")
+    l_count = sum(1 for line in parser.lines if line[0] == "(")
+    variable_count = len(symbol_table) - len(PREDEFINED_SYMBOLS) - label_count
+    return {
+        "source": str(source_file_path),
+        "dest": str(dest_file_path),
+        "seconds": sum(phase["seconds"] for phase in profiler.phases.values()),
+        "phases": profiler.phases,
+        "instructions": {
+            "A": a_count,
+            "C": len(parser.lines) - a_count - l_count,
+            "L": l_count,
+        },
+        "rom_words": len(dest_command),
+        "symbols": {
+            "predefined": len(PREDEFINED_SYMBOLS),
+            "label": label_count,
+            "variable": variable_count,
+        },
+        "max_variable_address": (
+            VARIABLE_BASE_ADDRESS + variable_count - 1 if variable_count else None
+        ),
+    }
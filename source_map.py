@@ -0,0 +1,73 @@
+"""
+源码映射：记录每个 ROM 地址对应的 .asm 源文件行号，以及按地址排序的标签索引，
+用于把模拟器或性能分析器中的 ROM 地址还原为源文件行号和所在的标签（函数）。
+"""
+
+import json
+import pathlib
+from array import array
+from bisect import bisect_right
+from typing import List, Tuple
+
+SOURCE_MAP_VERSION = 1
+SOURCE_MAP_SUFFIX = ".hackmap"
+
+
+class SourceMap:
+    def __init__(self) -> None:
+        self.lines = array("I")  # 第 i 项为 ROM[i] 对应的源文件行号
+        self.label_addresses = array("I")  # 按地址升序排列，与 label_names 一一对应
+        self.label_names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def add_instruction(self, line_num: int) -> None:
+        """登记下一条指令的源文件行号。"""
+        self.lines.append(line_num)
+
+    def add_label(self, address: int, name: str) -> None:
+        """登记标签，地址必须不小于已登记的标签地址。"""
+        if self.label_addresses and address < self.label_addresses[-1]:
+            raise ValueError(f"label {name} is out of order")
+        self.label_addresses.append(address)
+        self.label_names.append(name)
+
+    def line_of(self, address: int) -> int:
+        """返回 ROM 地址对应的源文件行号。"""
+        return self.lines[address]
+
+    def label_of(self, address: int) -> str | None:
+        """二分查找 ROM 地址之前（含该地址）最近的标签，不存在时返回 None。"""
+        index = bisect_right(self.label_addresses, address)
+        return self.label_names[index - 1] if index else None
+
+    def labels(self) -> List[Tuple[int, str]]:
+        """返回按地址排序的 (地址, 标签名) 列表。"""
+        return list(zip(self.label_addresses, self.label_names))
+
+    def to_dict(self) -> dict:
+        return {
+            "version": SOURCE_MAP_VERSION,
+            "lines": self.lines.tolist(),
+            "labels": [[address, name] for address, name in self.labels()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SourceMap":
+        if data.get("version") != SOURCE_MAP_VERSION:
+            raise ValueError(f"unsupported source map version: {data.get('version')}")
+        source_map = cls()
+        source_map.lines.extend(data["lines"])
+        for address, name in data["labels"]:
+            source_map.add_label(address, name)
+        return source_map
+
+    def dump(self, dest_file_path: str | pathlib.Path) -> None:
+        with open(dest_file_path, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, source_file_path: str | pathlib.Path) -> "SourceMap":
+        with open(source_file_path, "r") as f:
+            return cls.from_dict(json.load(f))
@@ -1,8 +1,27 @@
+import json
+import os
+import pathlib
 from parser import Parser
 
 import pytest
 
-from main import main
+from assembler import (
+    C_INSTRUCTION_TABLE,
+    StreamingAssembler,
+    assemble,
+    assemble_bytes,
+    encode_c_instruction,
+)
+from batch import batch_assemble, collect_sources
+from build_cache import BuildCache
+from hack_binary import dumps, hack_to_hackb, hackb_to_hack, load_hackb, loads
+from hack_object import assemble_object, load_object, write_object
+from linker import LinkError, link, link_files
+from main import main, streaming_main
+from dead_code import DeadCodeEliminator
+from peephole import PeepholeOptimizer, optimize_commands
+from profiler import profile_main
+from source_map import SourceMap
 from my_code import MyCode
 from symbol_table import SymbolTable
 
@@ -75,6 +94,22 @@ class TestParser:
         parser.advance()
         assert parser.comp() == "A"
 
+    def test_reset(self):
+        parser = Parser(command_lines=["@2", "D=A"])
+        parser.advance()
+        parser.advance()
+        assert not parser.has_more_commands()
+
+        parser.reset()
+        assert parser.command() == "@2"
+
+    def test_command(self):
+        parser = Parser(command_lines=["@2", "D=A"])
+        assert parser.command() == "@2"
+
+        parser.advance()
+        assert parser.command() == "D=A"
+
     def test_jump(self):
         command_lines = ["@2", "D=A", "D;JGT"]
 
@@ -178,6 +213,407 @@ class TestMain:
         actual = [x.strip() for x in actual]
         assert len(actual) == 27483
 
+    @pytest.mark.parametrize(
+        "file_name", ["add/Add", "max/Max", "rect/Rect", "pong/Pong", "pong/PongL"]
+    )
+    def test_streaming_main(self, file_name):
+        with open(f"data/{file_name}.hack", "r") as f:
+            expert = f.read()
+        count = streaming_main(
+            source_file_name=file_name + ".asm", dest_file_name=file_name + ".hack"
+        )
+        with open(f"data/{file_name}.hack", "r") as f:
+            actual = f.read()
+        assert actual == expert
+        assert count == len(expert.splitlines())
+
+
+class TestStreamingAssembler:
+    def test_backpatch_forward_label(self):
+        assembler = StreamingAssembler()
+        words = [assembler.feed(command) for command in ["@LOOP", "0;JMP", "(LOOP)"]]
+        assert words == [0, 0b1110101010000111, None]
+        assert assembler.finish() == [(0, 2)]
+
+    def test_variables_allocated_in_order(self):
+        assembler = StreamingAssembler()
+        for command in ["@i", "@END", "@sum", "(END)", "@i"]:
+            assembler.feed(command)
+        assert assembler.finish() == [(0, 16), (3, 16), (1, 3), (2, 17)]
+
+
+class TestEncodeCInstruction:
+    def test_table_covers_all_combinations(self):
+        assert len(C_INSTRUCTION_TABLE) == 28 * 8 * 8
+
+    def test_encode_c_instruction(self):
+        assert f"{encode_c_instruction('AM=M-1'):016b}" == "1111110010101000"
+        assert f"{encode_c_instruction('D;JGT'):016b}" == "1110001100000001"
+        assert f"{encode_c_instruction('0;JMP'):016b}" == "1110101010000111"
+
+    def test_encode_unknown_dest_falls_back(self):
+        assert encode_c_instruction("X=D") == encode_c_instruction("D")
+
+        with pytest.raises(ValueError):
+            encode_c_instruction("D=X")
+
+    def test_commuted_operands(self):
+        assert encode_c_instruction("M=M+D") == encode_c_instruction("M=D+M")
+        assert encode_c_instruction("D=A&D;JNE") == encode_c_instruction("D=D&A;JNE")
+        with pytest.raises(ValueError):
+            encode_c_instruction("D=A-D+1")
+
+
+class TestAssemble:
+    def test_assemble_text(self):
+        with open("data/add/Add.asm", "r") as f:
+            words = assemble(f.read())
+        assert words.typecode == "H"
+        assert list(words) == [2, 0xEC10, 3, 0xE090, 0, 0xE308]
+
+    def test_assemble_lines(self):
+        with open("data/pong/Pong.asm", "r") as f:
+            words = assemble(f)
+        with open("data/pong/Pong.hack", "r") as f:
+            expert = [int(line, 2) for line in f]
+        assert list(words) == expert
+
+    def test_assemble_bytes(self):
+        assert assemble_bytes(["@2", "D=A"]) == bytes([2, 0, 0x10, 0xEC])
+
+    def test_invalid_comp(self):
+        with pytest.raises(ValueError):
+            assemble("D=X")
+
+    def test_commuted_comp(self):
+        assert list(assemble("D=M+D")) == [0b1111000010010000]
+
+
+class TestHackBinary:
+    def test_dumps_loads(self):
+        data = dumps([2, 0xEC10, 0xFFFF])
+        assert len(data) == 16 + 3 * 2
+        assert loads(data).tolist() == [2, 0xEC10, 0xFFFF]
+
+    def test_loads_rejects_corrupted_payload(self):
+        data = bytearray(dumps([2, 0xEC10]))
+        data[-1] ^= 0xFF
+        with pytest.raises(ValueError):
+            loads(data)
+
+        with pytest.raises(ValueError):
+            loads(b"HACX" + bytes(data[4:]))
+
+    def test_main_writes_hackb(self, tmp_path):
+        dest_file_path = tmp_path / "Pong.hackb"
+        main(source_file_name="pong/Pong.asm", dest_file_name=str(dest_file_path))
+        with open("data/pong/Pong.hack", "r") as f:
+            expert = [int(line, 2) for line in f]
+        assert load_hackb(dest_file_path).tolist() == expert
+
+    def test_convert_round_trip(self, tmp_path):
+        hackb_file_path = tmp_path / "Max.hackb"
+        hack_file_path = tmp_path / "Max.hack"
+        assert hack_to_hackb("data/max/Max.hack", hackb_file_path) == 16
+        assert hackb_to_hack(hackb_file_path, hack_file_path) == 16
+        with open("data/max/Max.hack", "r") as f:
+            expert = f.read()
+        assert hack_file_path.read_text() == expert
+
+
+class TestBatch:
+    def test_collect_sources(self):
+        sources = collect_sources(
+            ["data/rect", "data/add/Add.asm", "data/rect/Rect.asm"]
+        )
+        assert [str(source) for source in sources] == [
+            "data/rect/Rect.asm",
+            "data/rect/RectL.asm",
+            "data/add/Add.asm",
+        ]
+
+    def test_batch_assemble(self, tmp_path):
+        for file_name in ["max/Max.asm", "pong/Pong.asm", "rect/Rect.asm"]:
+            dest_file_path = tmp_path / file_name
+            dest_file_path.parent.mkdir(exist_ok=True)
+            dest_file_path.write_text((pathlib.Path("data") / file_name).read_text())
+
+        results = batch_assemble([tmp_path], max_workers=2)
+        assert [result.source_file_path.name for result in results] == [
+            "Max.asm",
+            "Pong.asm",
+            "Rect.asm",
+        ]
+        for result in results:
+            expert = result.source_file_path.relative_to(tmp_path).with_suffix(".hack")
+            with open(pathlib.Path("data") / expert, "r") as f:
+                assert result.dest_file_path.read_text() == f.read()
+
+
+class TestBuildCache:
+    def test_get_put(self, tmp_path):
+        cache = BuildCache(tmp_path)
+        key = cache.key(b"@2\nD=A\n", ".hack")
+        assert cache.get(key) is None
+
+        cache.put(key, b"0000000000000010\n")
+        assert cache.get(key) == b"0000000000000010\n"
+        assert cache.key(b"@2\nD=A\n", ".hackb") != key
+        assert cache.key(b"@3\nD=A\n", ".hack") != key
+
+    def test_evict_least_recently_used(self, tmp_path):
+        cache = BuildCache(tmp_path, max_bytes=25)
+        cache.put("a", b"a" * 10)
+        cache.put("b", b"b" * 10)
+        os.utime(tmp_path / "a", ns=(1_000_000_000, 1_000_000_000))
+        os.utime(tmp_path / "b", ns=(2_000_000_000, 2_000_000_000))
+
+        assert cache.get("a") is not None
+        cache.put("c", b"c" * 10)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "c"]
+
+    def test_main_with_cache(self, tmp_path):
+        cache = BuildCache(tmp_path / "cache")
+        dest_file_path = tmp_path / "Max.hack"
+        expert = main("max/Max.asm", str(dest_file_path), cache=cache)
+        dest_file_path.unlink()
+
+        assert main("max/Max.asm", str(dest_file_path), cache=cache) == expert
+        assert dest_file_path.read_text().splitlines() == expert
+
+    def test_batch_with_cache(self, tmp_path):
+        source_file_path = tmp_path / "Rect.asm"
+        source_file_path.write_text(pathlib.Path("data/rect/Rect.asm").read_text())
+        cache_dir = tmp_path / "cache"
+
+        results = batch_assemble([source_file_path], max_workers=1, cache_dir=cache_dir)
+        assert not results[0].cached
+        results = batch_assemble([source_file_path], max_workers=1, cache_dir=cache_dir)
+        assert results[0].cached
+        assert results[0].word_count == 25
+        with open("data/rect/Rect.hack", "r") as f:
+            assert results[0].dest_file_path.read_text() == f.read()
+
+
+class TestProfiler:
+    def test_profile_main(self, tmp_path):
+        stats = profile_main("rect/Rect.asm", str(tmp_path / "Rect.hack"))
+        assert list(stats["phases"]) == [
+            "read",
+            "parse",
+            "first_pass",
+            "second_pass",
+            "write",
+        ]
+        assert stats["instructions"] == {"A": 12, "C": 13, "L": 2}
+        assert stats["rom_words"] == 25
+        assert stats["symbols"] == {"predefined": 23, "label": 2, "variable": 2}
+        assert stats["max_variable_address"] == 17
+        assert json.loads(json.dumps(stats)) == stats
+
+    def test_profile_without_variables(self, tmp_path):
+        stats = profile_main("max/Max.asm", str(tmp_path / "Max.hack"))
+        assert stats["symbols"]["variable"] == 0
+        assert stats["max_variable_address"] is None
+
+
+class TestSourceMap:
+    def test_assemble_with_source_map(self):
+        source_map = SourceMap()
+        with open("data/max/Max.asm", "r") as f:
+            words = assemble(f, source_map=source_map)
+        assert len(source_map) == len(words) == 16
+        assert source_map.line_of(0) == 10
+        assert source_map.line_of(10) == 23
+        assert source_map.labels() == [(10, "ITSR0"), (12, "OUTPUT_D"), (14, "END")]
+        assert source_map.label_of(9) is None
+        assert source_map.label_of(11) == "ITSR0"
+        assert source_map.label_of(13) == "OUTPUT_D"
+        assert source_map.label_of(15) == "END"
+
+    def test_streaming_main_dumps_source_map(self, tmp_path):
+        source_map_file_path = tmp_path / "Max.hackmap"
+        streaming_main(
+            "max/Max.asm",
+            str(tmp_path / "Max.hack"),
+            source_map_file_name=str(source_map_file_path),
+        )
+        source_map = SourceMap.load(source_map_file_path)
+        assert len(source_map) == 16
+        assert source_map.label_of(13) == "OUTPUT_D"
+
+    def test_labels_must_be_sorted(self):
+        source_map = SourceMap()
+        source_map.add_label(3, "B")
+        with pytest.raises(ValueError):
+            source_map.add_label(2, "A")
+
+
+class TestPeephole:
+    def test_push_then_pop(self):
+        commands = ["@SP", "A=M", "M=D", "@SP", "M=M+1", "@SP", "AM=M-1", "D=M"]
+        assert optimize_commands(commands) == ["@SP", "A=M", "M=D", "@SP", "A=M", "D=M"]
+
+    def test_dead_and_redundant_a_loads(self):
+        assert optimize_commands(["@R13", "@SP", "M=M+1", "@SP", "D=M"]) == [
+            "@SP",
+            "M=M+1",
+            "D=M",
+        ]
+        assert optimize_commands(["@SP", "A=M", "@SP"]) == ["@SP", "A=M", "@SP"]
+
+    def test_keep_first_variable_reference(self):
+        # 删除 @x 会让 y 占用 x 原本的 RAM 地址
+        commands = ["@x", "@y", "M=1", "@x", "M=0"]
+        assert optimize_commands(commands) == commands
+        assert list(assemble(commands, optimizer=PeepholeOptimizer())) == list(
+            assemble(commands)
+        )
+        assert optimize_commands(["@x", "M=1", "@x", "@y", "M=0"]) == [
+            "@x",
+            "M=1",
+            "@y",
+            "M=0",
+        ]
+
+    def test_jump_to_next(self):
+        assert optimize_commands(["@L", "0;JMP", "(L)", "@SP"]) == ["(L)", "@SP"]
+        assert optimize_commands(["@L", "0;JMP", "(L)", "M=D"]) == [
+            "@L",
+            "0;JMP",
+            "(L)",
+            "M=D",
+        ]
+
+    def test_respect_label_boundary(self):
+        commands = ["@SP", "M=M+1", "(LOOP)", "@SP", "AM=M-1"]
+        assert optimize_commands(commands) == commands
+
+    def test_assemble_with_optimizer(self):
+        optimizer = PeepholeOptimizer()
+        source = ["@SP", "M=M+1", "@SP", "AM=M-1", "(END)", "@END", "0;JMP"]
+        words = assemble(source, optimizer=optimizer)
+        assert list(words) == list(assemble(["@SP", "A=M", "(END)", "@END", "0;JMP"]))
+        assert optimizer.words_saved == 2
+        assert optimizer.stats()["rule_hits"] == {
+            "redundant-a-load": 1,
+            "push-pop-sp": 1,
+        }
+
+    def test_rules_must_shrink(self):
+        with pytest.raises(ValueError):
+            PeepholeOptimizer(rules=[("grow", ("D=M",), ("D=M", "D=M"))])
+
+
+class TestDeadCode:
+    PROGRAM = [
+        "@RET",  # 返回地址被当作数据压栈，RET 因此可达
+        "D=A",
+        "@R14",
+        "M=D",
+        "@USED",
+        "0;JMP",
+        "(RET)",
+        "@END",
+        "0;JMP",
+        "(UNUSED)",  # 没有任何跳转到这里
+        "@R0",
+        "M=0",
+        "@UNUSED",
+        "0;JMP",
+        "(USED)",
+        "@R0",
+        "M=1",
+        "@R14",
+        "A=M",
+        "0;JMP",
+        "(END)",
+        "@END",
+        "0;JMP",
+    ]
+
+    def test_drop_unreachable_blocks(self):
+        eliminator = DeadCodeEliminator()
+        commands = eliminator.optimize(enumerate(self.PROGRAM))
+        assert [command for _, command in commands] == (
+            self.PROGRAM[:9] + self.PROGRAM[14:]
+        )
+        assert eliminator.words_saved == 4
+        assert eliminator.dropped_labels == ["UNUSED"]
+
+    def test_label_addresses_recomputed(self):
+        words = assemble(self.PROGRAM, eliminator=DeadCodeEliminator())
+        assert list(words) == list(assemble(self.PROGRAM[:9] + self.PROGRAM[14:]))
+        assert words[4] == 8  # @USED
+
+    def test_unresolved_jump_keeps_code(self):
+        program = ["@4", "0;JMP", "@R0", "M=0", "(END)", "@END", "0;JMP"]
+        eliminator = DeadCodeEliminator()
+        commands = eliminator.optimize(enumerate(program))
+        assert [command for _, command in commands] == program
+        assert eliminator.words_saved == 0
+
+    def test_conditional_jump_falls_through(self):
+        program = ["@R0", "D=M", "@END", "D;JGT", "@R1", "M=D"]
+        program += ["(END)", "@END", "0;JMP"]
+        commands = DeadCodeEliminator().optimize(enumerate(program))
+        assert [command for _, command in commands] == program
+
+
+class TestLinker:
+    MAIN = ["@i", "M=1", "(LOOP)", "@Math.double", "0;JMP"]
+    MAIN += ["(Main.ret)", "@LOOP", "0;JMP"]
+    MATH = ["(Math.double)", "@i", "D=M", "M=D+M"]
+    MATH += ["@sum", "M=D", "@Main.ret", "0;JMP"]
+
+    def test_assemble_object(self):
+        module = assemble_object(self.MAIN, name="Main")
+        assert module.labels == {"LOOP": 2, "Main.ret": 4}
+        assert list(module.relocations) == [4]
+        assert module.references == {"i": [0], "Math.double": [2]}
+        assert module.words[4] == 2
+
+    def test_link_matches_assemble(self):
+        modules = [assemble_object(self.MAIN), assemble_object(self.MATH)]
+        symbol_table = SymbolTable()
+        words = link(modules, symbol_table)
+        assert words == assemble(self.MAIN + self.MATH)
+        assert symbol_table.get_address("Math.double") == 6
+        assert symbol_table.get_address("sum") == 17
+
+    def test_link_split_program(self):
+        with open("data/pong/Pong.asm", "r") as f:
+            lines = f.read().splitlines()
+        middle = next(
+            i for i in range(len(lines) // 2, len(lines)) if lines[i].startswith("(")
+        )
+        modules = [assemble_object(lines[:middle]), assemble_object(lines[middle:])]
+        assert link(modules) == assemble(lines)
+
+    def test_duplicate_label(self):
+        with pytest.raises(LinkError):
+            link([assemble_object(self.MAIN), assemble_object(self.MAIN)])
+
+    def test_object_file_round_trip(self, tmp_path):
+        module = assemble_object(self.MATH, name="Math")
+        write_object(tmp_path / "Math.hobj", module)
+        loaded = load_object(tmp_path / "Math.hobj")
+        assert loaded.name == "Math"
+        assert loaded.words == module.words
+        assert loaded.relocations == module.relocations
+        assert loaded.labels == module.labels
+        assert loaded.references == module.references
+
+    def test_link_files(self, tmp_path):
+        (tmp_path / "Main.asm").write_text("\n".join(self.MAIN))
+        write_object(tmp_path / "Math.hobj", assemble_object(self.MATH))
+        dest_file_path = tmp_path / "Prog.hack"
+        paths = [tmp_path / "Main.asm", tmp_path / "Math.hobj"]
+        assert link_files(paths, dest_file_path) == 13
+        assert dest_file_path.read_text().splitlines() == [
+            f"{word:016b}" for word in assemble(self.MAIN + self.MATH)
+        ]
+
 
 class TestSymbolTable:
     def test_symbol_table_constructor(self):